@@ -0,0 +1,62 @@
+# ============================================================================
+# backfill_ecowitt.py — Fill gaps from the Ecowitt history API
+# ============================================================================
+# Downloads /device/history for each Ecowitt station in stations.json in
+# chunks (one day by default) and appends it to data/YYYY/MM/ like a normal
+# run, deduplicated against stored timestamps. Progress is checkpointed per
+# MAC after every chunk: runs without --start continue from the checkpoint to
+# now (resuming an interrupted backfill), while an explicit --start/--end is
+# always downloaded, even before the checkpoint.
+#
+#   python backfill_ecowitt.py --start 2026-01-01 [--end 2026-02-01]
+#   python backfill_ecowitt.py                      # resume to now
+#   python backfill_ecowitt.py --base-url http://localhost:8000/api/v3
+# ============================================================================
+
+import argparse
+
+from fetch_data import build_provider, load_config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill Ecowitt stations from the history API")
+    parser.add_argument("--start", help="first timestamp to download (default: per-MAC checkpoint)")
+    parser.add_argument("--end", help="last timestamp to download (default: now)")
+    parser.add_argument("--station", action="append", help="station name(s) to backfill (default: all Ecowitt)")
+    parser.add_argument("--chunk", default=None, help="length of one history request (default: 1D)")
+    parser.add_argument("--cycle", default=None, help="history cycle_type, e.g. 5min, 30min (default: 5min)")
+    parser.add_argument("--base-url", help="API base URL, e.g. a local stub server")
+    parser.add_argument("--config", default="stations.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+
+    entries = [
+        entry for entry in config.get("providers", [])
+        if entry.get("type") == "ecowitt"
+        and entry.get("enabled", False)
+        and (not args.station or entry.get("name") in args.station)
+    ]
+
+    results = []
+    for entry in entries:
+        if args.base_url:
+            entry = {**entry, "config": {**entry.get("config", {}), "base_url": args.base_url}}
+
+        try:
+            provider = build_provider(entry)
+            written = provider.backfill(start=args.start, end=args.end, chunk=args.chunk, cycle_type=args.cycle)
+            results.append(f"✓ {provider.name}: {written} rows")
+        except Exception as e:
+            results.append(f"[ERROR] Backfill of {entry.get('name')} failed: {e}")
+
+    print("\n=== Summary ===")
+    for r in results or ["No Ecowitt stations to backfill"]:
+        print(r)
+
+
+if __name__ == "__main__":
+    main()
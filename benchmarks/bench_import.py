@@ -0,0 +1,77 @@
+# ============================================================================
+# bench_import.py — Startup cost of eager vs lazy provider imports
+# ============================================================================
+# Starts a fresh interpreter per sample and measures how long it takes to
+# get the orchestrator ready to run, plus the modules loaded and peak RSS:
+#
+#   bare      : `python -c pass` (interpreter baseline)
+#   startup   : import fetch_data only
+#   lazy      : import fetch_data + resolve the types of the enabled entries
+#   eager     : import fetch_data + every registered provider (the previous
+#               hard-coded PROVIDER_CLASSES behaviour)
+#
+#   python benchmarks/bench_import.py [--types ttn] [--repeat 10]
+# ============================================================================
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT = (
+    "import json, resource, sys; "
+    "print(json.dumps({'modules': len(sys.modules), "
+    "'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))"
+)
+
+SCENARIOS = {
+    "bare": "pass",
+    "startup": "import fetch_data",
+    "lazy": (
+        "import fetch_data; "
+        "fetch_data.enabled_classes([{{'type': t, 'enabled': True}} for t in {types!r}])"
+    ),
+    "eager": (
+        "import fetch_data; "
+        "from providers.registry import provider_class, provider_types; "
+        "[provider_class(t) for t in provider_types()]"
+    ),
+}
+
+
+def sample(code):
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", f"{code}; {REPORT}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    elapsed = time.perf_counter() - t0
+    return elapsed, json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider import benchmark")
+    parser.add_argument("--types", nargs="+", default=["ttn"], help="enabled provider types for the lazy run")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<10} {'median ms':>10} {'modules':>8} {'peak RSS MB':>12}")
+    for name, template in SCENARIOS.items():
+        code = template.format(types=args.types)
+        sample(code)  # warm the filesystem cache
+        runs = [sample(code) for _ in range(args.repeat)]
+        median = statistics.median(elapsed for elapsed, _ in runs) * 1000
+        info = runs[-1][1]
+        print(f"{name:<10} {median:>10.1f} {info['modules']:>8} {info['rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# ============================================================================
+# bench_ipc_cache.py — Parquet decode vs memory-mapped Arrow IPC cache
+# ============================================================================
+# Writes last month's synthetic LoEco observations (default: 30 stations at
+# 5-minute resolution) as Parquet fragments, then times repeated reads of
+# the month with read_observations(), straight from Parquet and through
+# storage.ipc_cache (first read builds the cache, later reads map it).
+#
+#   python benchmarks/bench_ipc_cache.py [--stations 30] [--fragments 10] [--repeat 5]
+# ============================================================================
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers.schema import to_arrow  # noqa: E402
+from storage.dataset import write_fragment  # noqa: E402
+from storage.query import read_observations  # noqa: E402
+
+COLUMNS = ["temperature_c", "humidity_pct", "pressure_hpa", "wind_speed_ms"]
+
+
+def make_dataset(root, stations, fragments):
+    rng = np.random.default_rng(0)
+    # Last month: closed months are the ones read through the cache
+    start = pd.Timestamp.now(tz="UTC").normalize().replace(day=1) - pd.DateOffset(months=1)
+    times = pd.date_range(start, start + pd.offsets.MonthBegin(1), freq="5min", inclusive="left")
+
+    for s in range(stations):
+        station = f"station{s:03d}"
+        target = os.path.join(root, f"{start:%Y}", f"{start:%m}", f"ttn__{station}.parquet")
+        for chunk in np.array_split(np.arange(len(times)), fragments):
+            df = pd.DataFrame({"timestamp": times[chunk], "station": station, "provider": "ttn"})
+            for col in COLUMNS:
+                df[col] = rng.normal(size=len(chunk))
+            write_fragment(target, to_arrow(df))
+    return len(times) * stations
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = fn()
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs), df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IPC cache benchmark")
+    parser.add_argument("--stations", type=int, default=30)
+    parser.add_argument("--fragments", type=int, default=10, help="fragments per station target")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="loeco-ipc-")
+    root, cache_dir = os.path.join(tmp, "data"), os.path.join(tmp, "data", ".cache")
+    try:
+        rows = make_dataset(root, args.stations, args.fragments)
+        print(f"{rows} rows, {args.stations} stations × {args.fragments} fragments\n")
+
+        def parquet():
+            return read_observations(columns=COLUMNS, root=root)
+
+        def cached():
+            return read_observations(columns=COLUMNS, root=root, cache=True, cache_dir=cache_dir)
+
+        t0 = time.perf_counter()
+        cached()
+        build = time.perf_counter() - t0
+
+        parquet_s, expected = timed(parquet, args.repeat)
+        cached_s, result = timed(cached, args.repeat)
+
+        print(f"{'parquet':<14} {parquet_s * 1000:>9.1f} ms")
+        print(f"{'cache (build)':<14} {build * 1000:>9.1f} ms")
+        print(f"{'cache (warm)':<14} {cached_s * 1000:>9.1f} ms   ({parquet_s / cached_s:.1f}× faster)")
+        print(f"\nsame result: {result.equals(expected)}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
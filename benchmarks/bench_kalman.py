@@ -0,0 +1,141 @@
+# ============================================================================
+# bench_kalman.py — Per-sample vs array-level Kalman smoothing
+# ============================================================================
+# Compares the original per-series Python loop with processing.kalman on a
+# synthetic fleet (default: one year of 30-minute data for 50 devices) and
+# checks that both produce the same output.
+#
+#   python benchmarks/bench_kalman.py [--devices 50] [--days 365]
+# ============================================================================
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.kalman import get_sensor_params, kalman_smooth_frame  # noqa: E402
+
+COLUMNS = ["TempC_SHT", "TempC_DS", "Hum_SHT"]
+
+
+# ----------------------------------------------------------------------------
+# Reference implementation (per-sample loop, as previously in fetch_dataB.py)
+# ----------------------------------------------------------------------------
+
+def legacy_kalman_smooth_series(series: pd.Series, Q_base=0.01, R=1.0) -> pd.Series:
+    x = series.copy().astype(float)
+
+    if x.index.duplicated().any():
+        x = x[~x.index.duplicated(keep='first')]
+
+    mask = x.notna()
+    values = x[mask].values
+    index = x[mask].index
+
+    if len(values) < 3:
+        return series
+
+    x_est = values[0]
+    P = R
+    out = []
+
+    for i, z in enumerate(values):
+        if i > 0:
+            dt = (index[i] - index[i-1]).total_seconds() / 3600
+            dt = max(dt, 0.01)
+        else:
+            dt = 0.5
+
+        Q = Q_base * dt
+
+        x_pred = x_est
+        P_pred = P + Q
+
+        K = P_pred / (P_pred + R)
+        x_est = x_pred + K * (z - x_pred)
+        P = (1 - K) * P_pred
+
+        out.append(x_est)
+
+    if len(out) > 0:
+        if np.std(out) > 3 * np.std(values):
+            return series
+
+    result = series.copy()
+    if result.index.duplicated().any():
+        result = result[~result.index.duplicated(keep='first')]
+
+    for idx, val in zip(index, out):
+        result.loc[idx] = val
+
+    return result
+
+
+# ----------------------------------------------------------------------------
+# Synthetic fleet
+# ----------------------------------------------------------------------------
+
+def make_fleet(n_devices, days, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=days * 48, freq="30min", tz="UTC")
+    hours = np.arange(len(index)) / 2
+
+    frames = []
+    for d in range(n_devices):
+        df = pd.DataFrame(index=index)
+        df["device_id"] = f"node{d:03d}"
+        df["TempC_SHT"] = 10 + 8 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 0.7, len(index))
+        df["TempC_DS"] = df["TempC_SHT"] + 3 + rng.normal(0, 1.0, len(index))
+        df["Hum_SHT"] = 70 + 15 * np.cos(2 * np.pi * hours / 24) + rng.normal(0, 2.5, len(index))
+
+        # Knock out ~5% of samples to exercise the time-gap logic
+        for col in COLUMNS:
+            df.loc[rng.random(len(index)) < 0.05, col] = np.nan
+
+        frames.append(df)
+
+    return pd.concat(frames)
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    df = make_fleet(args.devices, args.days)
+    print(f"Fleet: {args.devices} devices × {args.days} days = {len(df):,} rows, {len(COLUMNS)} columns")
+
+    t0 = time.perf_counter()
+    legacy = []
+    for _, df_dev in df.groupby("device_id", sort=False):
+        df_dev = df_dev.copy()
+        for col in COLUMNS:
+            df_dev[col] = legacy_kalman_smooth_series(df_dev[col], **get_sensor_params(col))
+        legacy.append(df_dev)
+    legacy = pd.concat(legacy)
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    vectorised = kalman_smooth_frame(df, COLUMNS, by="device_id")
+    t_vectorised = time.perf_counter() - t0
+
+    max_diff = np.nanmax(np.abs(legacy[COLUMNS].to_numpy() - vectorised[COLUMNS].to_numpy()))
+
+    print(f"per-sample loop : {t_legacy:8.2f} s")
+    print(f"array-level     : {t_vectorised:8.2f} s")
+    print(f"speedup         : {t_legacy / t_vectorised:8.1f} ×")
+    print(f"max |difference|: {max_diff:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# ============================================================================
+# bench_outliers.py — Per-column rolling outlier loop vs one vectorised pass
+# ============================================================================
+# Compares the original remove_outliers() loop (two rolling passes per
+# column, as previously in fetch_dataB.py) with processing.outliers on a
+# synthetic fleet (default: one year of 30-minute data for 50 devices with
+# injected spikes). The loop is timed on the combined frame, as it used to
+# run, and per device, which is what the new stage is checked against.
+#
+#   python benchmarks/bench_outliers.py [--devices 50] [--days 365]
+# ============================================================================
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.outliers import remove_outliers_frame  # noqa: E402
+
+COLUMNS = ["TempC_SHT", "TempC_DS", "Hum_SHT", "Pressure_hPa", "Wind_ms"]
+
+
+# ----------------------------------------------------------------------------
+# Reference implementation (per-column loop, as previously in fetch_dataB.py)
+# ----------------------------------------------------------------------------
+
+def legacy_remove_outliers(series: pd.Series, n_sigma=3) -> pd.Series:
+    if len(series.dropna()) < 10:
+        return series
+
+    rolling_mean = series.rolling(window=12, center=True, min_periods=3).mean()
+    rolling_std = series.rolling(window=12, center=True, min_periods=3).std()
+
+    rolling_mean = rolling_mean.fillna(series.mean())
+    rolling_std = rolling_std.fillna(series.std())
+
+    deviation = (series - rolling_mean).abs()
+    threshold = n_sigma * rolling_std
+    mask = deviation <= threshold
+
+    return series.where(mask)
+
+
+# ----------------------------------------------------------------------------
+# Synthetic fleet
+# ----------------------------------------------------------------------------
+
+def make_fleet(n_devices, days, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=days * 48, freq="30min", tz="UTC")
+    hours = np.arange(len(index)) / 2
+
+    frames = []
+    for d in range(n_devices):
+        df = pd.DataFrame(index=index)
+        df["device_id"] = f"node{d:03d}"
+        df["TempC_SHT"] = 10 + 8 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 0.7, len(index))
+        df["TempC_DS"] = df["TempC_SHT"] + 3 + rng.normal(0, 1.0, len(index))
+        df["Hum_SHT"] = 70 + 15 * np.cos(2 * np.pi * hours / 24) + rng.normal(0, 2.5, len(index))
+        df["Pressure_hPa"] = 1013 + np.cumsum(rng.normal(0, 0.05, len(index)))
+        df["Wind_ms"] = np.abs(rng.normal(3, 1.5, len(index)))
+
+        # ~0.5% spikes and ~5% gaps per column
+        for col in COLUMNS:
+            spikes = rng.random(len(index)) < 0.005
+            df.loc[spikes, col] += rng.choice([-1, 1], spikes.sum()) * 40
+            df.loc[rng.random(len(index)) < 0.05, col] = np.nan
+
+        frames.append(df)
+
+    return pd.concat(frames)
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Outlier stage benchmark")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    df = make_fleet(args.devices, args.days)
+    print(f"Fleet: {args.devices} devices × {args.days} days = {len(df):,} rows, {len(COLUMNS)} columns")
+
+    t0 = time.perf_counter()
+    combined = df.copy()
+    for col in COLUMNS:
+        combined[col] = legacy_remove_outliers(combined[col])
+    t_combined = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    per_device = []
+    for _, df_dev in df.groupby("device_id", sort=False):
+        df_dev = df_dev.copy()
+        for col in COLUMNS:
+            df_dev[col] = legacy_remove_outliers(df_dev[col])
+        per_device.append(df_dev)
+    per_device = pd.concat(per_device)
+    t_per_device = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    vectorised, removed = remove_outliers_frame(df, COLUMNS, by="device_id")
+    t_vectorised = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, removed_mad = remove_outliers_frame(df, COLUMNS, by="device_id", method="mad")
+    t_mad = time.perf_counter() - t0
+
+    a, b = vectorised[COLUMNS].to_numpy(), per_device[COLUMNS].to_numpy()
+    same_mask = (np.isnan(a) == np.isnan(b)).all()
+    max_diff = np.nanmax(np.abs(a - b))
+
+    print(f"loop, combined frame   : {t_combined:8.3f} s")
+    print(f"loop, per device       : {t_per_device:8.3f} s")
+    print(f"vectorised (sigma)     : {t_vectorised:8.3f} s   ({t_per_device / t_vectorised:.1f}× vs per-device loop)")
+    print(f"vectorised (median/MAD): {t_mad:8.3f} s")
+    print(f"same outliers as the per-device loop: {same_mask} (max |difference| {max_diff:.3g})")
+
+    print("\nPoints removed per column:")
+    print(pd.DataFrame({"sigma": removed, "mad": removed_mad}).to_string())
+
+
+if __name__ == "__main__":
+    main()
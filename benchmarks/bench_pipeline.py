@@ -0,0 +1,80 @@
+# ============================================================================
+# bench_pipeline.py — Smoothing pipeline throughput vs. worker processes
+# ============================================================================
+# Runs processing.pipeline.interpolate_meteo (outliers, Kalman, gaps,
+# discrete fill per device) on a synthetic fleet (default: 300 nodes × 30
+# days of 30-minute data) with 1, 2, 4, ... worker processes up to the
+# available CPUs, and reports rows/s and the speedup over one worker.
+# Every run must produce the same frame and Kalman state as the first.
+#
+#   python benchmarks/bench_pipeline.py [--devices 300] [--days 30] [--workers 1 2 4 8]
+# ============================================================================
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.pipeline import interpolate_meteo, resolve_workers  # noqa: E402
+
+
+def make_fleet(n_devices, days, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=days * 48, freq="30min", tz="UTC", name="time")
+    hours = np.arange(len(index)) / 2
+
+    frames = []
+    for d in range(n_devices):
+        df = pd.DataFrame(index=index)
+        df["device_id"] = f"node{d:03d}"
+        df["TempC_SHT"] = 10 + 8 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 0.7, len(index))
+        df["TempC_DS"] = df["TempC_SHT"] + 3 + rng.normal(0, 1.0, len(index))
+        df["Hum_SHT"] = 70 + 15 * np.cos(2 * np.pi * hours / 24) + rng.normal(0, 2.5, len(index))
+        df["BatV"] = 3.6 - hours / 1e4
+        df.loc[rng.random(len(index)) < 0.05, ["TempC_SHT", "TempC_DS", "Hum_SHT"]] = np.nan
+        frames.append(df)
+
+    # Interleaved by time, as the resampler hands it over
+    return pd.concat(frames).sort_index(kind="stable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline scaling benchmark")
+    parser.add_argument("--devices", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", help="worker counts (default: 1, 2, 4, ... CPUs)")
+    args = parser.parse_args()
+
+    cpus = resolve_workers(0)
+    counts = args.workers or sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= cpus], cpus})
+
+    df = make_fleet(args.devices, args.days)
+    print(f"Fleet: {args.devices} devices × {args.days} days = {len(df):,} rows, {cpus} CPUs available\n")
+
+    reference = None
+    baseline = None
+    print(f"{'workers':>7} {'seconds':>9} {'rows/s':>12} {'speedup':>8}  same result")
+    for workers in counts:
+        state = {}
+        sys.stdout = open(os.devnull, "w")  # silence the per-run progress lines
+        try:
+            t0 = time.perf_counter()
+            out = interpolate_meteo(df, kalman_state=state, workers=workers)
+            elapsed = time.perf_counter() - t0
+        finally:
+            sys.stdout.close()
+            sys.stdout = sys.__stdout__
+
+        if reference is None:
+            reference, baseline = (out, state), elapsed
+        same = out.equals(reference[0]) and state == reference[1]
+        print(f"{workers:>7} {elapsed:>9.2f} {len(df) / elapsed:>12,.0f} {baseline / elapsed:>7.2f}×  {same}")
+
+
+if __name__ == "__main__":
+    main()
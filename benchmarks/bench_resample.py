@@ -0,0 +1,104 @@
+# ============================================================================
+# bench_resample.py — groupby().resample().first() vs the epoch-bin kernel
+# ============================================================================
+# Resamples a synthetic uplink stream (default: 500 devices × 30 days at a
+# 2-minute uplink interval with jitter and dropouts, ~10M rows) to 30
+# minutes, with the pandas path that fetch_dataB.py used (groupby → resample
+# → first → MultiIndex flattening) and with processing.resample, and checks
+# that both give the same frame. Also times the per-class aggregation
+# (rain → sum), which pandas can only do with a per-column agg dict.
+#
+#   python benchmarks/bench_resample.py [--devices 500] [--days 30] [--interval 2]
+# ============================================================================
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.resample import column_aggregations, resample_frame  # noqa: E402
+
+RULE = "30min"
+
+
+def make_uplinks(n_devices, days, interval_min, seed=0):
+    rng = np.random.default_rng(seed)
+    per_device = days * 24 * 60 // interval_min
+    n = n_devices * per_device
+
+    # Regular uplinks with ±20 s jitter, ~3% dropped
+    base = np.tile(np.arange(per_device, dtype=np.int64) * interval_min * 60, n_devices)
+    seconds = base + rng.integers(-20, 21, n) + 3600
+    keep = rng.random(n) > 0.03
+
+    start = pd.Timestamp("2025-01-01", tz="UTC")
+    df = pd.DataFrame(
+        {
+            "time": start + pd.to_timedelta(seconds[keep], unit="s"),
+            "device_id": np.repeat([f"node{d:03d}" for d in range(n_devices)], per_device)[keep],
+            "TempC_SHT": rng.normal(10, 5, n)[keep],
+            "Hum_SHT": rng.normal(70, 10, n)[keep],
+            "BatV": rng.normal(3.6, 0.05, n)[keep],
+            "rain_mm": rng.exponential(0.01, n)[keep],
+            "f_cnt": rng.integers(0, 65535, n)[keep],
+        }
+    )
+    df.loc[rng.random(len(df)) < 0.02, "TempC_SHT"] = np.nan
+
+    # Received order: interleaved across devices, as the stream delivers them
+    return df.sort_values("time", kind="stable").set_index("time")
+
+
+def pandas_resample(df, how=None):
+    grouped = df.groupby("device_id").resample(RULE)
+    out = grouped.agg(how) if how else grouped.first()
+    if "device_id" in out.columns:
+        out = out.drop(columns=["device_id"])
+    return out.reset_index().set_index("time")
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def same_frame(a, b):
+    if not a.index.equals(b.index) or list(a.columns) != list(b.columns):
+        return False
+    return all(a[c].astype("float64").equals(b[c].astype("float64")) if c != "device_id" else a[c].equals(b[c]) for c in a.columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resampling kernel benchmark")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=int, default=2, help="uplink interval in minutes")
+    args = parser.parse_args()
+
+    df = make_uplinks(args.devices, args.days, args.interval)
+    print(f"Uplinks: {args.devices} devices × {args.days} days = {len(df):,} rows → {RULE} bins\n")
+
+    expected, t_pandas = timed(pandas_resample, df)
+    result, t_kernel = timed(resample_frame, df, RULE, by="device_id")
+    print(f"first, pandas : {t_pandas:8.2f} s")
+    print(f"first, kernel : {t_kernel:8.2f} s   ({t_pandas / t_kernel:.1f}×)  same result: {same_frame(expected, result)}")
+
+    how = column_aggregations([c for c in df.columns if c != "device_id"], by_class=True)
+    expected, t_pandas = timed(pandas_resample, df, how=how)
+    result, t_kernel = timed(resample_frame, df, RULE, by="device_id", by_class=True)
+    print(f"by class, pandas: {t_pandas:6.2f} s")
+    print(
+        f"by class, kernel: {t_kernel:6.2f} s   ({t_pandas / t_kernel:.1f}×)  "
+        f"same result: {np.allclose(expected.drop(columns='device_id').to_numpy(float), result.drop(columns='device_id').to_numpy(float), equal_nan=True)}"
+    )
+    print(f"\n{len(result):,} output rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# ============================================================================
+# bench_ttn_stream.py — Per-event vs streaming columnar TTN uplink decoding
+# ============================================================================
+# Decodes an SSE capture of the TTN Storage Integration with the previous
+# per-event loop (sse_events + json.loads + pd.to_datetime per uplink) and
+# with providers.ttn_stream, and checks both yield the same uplinks.
+#
+# Record a capture with:
+#   curl -sN -H "Authorization: Bearer $TTN_TOKEN" -H "Accept: text/event-stream" \
+#     "https://eu1.cloud.thethings.network/api/v3/as/applications/<app>/packages/storage/uplink_message?last=168h" \
+#     > capture.sse
+#
+#   python benchmarks/bench_ttn_stream.py [--capture capture.sse] [--uplinks 50000]
+# Without --capture a synthetic capture in the same format is generated.
+# ============================================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import ttn_stream  # noqa: E402
+
+
+# ----------------------------------------------------------------------------
+# Reference implementation (per-event loop, as previously in fetch_dataB.py)
+# ----------------------------------------------------------------------------
+
+def legacy_sse_events(lines):
+    buffer = []
+    for raw_line in lines:
+        if raw_line is None:
+            continue
+        line = raw_line.strip()
+        if line == "":
+            if buffer:
+                yield "\n".join(buffer)
+                buffer = []
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            buffer.append(line[5:].lstrip())
+        else:
+            buffer.append(line)
+    if buffer:
+        yield "\n".join(buffer)
+
+
+def legacy_decode(capture: bytes) -> pd.DataFrame:
+    rows = []
+    lines = (line.decode("utf-8") for line in capture.splitlines())
+    for event in legacy_sse_events(lines):
+        try:
+            payload = json.loads(event)
+        except json.JSONDecodeError:
+            continue
+
+        result = payload.get("result", payload)
+        uplink = result.get("uplink_message")
+        if not uplink:
+            continue
+
+        ts_parsed = pd.to_datetime(result.get("received_at"), utc=True, errors="coerce")
+        if pd.isna(ts_parsed):
+            continue
+
+        row = {
+            "device_id": result.get("end_device_ids", {}).get("device_id"),
+            "time": ts_parsed,
+            "f_cnt": uplink.get("f_cnt"),
+        }
+        decoded_payload = uplink.get("decoded_payload", {})
+        if isinstance(decoded_payload, dict):
+            row.update(decoded_payload)
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+# ----------------------------------------------------------------------------
+# Synthetic capture
+# ----------------------------------------------------------------------------
+
+def synthetic_capture(n_uplinks, n_devices=20, seed=0) -> bytes:
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    events = []
+    for i in range(n_uplinks):
+        received = start + timedelta(seconds=int(i * 1800 / n_devices))
+        message = {
+            "result": {
+                "end_device_ids": {
+                    "device_id": f"node{i % n_devices:03d}",
+                    "application_ids": {"application_id": "test-field-lora-meteoa"},
+                },
+                "received_at": received.strftime("%Y-%m-%dT%H:%M:%S.") + f"{i % 10**9:09d}Z",
+                "uplink_message": {
+                    "f_port": 2,
+                    "f_cnt": i // n_devices,
+                    "frm_payload": "y7QBcALHAX//f/8=",
+                    "decoded_payload": {
+                        "BatV": 3.02,
+                        "Bat_status": 3,
+                        "Ext_sensor": "Temperature Sensor",
+                        "Hum_SHT": round(float(rng.normal(80, 5)), 1),
+                        "TempC_DS": round(float(rng.normal(6, 2)), 2),
+                        "TempC_SHT": round(float(rng.normal(5, 2)), 2),
+                    },
+                    "rx_metadata": [{"gateway_ids": {"gateway_id": "gw-1"}, "rssi": -97, "snr": 7.5}],
+                },
+            }
+        }
+        events.append(b"data: " + json.dumps(message).encode() + b"\n\n")
+    return b"".join(events)
+
+
+def chunked(data: bytes, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--capture", help="recorded SSE capture (default: synthetic)")
+    parser.add_argument("--uplinks", type=int, default=50_000, help="size of the synthetic capture")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, "rb") as f:
+            capture = f.read()
+    else:
+        capture = synthetic_capture(args.uplinks)
+
+    print(f"Capture: {len(capture) / 1e6:.1f} MB, JSON parser: {ttn_stream._loads.__module__}")
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+
+    t_legacy, legacy = best_of(lambda: legacy_decode(capture))
+    t_stream, stream = best_of(lambda: ttn_stream.read_uplinks(chunked(capture, ttn_stream.CHUNK_SIZE)))
+
+    same = (
+        len(legacy) == len(stream)
+        and (legacy["time"].to_numpy() == stream["received_at"].to_numpy()).all()
+        and (legacy["device_id"].to_numpy() == stream["device_id"].to_numpy()).all()
+    )
+
+    print(f"uplinks         : {len(stream):,}")
+    print(f"per-event loop  : {t_legacy:8.3f} s  ({len(legacy) / t_legacy:,.0f} uplinks/s)")
+    print(f"streaming       : {t_stream:8.3f} s  ({len(stream) / t_stream:,.0f} uplinks/s)")
+    print(f"speedup         : {t_legacy / t_stream:8.1f} ×")
+    print(f"identical       : {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# ============================================================================
+# compact_data.py — Merge small Parquet fragments into right-sized files
+# ============================================================================
+# Ingest appends one small part-*.parquet fragment per run and partition.
+# This command merges each partition's fragments (sorted by time,
+# deduplicated on device/timestamp/f_cnt) and reports files and bytes
+# before and after. Run it from cron, or keep it running with --watch.
+#
+#   python compact_data.py [--root data] [--target-size-mb 64] [--watch 3600]
+# ============================================================================
+
+import argparse
+import time
+
+from storage.compaction import MIN_FRAGMENTS, ROW_GROUP_BYTES, TARGET_FILE_BYTES, compact_all
+
+MB = 1024 * 1024
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compact Parquet fragments under a data directory")
+    parser.add_argument("--root", default="data", help="directory to scan for partitions (default: data)")
+    parser.add_argument("--target-size-mb", type=float, default=TARGET_FILE_BYTES / MB,
+                        help="target size of each compacted file")
+    parser.add_argument("--row-group-mb", type=float, default=ROW_GROUP_BYTES / MB,
+                        help="target size of each row group")
+    parser.add_argument("--min-fragments", type=int, default=MIN_FRAGMENTS,
+                        help="only compact partitions with at least this many fragments")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be compacted")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep running and compact every SECONDS")
+    return parser.parse_args()
+
+
+def fmt_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def compact_once(args):
+    reports = compact_all(
+        args.root,
+        target_file_bytes=args.target_size_mb * MB,
+        row_group_bytes=args.row_group_mb * MB,
+        min_fragments=args.min_fragments,
+        dry_run=args.dry_run,
+    )
+
+    if not reports:
+        print("Nothing to compact")
+        return
+
+    for r in reports:
+        if args.dry_run:
+            print(f"[dry-run] {r['partition']}: {r['files_before']} files, "
+                  f"{fmt_bytes(r['bytes_before'])}, {r['rows_before']} → {r['rows_after']} rows")
+        else:
+            print(f"{r['partition']}: {r['files_before']} → {r['files_after']} files, "
+                  f"{fmt_bytes(r['bytes_before'])} → {fmt_bytes(r['bytes_after'])}, "
+                  f"{r['rows_before']} → {r['rows_after']} rows")
+
+    files_before = sum(r["files_before"] for r in reports)
+    bytes_before = sum(r["bytes_before"] for r in reports)
+    print("\n=== Summary ===")
+    if args.dry_run:
+        print(f"{len(reports)} partitions, {files_before} files, {fmt_bytes(bytes_before)} would be compacted")
+    else:
+        files_after = sum(r["files_after"] for r in reports)
+        bytes_after = sum(r["bytes_after"] for r in reports)
+        print(f"{len(reports)} partitions: {files_before} → {files_after} files, "
+              f"{fmt_bytes(bytes_before)} → {fmt_bytes(bytes_after)}")
+
+
+def main():
+    args = parse_args()
+
+    if args.watch is None:
+        compact_once(args)
+        return
+
+    while True:
+        compact_once(args)
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,22 @@
 # fetch_all_data.py
 
 import json
+import asyncio
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
-from providers.ttn_provider import TTNProvider
-from providers.ecowitt_provider import EcowittProvider
+from providers.http import close_sessions, get_session
+from providers.registry import provider_class
 from utils.secrets_loader import load_secrets, inject_secrets
 
 
 # ----------------------------------------------------------------------
-# Provider registry
+# Provider registry (classes are imported lazily, see providers/registry.py)
 # ----------------------------------------------------------------------
-PROVIDER_CLASSES = {
-    "ttn": TTNProvider,
-    "ecowitt": EcowittProvider,
-}
+def entry_class(entry):
+    """Provider class of a stations.json entry: its "class" path or its type."""
+    return provider_class(entry.get("type"), entry.get("class"))
 
 
 # ----------------------------------------------------------------------
@@ -53,20 +53,13 @@ def build_target_file(provider_type, provider_name):
 
 
 # ----------------------------------------------------------------------
-# Worker function for each provider
+# Provider construction
 # ----------------------------------------------------------------------
-def run_provider(entry):
+def build_provider(entry):
     provider_type = entry.get("type")
     provider_name = entry.get("name")
-    enabled = entry.get("enabled", False)
-
-    if not enabled:
-        return f"Skipped disabled provider: {provider_name}"
-
-    if provider_type not in PROVIDER_CLASSES:
-        return f"[ERROR] Unknown provider type: {provider_type}"
 
-    ProviderClass = PROVIDER_CLASSES[provider_type]
+    ProviderClass = entry_class(entry)
 
     # Metadata
     latitude = entry.get("latitude")
@@ -84,18 +77,38 @@ def run_provider(entry):
     print(f"\n=== Running provider: {provider_name} ({provider_type}) ===")
     print(f"→ Output file: {target_file}")
 
+    return ProviderClass(
+        name=provider_name,
+        target_file=str(target_file),
+        latitude=latitude,
+        longitude=longitude,
+        sensor_type=sensor_type,
+        height_m=height_m,
+        owner=owner,
+        **cfg,
+    )
+
+
+# ----------------------------------------------------------------------
+# Worker function for each provider
+# ----------------------------------------------------------------------
+def run_provider(entry):
+    provider_type = entry.get("type")
+    provider_name = entry.get("name")
+    enabled = entry.get("enabled", False)
+
+    if not enabled:
+        return f"Skipped disabled provider: {provider_name}"
+
     try:
-        provider = ProviderClass(
-            name=provider_name,
-            target_file=str(target_file),
-            latitude=latitude,
-            longitude=longitude,
-            sensor_type=sensor_type,
-            height_m=height_m,
-            owner=owner,
-            **cfg,
-        )
+        entry_class(entry)
+    except KeyError:
+        return f"[ERROR] Unknown provider type: {provider_type}"
+    except (ImportError, AttributeError) as e:
+        return f"[ERROR] Cannot load provider {provider_name}: {e}"
 
+    try:
+        provider = build_provider(entry)
         provider.run()
         return f"✓ Completed: {provider_name}"
 
@@ -104,30 +117,147 @@ def run_provider(entry):
 
 
 # ----------------------------------------------------------------------
-# Main orchestrator (parallel execution)
+# Worker function for providers sharing one fetch
 # ----------------------------------------------------------------------
-def main():
-    config = load_config()
-    providers = config.get("providers", [])
+def shared_groups(entries):
+    """
+    Enabled entries whose provider class fetches together (SHARE_FIELDS),
+    grouped by type and the values of those config fields: e.g. one
+    Storage Integration stream per TTN application, one batch per Ecowitt
+    account.
+    """
+    groups = {}
+    for entry in entries:
+        if not entry.get("enabled", False):
+            continue
+        try:
+            fields = entry_class(entry).SHARE_FIELDS
+        except (KeyError, ImportError, AttributeError):
+            continue  # reported by run_provider
+        if not fields:
+            continue
+        cfg = entry.get("config", {})
+        key = (entry.get("type"), tuple(cfg.get(field) for field in fields))
+        groups.setdefault(key, []).append(entry)
+    return list(groups.values())
+
+
+def run_shared_group(entries):
+    """Fetch a group of providers once (fetch_shared) and run each of them on its rows."""
+    results = []
+    providers = []
 
-    print(f"Starting parallel execution for {len(providers)} providers...")
+    for entry in entries:
+        try:
+            providers.append(build_provider(entry))
+        except Exception as e:
+            results.append(f"[ERROR] Provider {entry.get('name')} failed: {e}")
+
+    if not providers:
+        return results
+
+    try:
+        type(providers[0]).fetch_shared(providers)
+    except Exception as e:
+        names = ", ".join(provider.name for provider in providers)
+        return results + [f"[ERROR] Shared fetch failed for {names}: {e}"]
+
+    for provider in providers:
+        try:
+            provider.run()
+            results.append(f"✓ Completed: {provider.name}")
+        except Exception as e:
+            results.append(f"[ERROR] Provider {provider.name} failed: {e}")
+
+    return results
 
-    results = []
 
-    # Run providers in parallel threads
-    with ThreadPoolExecutor(max_workers=len(providers)) as executor:
-        future_to_provider = {
-            executor.submit(run_provider, entry): entry.get("name")
-            for entry in providers
-        }
+# ----------------------------------------------------------------------
+# Per-type concurrency limits
+# ----------------------------------------------------------------------
+def enabled_classes(providers):
+    """{type: provider class} for the enabled entries; unknown types are skipped."""
+    classes = {}
+    for entry in providers:
+        if not entry.get("enabled", False) or entry.get("type") in classes:
+            continue
+        try:
+            classes[entry.get("type")] = entry_class(entry)
+        except (KeyError, ImportError, AttributeError):
+            pass  # reported by run_provider
+    return classes
+
+
+def concurrency_limits(config):
+    """
+    Max providers of each enabled type running at once: the provider
+    class's MAX_CONCURRENCY, overridden by an optional top-level
+    "concurrency": {"ttn": 4, "ecowitt": 8} in stations.json.
+    """
+    classes = enabled_classes(config.get("providers", []))
+    limits = {ptype: cls.MAX_CONCURRENCY for ptype, cls in classes.items()}
+    limits.update({k: v for k, v in config.get("concurrency", {}).items() if k in limits})
+    return limits
+
+
+# ----------------------------------------------------------------------
+# Main orchestrator (asyncio, bounded per provider type)
+# ----------------------------------------------------------------------
+async def run_all(providers, limits):
+    """
+    Run every provider with at most limits[type] of each type in flight.
+    The blocking fetch/normalize/save of a provider runs in a worker
+    thread; threads are bounded by the sum of the limits, not by the
+    number of stations.
+    """
+    semaphores = {ptype: asyncio.Semaphore(max(1, int(n))) for ptype, n in limits.items()}
+
+    # Size each type's shared HTTP pool to its limit
+    for ptype, cls in enabled_classes(providers).items():
+        get_session(cls.__name__, pool_size=max(1, int(limits.get(ptype, cls.MAX_CONCURRENCY))))
+
+    fallback = asyncio.Semaphore(1)  # unknown types fail fast in run_provider
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, sum(limits.values()))))
+
+    async def run_one(entry):
+        async with semaphores.get(entry.get("type"), fallback):
+            try:
+                return [await asyncio.to_thread(run_provider, entry)]
+            except Exception as e:
+                return [f"[ERROR] Unexpected failure in {entry.get('name')}: {e}"]
 
-        for future in as_completed(future_to_provider):
-            provider_name = future_to_provider[future]
+    async def run_group(entries):
+        ptype = entries[0].get("type")
+        async with semaphores.get(ptype, fallback):
             try:
-                result = future.result()
-                results.append(result)
+                return await asyncio.to_thread(run_shared_group, entries)
             except Exception as e:
-                results.append(f"[ERROR] Unexpected failure in {provider_name}: {e}")
+                return [f"[ERROR] Unexpected failure in shared {ptype} fetch: {e}"]
+
+    # One fetch per TTN application / Ecowitt account, not one per station
+    groups = shared_groups(providers)
+    grouped = {id(entry) for group in groups for entry in group}
+
+    tasks = [run_group(group) for group in groups]
+    tasks += [run_one(entry) for entry in providers if id(entry) not in grouped]
+
+    results = await asyncio.gather(*tasks)
+    return [result for batch in results for result in batch]
+
+
+def main():
+    config = load_config()
+    providers = config.get("providers", [])
+    limits = concurrency_limits(config)
+
+    print(f"Starting parallel execution for {len(providers)} providers (limits: {limits})...")
+
+    try:
+        results = asyncio.run(run_all(providers, limits))
+    finally:
+        close_sessions()
 
     print("\n=== Summary ===")
     for r in results:
@@ -1,12 +1,21 @@
 # ============================================================================
 # generate_index.py — Build a professional dashboard index.html
 # ============================================================================
+import html
 import os
 from datetime import datetime, timezone
+from urllib.parse import quote, unquote
 
 DATA_DIR = "data"
 OUTPUT_FILE = "index.html"
 
+# Files that are still written on every run (paths relative to DATA_DIR).
+# The old top-level weekly/monthly/per-device Parquet files are no longer
+# updated and are not listed.
+LATEST_FILE = "latest.parquet"
+DATASET_DIR = "observations"   # device_id=<id>/year=<YYYY>/month=<MM>/part-*.parquet
+ROLLUP_DIR = "rollups"
+
 # ----------------------------------------------------------------------------
 # HTML Template
 # ----------------------------------------------------------------------------
@@ -145,8 +154,42 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 # ----------------------------------------------------------------------------
 def make_card(filename, label=None):
     """Return an HTML card for a file."""
-    label = label or filename
-    return f'<div class="card"><a href="data/{filename}" target="_blank">{label}</a></div>'
+    label = html.escape(label or filename)
+    return f'<div class="card"><a href="data/{quote(filename, safe="/=")}" target="_blank">{label}</a></div>'
+
+# ----------------------------------------------------------------------------
+def data_files():
+    """
+    (path relative to DATA_DIR, label) of the current data: latest window,
+    rollups, and the fragments of the partitioned dataset per device/month.
+    """
+    files = []
+    if os.path.isfile(os.path.join(DATA_DIR, LATEST_FILE)):
+        files.append((LATEST_FILE, "Latest 7 days"))
+
+    for dirpath, dirnames, filenames in os.walk(os.path.join(DATA_DIR, ROLLUP_DIR)):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")))
+        for name in sorted(f for f in filenames if f.endswith(".parquet") and not f.startswith(".")):
+            path = os.path.relpath(os.path.join(dirpath, name), DATA_DIR)
+            files.append((path, "Rollups: " + path[len(ROLLUP_DIR) + 1:].replace(".parquet", "")))
+
+    for dirpath, dirnames, filenames in os.walk(os.path.join(DATA_DIR, DATASET_DIR)):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")))
+        parts = sorted(f for f in filenames if f.startswith("part-") and f.endswith(".parquet"))
+        if not parts:
+            continue
+        # device_id=<id>/year=<YYYY>/month=<MM>
+        keys = dict(
+            segment.split("=", 1)
+            for segment in os.path.relpath(dirpath, os.path.join(DATA_DIR, DATASET_DIR)).split(os.sep)
+            if "=" in segment
+        )
+        label = f"{unquote(keys.get('device_id', '?'))} · {keys.get('year', '?')}-{keys.get('month', '?')}"
+        for n, name in enumerate(parts, 1):
+            path = os.path.relpath(os.path.join(dirpath, name), DATA_DIR)
+            files.append((path, label if len(parts) == 1 else f"{label} ({n}/{len(parts)})"))
+
+    return files
 
 # ----------------------------------------------------------------------------
 def main():
@@ -178,15 +221,12 @@ def main():
     else:
         plot_cards = '<div class="empty-state">No plots available yet. Run generate_plot.py first.</div>'
     
-    # Collect data files
-    data_files = [
-        f for f in all_files
-        if f.endswith(".parquet")
-    ]
-    print(f"Data files: {data_files}")
+    # Collect data files (current data only)
+    files = data_files()
+    print(f"Data files: {[path for path, _ in files]}")
     
-    if data_files:
-        data_cards = "\n".join(make_card(f) for f in sorted(data_files))
+    if files:
+        data_cards = "\n".join(make_card(path.replace(os.sep, "/"), label) for path, label in files)
     else:
         data_cards = '<div class="empty-state">No data files available yet. Run fetch_data.py first.</div>'
     
@@ -1,7 +1,9 @@
 # ============================================================================
 # generate_plot.py — Weather data plotting (Plotly HTML only)
 # ============================================================================
-# Reads Parquet files generated by fetch_data.py and produces:
+# Reads Parquet files generated by fetch_dataB.py (rolling window or
+# latest.parquet) or, without those, the LoEco provider dataset written by
+# fetch_data.py / loeco.py, and produces:
 #   - Dry Bulb + Black Bulb Temperature (HTML)
 #   - Humidity (HTML)
 #   - Battery (HTML)
@@ -10,35 +12,89 @@
 
 import os
 import pandas as pd
+import pyarrow.parquet as pq
 import plotly.express as px
 import numpy as np
 
+from storage.query import read_observations
+from storage.ring_buffer import META_FILE, RingBuffer
+
 DATA_DIR = "data"
+LATEST_WINDOW_DIR = os.path.join(DATA_DIR, "latest_window")
+LATEST_WINDOW = "7D"
+
+# Source columns used by the plots → plot names
+PLOT_COLUMNS = {
+    "TempC_SHT": "dry_bulb",     # Dry Bulb Temperature
+    "TempC_DS": "black_bulb",    # Black Bulb Temperature
+    "Hum_SHT": "hum",
+    "BatV": "bat",
+}
+
+# The same plots from LOECO_SCHEMA columns (provider dataset)
+OBSERVATION_COLUMNS = {
+    "temperature_c": "dry_bulb",
+    "black_bulb_temperature_c": "black_bulb",
+    "humidity_pct": "hum",
+    "battery_voltage_v": "bat",
+}
 
 # ----------------------------------------------------------------------------
 # Helpers
 # ----------------------------------------------------------------------------
 
 def load_latest():
-    """Load latest.parquet, normalize column names, ensure datetime index."""
+    """
+    Load the plotted columns (and device_id) of the latest window, normalize
+    column names, ensure datetime index. Reads the memory-mapped rolling window when it
+    holds plotted columns (constant size), else only the plotted columns of
+    latest.parquet, else the provider dataset (see load_observations).
+    latest.parquet is rewritten by every fetch, so it is read directly
+    rather than through the IPC cache.
+    """
+    if os.path.exists(os.path.join(LATEST_WINDOW_DIR, META_FILE)):
+        ring = RingBuffer.open(LATEST_WINDOW_DIR)
+        # Fleets without a sensor have no column for it; its plot is skipped
+        plotted = {col: name for col, name in PLOT_COLUMNS.items() if col in ring.columns}
+        if plotted:
+            df = ring.frame(columns=list(plotted)).rename(columns=plotted)
+            return df.dropna(how="all", subset=list(plotted.values())).sort_index()
+
     path = os.path.join(DATA_DIR, "latest.parquet")
     if not os.path.exists(path):
-        raise FileNotFoundError("latest.parquet not found. Run fetch_data.py first.")
+        df = load_observations()
+        if df.empty:
+            raise FileNotFoundError("No latest.parquet or observations found. Run fetch_data.py first.")
+        return df
 
-    df = pd.read_parquet(path)
+    available = set(pq.read_schema(path).names)
+    columns = [col for col in [*PLOT_COLUMNS, "device_id"] if col in available]
+
+    df = pd.read_parquet(path, columns=columns)
     df.index = pd.to_datetime(df.index)
 
     # Normalize column names
-    df = df.rename(columns={
-        "TempC_SHT": "dry_bulb",     # Dry Bulb Temperature
-        "TempC_DS": "black_bulb",    # Black Bulb Temperature
-        "Hum_SHT": "hum",
-        "BatV": "bat"
-    })
+    df = df.rename(columns=PLOT_COLUMNS)
 
     return df.sort_index()
 
 
+def load_observations(window=LATEST_WINDOW):
+    """
+    The plotted columns of the last `window` of the provider dataset, per
+    station. Only those columns of the months overlapping the window are
+    decoded (read_observations); closed months come from the IPC cache.
+    """
+    start = pd.Timestamp.now(tz="UTC") - pd.Timedelta(window)
+    df = read_observations(columns=list(OBSERVATION_COLUMNS), start=start, root=DATA_DIR, cache=True)
+
+    df = df.rename(columns={**OBSERVATION_COLUMNS, "station": "device_id"})
+    df["device_id"] = df["device_id"].astype(str)
+    df = df.set_index(pd.DatetimeIndex(df.pop("timestamp"), name="time"))
+
+    return df.dropna(how="all", subset=list(OBSERVATION_COLUMNS.values())).sort_index()
+
+
 def ensure_output_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -71,6 +127,34 @@ def compute_dewpoint(df):
 # Plotly HTML Plots
 # ----------------------------------------------------------------------------
 
+def line_figure(df, y, title, labels):
+    """Line plot over time; one trace per device (and variable) when several devices report."""
+    if "device_id" not in df.columns or df["device_id"].nunique() <= 1:
+        return px.line(df, x=df.index, y=y, title=title, labels=labels)
+
+    columns = y if isinstance(y, list) else [y]
+    time_col = df.index.name or "index"
+    long = (
+        df.reset_index()
+        .melt(id_vars=[time_col, "device_id"], value_vars=columns, var_name="variable")
+        .dropna(subset=["value"])
+    )
+    long["series"] = long["device_id"] if len(columns) == 1 else long["device_id"] + " · " + long["variable"]
+
+    return px.line(
+        long,
+        x=time_col,
+        y="value",
+        color="series",
+        title=title,
+        labels={
+            **labels,
+            time_col: labels.get("index", time_col),
+            "value": labels.get("value", labels.get(columns[0], "value")),
+        },
+    )
+
+
 def plotly_temperature_html(df):
     required = ["dry_bulb", "black_bulb"]
     missing = [c for c in required if c not in df.columns]
@@ -78,12 +162,11 @@ def plotly_temperature_html(df):
         print(f"Skipping temperature HTML — missing columns: {missing}")
         return
 
-    fig = px.line(
+    fig = line_figure(
         df,
-        x=df.index,
         y=["dry_bulb", "black_bulb"],
         title="Dry Bulb & Black Bulb Temperature (Interactive)",
-        labels={"value": "Temperature (°C)", "index": "Time (UTC)"}
+        labels={"value": "Temperature (°C)", "index": "Time (UTC)"},
     )
     out_path = os.path.join(DATA_DIR, "plot_temperature.html")
     fig.write_html(out_path)
@@ -95,12 +178,11 @@ def plotly_humidity_html(df):
         print("Skipping humidity HTML — no 'hum' column found.")
         return
 
-    fig = px.line(
+    fig = line_figure(
         df,
-        x=df.index,
         y="hum",
         title="Humidity (Interactive)",
-        labels={"hum": "Humidity (%)", "index": "Time (UTC)"}
+        labels={"hum": "Humidity (%)", "index": "Time (UTC)"},
     )
     out_path = os.path.join(DATA_DIR, "plot_humidity.html")
     fig.write_html(out_path)
@@ -112,12 +194,11 @@ def plotly_battery_html(df):
         print("Skipping battery HTML — no 'bat' column found.")
         return
 
-    fig = px.line(
+    fig = line_figure(
         df,
-        x=df.index,
         y="bat",
         title="Battery Voltage (Interactive)",
-        labels={"bat": "Battery (V)", "index": "Time (UTC)"}
+        labels={"bat": "Battery (V)", "index": "Time (UTC)"},
     )
     out_path = os.path.join(DATA_DIR, "plot_battery.html")
     fig.write_html(out_path)
@@ -129,12 +210,11 @@ def plotly_dewpoint_html(df):
         print("Skipping dewpoint HTML — no dewpoint column found.")
         return
 
-    fig = px.line(
+    fig = line_figure(
         df,
-        x=df.index,
         y="dewpoint",
         title="Dewpoint (Interactive)",
-        labels={"dewpoint": "Dewpoint (°C)", "index": "Time (UTC)"}
+        labels={"dewpoint": "Dewpoint (°C)", "index": "Time (UTC)"},
     )
     out_path = os.path.join(DATA_DIR, "plot_dewpoint.html")
     fig.write_html(out_path)
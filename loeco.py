@@ -0,0 +1,433 @@
+# ============================================================================
+# loeco.py — LoEco command line (one-shot run or long-running daemon)
+# ============================================================================
+#   python loeco.py run                       # one pass over stations.json (= fetch_data.py)
+#   python loeco.py serve [--flush 300]       # keep running, poll on intervals
+#   python loeco.py listen                    # streaming providers (ttn_mqtt) only
+#
+# `serve` builds every enabled provider once and keeps it in memory, with its
+# pooled HTTP session and fetch cursor, instead of cold-starting Python,
+# re-importing pandas and re-reading state for every run. Each provider is
+# polled on its own interval (stations.json "interval", e.g. "5min", default
+# --interval); collected rows are buffered and flushed to Parquet every
+# --flush seconds and on shutdown (SIGINT/SIGTERM). Every cycle logs its
+# latency, next to the startup cost a cold-start run pays each time (config,
+# providers, sessions; benchmarks/bench_import.py measures the imports).
+#
+# Saved rows then go through the fetch_dataB processing (30-minute resample,
+# outliers, Kalman, gaps) with the filter state and the recent raw rows held
+# in memory: the Kalman state is loaded once at startup and persisted after
+# every flush, the rolling window stays open, and each device's last
+# CONTEXT of raw rows is kept as outlier context instead of being refetched.
+# Raw rows are saved like any other run; the smoothed dataset, rollups,
+# window and Kalman state go under data/daemon/ so they never share files
+# (or the filter state) with a fetch_dataB run over the same raw rows.
+# ============================================================================
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import fetch_data
+from processing.interpolate import MASK_ATTR, load_mask_order, save_mask_order
+from processing.pipeline import interpolate_meteo
+from processing.resample import resample_frame
+from providers.http import close_sessions, get_session
+from storage.dataset import append_partitioned
+from storage.ring_buffer import RingBuffer
+from storage.rollups import update_rollups
+from utils.state_store import load_state, save_state
+
+DEFAULT_INTERVAL = "30min"
+DEFAULT_FLUSH_SECONDS = 300
+
+# Processing of the saved rows (same layout as fetch_dataB, own subtree)
+DATA_DIR = "data"
+DAEMON_DIR = "daemon"
+RESAMPLE_RULE = "30min"
+LATEST_WINDOW = "7D"
+CONTEXT = "6h"  # raw rows kept per device as context for the next flush
+
+
+# ============================================================================
+# DAEMON
+# ============================================================================
+
+class Daemon:
+    """
+    Long-running scheduler over the stations.json providers.
+
+    Providers are built once; each is collected (fetch → normalize) when its
+    interval is due, providers sharing a stream (TTN applications) are
+    fetched together, and buffered rows are saved on every flush. Saved
+    rows are then smoothed with the Kalman state and recent rows kept in
+    memory (see process).
+    """
+
+    def __init__(self, config, default_interval=DEFAULT_INTERVAL, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 metrics_path=None, data_dir=DATA_DIR, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.limits = fetch_data.concurrency_limits(config)
+        self.flush_seconds = flush_seconds
+        self.metrics_path = metrics_path
+
+        root = os.path.join(data_dir, DAEMON_DIR)
+        self.kalman_state_path = os.path.join(root, "kalman_state.json")
+        self.dataset_dir = os.path.join(root, "observations")
+        self.rollup_dir = os.path.join(root, "rollups")
+        self.window_dir = os.path.join(root, "latest_window")
+
+        # Loaded once; process() keeps it current and persists it on flush
+        self.kalman_state = load_state(self.kalman_state_path)
+        self.recent = None   # last CONTEXT of raw rows per device
+        self.pending = []    # saved rows not processed yet
+        self.window = None   # open RingBuffer
+
+        self.providers = {}
+        self.types = {}
+        self.intervals = {}
+        self.buffers = {}
+
+        for entry in config.get("providers", []):
+            if not entry.get("enabled", False):
+                continue
+            try:
+                provider = fetch_data.build_provider(entry)
+            except Exception as e:
+                print(f"[ERROR] Provider {entry.get('name')} not started: {e}")
+                continue
+
+            self.providers[provider.name] = provider
+            self.types[provider.name] = entry.get("type")
+            self.intervals[provider.name] = pd.Timedelta(entry.get("interval", default_interval)).total_seconds()
+            self.buffers[provider.name] = []
+
+        self.cycle_latencies = []
+        self.startup_seconds = None
+        self.semaphores = {}
+        self.stopping = None
+
+    # ---------------------------------------------------------
+    # Collect
+    # ---------------------------------------------------------
+    def _collect_group(self, providers):
+        """Collect providers that share one fetch; returns rows collected."""
+        rows = 0
+        if providers[0].share_key is not None:
+            type(providers[0]).fetch_shared(providers)
+
+        for provider in providers:
+            try:
+                df = provider.collect()
+            except Exception as e:
+                print(f"[ERROR] Collecting {provider.name} failed: {e}")
+                continue
+            if df is not None:
+                self.buffers[provider.name].append(df)
+                rows += len(df)
+        return rows
+
+    async def collect(self, names):
+        """Collect the due providers concurrently, bounded per provider type."""
+        groups = {}
+        for name in names:
+            provider = self.providers[name]
+            key = provider.share_key if provider.share_key is not None else ("", name)
+            groups.setdefault((type(provider), key), []).append(provider)
+
+        async def run_group(providers):
+            async with self.semaphores[self.types[providers[0].name]]:
+                try:
+                    return await asyncio.to_thread(self._collect_group, providers)
+                except Exception as e:
+                    names = ", ".join(p.name for p in providers)
+                    print(f"[ERROR] Collecting {names} failed: {e}")
+                    return 0
+
+        return sum(await asyncio.gather(*(run_group(group) for group in groups.values())))
+
+    # ---------------------------------------------------------
+    # Flush
+    # ---------------------------------------------------------
+    def flush(self):
+        """
+        Save every provider's buffered rows, then process what was saved.
+        Failed saves stay buffered.
+        """
+        written = 0
+        for name, frames in self.buffers.items():
+            if not frames:
+                continue
+            provider = self.providers[name]
+            try:
+                df = pd.concat(frames, ignore_index=True)
+                written += provider.save(df)
+                provider.commit()
+                frames.clear()
+                self.pending.append(df)
+            except Exception as e:
+                print(f"[ERROR] Flushing {name} failed, keeping {len(frames)} batches buffered: {e}")
+        print(f"✓ Flushed {written} rows")
+
+        if self.pending:
+            try:
+                self.process(pd.concat(self.pending, ignore_index=True))
+                self.pending.clear()
+            except Exception as e:
+                print(f"[ERROR] Processing failed, retrying {len(self.pending)} batches on the next flush: {e}")
+        return written
+
+    # ---------------------------------------------------------
+    # Processing
+    # ---------------------------------------------------------
+    @staticmethod
+    def _device_frame(df):
+        """Saved (LoEco schema) rows as a time-indexed frame of numeric columns per device."""
+        df = df.dropna(subset=["timestamp", "station"]).drop_duplicates(subset=["station", "timestamp"], keep="last")
+        out = df.drop(columns=["schema_version"], errors="ignore").select_dtypes("number").dropna(axis=1, how="all")
+        out.index = pd.DatetimeIndex(pd.to_datetime(df["timestamp"], utc=True), name="time")
+        out["device_id"] = df["station"].astype(str).to_numpy()
+        return out
+
+    def process(self, saved):
+        """
+        Smooth saved rows like fetch_dataB does, without reloading anything:
+        the rows are resampled together with the last CONTEXT of raw rows
+        per device, run through interpolate_meteo with the in-memory Kalman
+        state (wind directions and station metadata pass through unchanged,
+        see processing.pipeline.classify_columns), and the newly smoothed
+        rows are appended to the dataset, rollups and the open rolling
+        window. The state is only kept (and
+        persisted) once the rows are written. Returns the rows written.
+        """
+        raw = self._device_frame(saved)
+        if self.recent is not None:
+            raw = pd.concat([self.recent, raw])
+            raw = raw[~pd.MultiIndex.from_arrays([raw["device_id"], raw.index]).duplicated(keep="last")]
+        if raw.empty:
+            return 0
+
+        resampled = resample_frame(raw, RESAMPLE_RULE, by="device_id")
+
+        state = dict(self.kalman_state)
+        df_final = interpolate_meteo(resampled, kalman_state=state, mask_columns=load_mask_order(self.dataset_dir))
+        save_mask_order(self.dataset_dir, df_final.attrs[MASK_ATTR])
+
+        df_written = append_partitioned(self.dataset_dir, df_final)
+        if os.path.isdir(self.rollup_dir):
+            update_rollups(self.rollup_dir, df_written)
+
+        if not df_final.empty:
+            devices = sorted(df_final["device_id"].dropna().unique())
+            columns = list(df_final.drop(columns=["device_id"]).select_dtypes("number").columns)
+            if self.window is None or not (set(devices) <= set(self.window.devices)
+                                           and set(columns) <= set(self.window.columns)):
+                if self.window is not None:
+                    self.window.close()
+                self.window = RingBuffer.open_or_create(
+                    self.window_dir, devices=devices, columns=columns, window=LATEST_WINDOW, resolution=RESAMPLE_RULE
+                )
+            self.window.update(df_final)
+            self.window.flush()
+
+        self.kalman_state = state
+        save_state(self.kalman_state_path, self.kalman_state)
+
+        times = pd.Series(raw.index)
+        newest = times.groupby(raw["device_id"].to_numpy()).transform("max")
+        self.recent = raw[(times > newest - pd.Timedelta(CONTEXT)).to_numpy()]
+
+        print(f"✓ Processed {len(df_final)} rows ({len(df_written)} new in {self.dataset_dir})")
+        return len(df_written)
+
+    def close(self):
+        if self.window is not None:
+            self.window.close()
+            self.window = None
+
+    # ---------------------------------------------------------
+    # Metrics
+    # ---------------------------------------------------------
+    def record(self, cycle, providers, rows, latency, flushed=None):
+        self.cycle_latencies.append(latency)
+        metric = {
+            "cycle": cycle,
+            "time": pd.Timestamp.now(tz="UTC").isoformat(),
+            "providers": providers,
+            "rows": rows,
+            "latency_s": round(latency, 4),
+            "flushed_rows": flushed,
+        }
+        print(f"[cycle {cycle}] {providers} providers, {rows} rows in {latency:.3f} s")
+        if self.metrics_path:
+            with open(self.metrics_path, "a") as f:
+                f.write(json.dumps(metric) + "\n")
+
+    def summary(self):
+        print("\n=== Daemon summary ===")
+        print(f"startup (config, providers, sessions): {self.startup_seconds:.3f} s — paid by every cold-start run")
+        if self.cycle_latencies:
+            latencies = sorted(self.cycle_latencies)
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            print(f"cycles: {len(latencies)}, median {statistics.median(latencies):.3f} s, p95 {p95:.3f} s")
+            print(f"cold-start run ≈ startup + cycle = {self.startup_seconds + statistics.median(latencies):.3f} s")
+
+    # ---------------------------------------------------------
+    # Main loop
+    # ---------------------------------------------------------
+    async def serve(self, max_cycles=None):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, sum(self.limits.values()))))
+
+        self.stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. not in the main thread
+
+        for name, provider in self.providers.items():
+            limit = max(1, int(self.limits.get(self.types[name], 1)))
+            self.semaphores.setdefault(self.types[name], asyncio.Semaphore(limit))
+            get_session(type(provider).__name__, pool_size=limit)
+
+        self.startup_seconds = time.perf_counter() - self.started
+        print(f"Serving {len(self.providers)} providers (startup {self.startup_seconds:.3f} s, "
+              f"flush every {self.flush_seconds} s)")
+
+        now = time.monotonic()
+        next_due = {name: now for name in self.providers}
+        next_flush = now + self.flush_seconds
+        cycle = 0
+
+        while not self.stopping.is_set() and self.providers:
+            now = time.monotonic()
+            due = [name for name, at in next_due.items() if at <= now]
+
+            if due:
+                cycle += 1
+                t0 = time.perf_counter()
+                rows = await self.collect(due)
+                flushed = None
+                if time.monotonic() >= next_flush:
+                    flushed = await asyncio.to_thread(self.flush)
+                    next_flush = time.monotonic() + self.flush_seconds
+                self.record(cycle, len(due), rows, time.perf_counter() - t0, flushed)
+
+                for name in due:
+                    next_due[name] = now + self.intervals[name]
+
+                if max_cycles is not None and cycle >= max_cycles:
+                    break
+            elif time.monotonic() >= next_flush:
+                await asyncio.to_thread(self.flush)
+                next_flush = time.monotonic() + self.flush_seconds
+
+            wake = min(min(next_due.values()), next_flush)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=max(0.0, wake - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+        await asyncio.to_thread(self.flush)
+        self.close()
+        self.summary()
+
+
+# ============================================================================
+# STREAMING PROVIDERS
+# ============================================================================
+
+def listen(config):
+    """
+    Run every enabled streaming provider (one with serve_forever, e.g.
+    ttn_mqtt) in its own thread, flushing on its size/time thresholds,
+    until SIGINT/SIGTERM.
+    """
+    providers = []
+    for entry in config.get("providers", []):
+        if not entry.get("enabled", False):
+            continue
+        try:
+            if hasattr(fetch_data.entry_class(entry), "serve_forever"):
+                providers.append(fetch_data.build_provider(entry))
+        except Exception as e:
+            print(f"[ERROR] Provider {entry.get('name')} not started: {e}")
+
+    if not providers:
+        print("No streaming providers enabled")
+        return
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    threads = [
+        threading.Thread(target=provider.serve_forever, args=(stop,), name=provider.name)
+        for provider in providers
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"Listening with {len(threads)} streaming providers")
+
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1.0)
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="loeco", description="LoEco weather data collector")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("run", help="fetch every enabled provider once and exit")
+
+    stream = sub.add_parser("listen", help="run streaming providers (ttn_mqtt) with size/time flushes")
+    stream.add_argument("--config", default="stations.json")
+
+    serve = sub.add_parser("serve", help="run as a daemon, polling each provider on its interval")
+    serve.add_argument("--config", default="stations.json")
+    serve.add_argument("--interval", default=DEFAULT_INTERVAL,
+                       help="default polling interval per provider (default: 30min)")
+    serve.add_argument("--flush", type=float, default=DEFAULT_FLUSH_SECONDS,
+                       help="seconds between Parquet flushes (default: 300)")
+    serve.add_argument("--metrics", help="append per-cycle metrics as JSON lines to this file")
+    serve.add_argument("--cycles", type=int, help="stop after this many cycles (for testing)")
+
+    return parser.parse_args()
+
+
+def main():
+    started = time.perf_counter()
+    args = parse_args()
+
+    if args.command == "run":
+        fetch_data.main()
+        return
+
+    if args.command == "listen":
+        listen(fetch_data.load_config(args.config))
+        return
+
+    config = fetch_data.load_config(args.config)
+    daemon = Daemon(config, default_interval=args.interval, flush_seconds=args.flush, metrics_path=args.metrics,
+                    started=started)
+    try:
+        asyncio.run(daemon.serve(max_cycles=args.cycles))
+    finally:
+        close_sessions()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# processing/interpolate.py
+
+"""
+Gap-aware interpolation with an explicit mask of filled values.
+
+A gap is a run of consecutive missing samples in one column of one device.
+Its duration is the time the run covers on the device's sampling grid: the
+time between the readings on either side minus one sampling step (4 missing
+30-minute samples = 2 hours). Only gaps of up to `max_gap` are filled, and
+always entirely, so a 2-hour gap is interpolated while a 2-day outage stays
+empty instead of getting its first and last hours made up:
+
+    interior gaps : linear in time between the readings on either side
+    leading/trailing runs : held at the nearest reading
+
+All columns of a device are handled in one vectorised pass: the previous
+and next reading of every sample come from running max/min accumulations
+over a (columns × rows) array, sharing the device's timestamps and step.
+
+Filled values are flagged in a uint64 bitmask column (MASK_COLUMN): bit i
+is set when the i-th column of the mask order was filled in that row. The
+mask order is append-only (mask_order): a column keeps its bit for good
+and new columns take the next free ones, so masks written by different
+runs and devices decode with the same order. It is stored in
+df.attrs[MASK_ATTR] and, for a dataset on disk, in MASK_FILE at the
+dataset root (load_mask_order / save_mask_order), since Parquet does not
+keep DataFrame.attrs. `interpolated()` decodes the mask back into boolean
+columns.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.state_store import load_state, save_state
+
+
+# Longest gap that is filled (4 missing 30-minute samples)
+MAX_GAP = pd.Timedelta("2h")
+
+# Bitmask column of interpolated values, and the attrs key with its column order
+MASK_COLUMN = "interp_mask"
+MASK_ATTR = "interp_mask_columns"
+
+# One fixed type, so every fragment of a dataset stores the same mask type
+MASK_DTYPE = np.uint64
+MASK_BITS = np.iinfo(MASK_DTYPE).bits
+
+# Mask order of a dataset, next to its partitions (readers skip "_" files)
+MASK_FILE = "_interp_mask.json"
+
+
+def mask_order(columns, known=()):
+    """
+    Bit order for `columns`: the `known` order, with the columns it does
+    not have yet appended, so existing bits never move.
+    """
+    order = list(known)
+    order += [col for col in columns if col not in order]
+    if len(order) > MASK_BITS:
+        raise ValueError(f"Interpolation mask supports at most {MASK_BITS} columns, got {len(order)}")
+    return order
+
+
+def load_mask_order(root):
+    """Mask order stored for the dataset at `root` ([] when there is none)."""
+    return load_state(os.path.join(root, MASK_FILE)).get("columns", [])
+
+
+def save_mask_order(root, order):
+    """Store the mask order of the dataset at `root`."""
+    save_state(os.path.join(root, MASK_FILE), {"columns": list(order)})
+
+
+# ============================================================================
+# GAP FILLING
+# ============================================================================
+
+def sampling_step(times):
+    """Typical spacing of int64 timestamps (median difference), 0 for fewer than two."""
+    if len(times) < 2:
+        return 0
+    return int(np.median(np.diff(times)))
+
+
+def fill_gaps(values, times, max_gap, step=None):
+    """
+    Fill the gaps of every lane of `values` (columns × rows, rows in time
+    order) that last at most `max_gap`.
+
+    Parameters:
+    -----------
+    values : np.ndarray (float64, columns × rows)
+        Samples with NaN for missing values.
+    times : np.ndarray (int64)
+        Timestamps of the rows.
+    max_gap : int
+        Longest gap to fill, in the units of `times`.
+    step : int, optional
+        Sampling step in the units of `times`; defaults to the median spacing.
+
+    Returns:
+    --------
+    (np.ndarray, np.ndarray)
+        Filled copy of `values` and a boolean array of the filled positions.
+    """
+    n_cols, n_rows = values.shape
+    filled = values.copy()
+    if n_rows == 0:
+        return filled, np.zeros(values.shape, dtype=bool)
+
+    step = sampling_step(times) if step is None else step
+    missing = np.isnan(values)
+    fill = np.zeros(values.shape, dtype=bool)
+    rows = np.arange(n_rows)
+
+    # Previous / next reading of every sample (-1 / n_rows where there is none)
+    prev = np.maximum.accumulate(np.where(missing, -1, rows), axis=1)
+    next_ = np.minimum.accumulate(np.where(missing, n_rows, rows)[:, ::-1], axis=1)[:, ::-1]
+
+    # Everything else only concerns the missing samples
+    lane, row = np.nonzero(missing)
+    prev, next_ = prev[lane, row], next_[lane, row]
+    has_prev, has_next = prev >= 0, next_ < n_rows
+    inside = has_prev & has_next
+
+    t_prev = times[np.maximum(prev, 0)]
+    t_next = times[np.minimum(next_, n_rows - 1)]
+
+    # Duration of the run each missing sample belongs to
+    duration = np.where(inside, t_next - t_prev - step, np.where(has_next, t_next - times[0], times[-1] - t_prev))
+    ok = (has_prev | has_next) & (duration <= max_gap)
+    if not ok.any():
+        return filled, fill
+
+    lane, row, prev, next_, inside = lane[ok], row[ok], prev[ok], next_[ok], inside[ok]
+    t_prev, t_next = t_prev[ok], t_next[ok]
+
+    # Edge runs hold the nearest reading; interior gaps are linear in time
+    v_prev = values[lane, np.where(prev >= 0, prev, next_)]
+    v_next = values[lane, np.where(next_ < n_rows, next_, prev)]
+    weight = np.zeros(len(row))
+    weight[inside] = (times[row[inside]] - t_prev[inside]) / (t_next[inside] - t_prev[inside])
+
+    filled[lane, row] = v_prev + (v_next - v_prev) * weight
+    fill[lane, row] = True
+    return filled, fill
+
+
+def interpolate_gaps(
+    df: pd.DataFrame, columns, max_gap=MAX_GAP, mask_column=MASK_COLUMN, order=None
+) -> pd.DataFrame:
+    """
+    Fill short gaps in `columns` of a single device's time-ordered frame and
+    add the bitmask column of filled values.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame with DatetimeIndex
+        Samples of one device, in time order.
+    columns : list of str
+        Continuous columns to interpolate.
+    max_gap : str or pd.Timedelta
+        Longest gap to fill.
+    mask_column : str
+        Name of the mask column.
+    order : list of str, optional
+        Known mask order (see mask_order); bit i of the mask is the i-th
+        column of the resulting order. Defaults to `columns`.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Copy of `df` with the gaps filled and `mask_column` added.
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError("DatetimeIndex required for time interpolation")
+
+    columns = [c for c in columns if c in df.columns]
+    order = mask_order(columns, order or ())
+    mask = np.zeros(len(df), dtype=MASK_DTYPE)
+    data = {col: df[col] for col in df.columns if col != mask_column}
+
+    if columns and len(df):
+        times = df.index.as_unit("ns").asi8
+        values = np.ascontiguousarray(df[columns].to_numpy(dtype="float64", na_value=np.nan).T)
+        filled, fill = fill_gaps(values, times, pd.Timedelta(max_gap).value)
+
+        for i in np.flatnonzero(fill.any(axis=1)):
+            data[columns[i]] = filled[i]
+            mask |= fill[i].astype(MASK_DTYPE) << MASK_DTYPE(order.index(columns[i]))
+
+    data[mask_column] = mask
+    out = pd.DataFrame(data, index=df.index)
+    out.attrs = {**df.attrs, MASK_ATTR: order}
+    return out
+
+
+def interpolated(df: pd.DataFrame, mask_column=MASK_COLUMN, order=None) -> pd.DataFrame:
+    """
+    Boolean frame of the interpolated values, decoded from the mask column
+    with `order` (e.g. load_mask_order(root) for rows read back from a
+    dataset), by default df.attrs[MASK_ATTR].
+    """
+    columns = order if order is not None else df.attrs.get(MASK_ATTR, [])
+    mask = df[mask_column].fillna(0).to_numpy(dtype=np.uint64)
+    return pd.DataFrame(
+        {col: (mask >> np.uint64(i)) & np.uint64(1) == 1 for i, col in enumerate(columns)},
+        index=df.index,
+    )
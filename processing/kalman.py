@@ -0,0 +1,298 @@
+# processing/kalman.py
+
+"""
+Time-aware Kalman smoothing for LoEco sensor series.
+
+The filter runs on NumPy arrays rather than sample by sample: every
+(device, column) series becomes one "lane" of a 2D array and the gain
+recurrence is advanced for all lanes at once, so the Python-level loop is
+over time steps only, never over devices or columns. Results are written
+back into the frame in a single assignment.
+
+The filter state of every series can be persisted between runs, so a run
+only filters samples it has not seen before and continues the recursion.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================================
+# SENSOR-SPECIFIC PARAMETERS
+# ============================================================================
+
+SENSOR_PARAMS = {
+    "tempc_sht": {"Q_base": 0.01, "R": 0.5},   # Dry bulb temp: slow changes
+    "tempc_ds": {"Q_base": 0.02, "R": 0.8},    # Black bulb: faster response to sun
+    "hum_sht": {"Q_base": 0.05, "R": 2.0},     # Humidity: more variable
+    "press": {"Q_base": 0.001, "R": 0.1},      # Pressure: very stable
+    "wind": {"Q_base": 0.5, "R": 5.0},         # Wind: highly variable
+    "rain": {"Q_base": 0.1, "R": 0.5},         # Rain: step changes
+}
+
+DEFAULT_PARAMS = {"Q_base": 0.01, "R": 1.0}
+
+
+def get_sensor_params(col_name: str) -> dict:
+    """Get Kalman parameters for a specific sensor."""
+    col_lower = col_name.lower()
+
+    for key, params in SENSOR_PARAMS.items():
+        if key in col_lower:
+            return params
+
+    # Default parameters
+    return DEFAULT_PARAMS
+
+
+# ============================================================================
+# ARRAY-LEVEL GAIN RECURRENCE
+# ============================================================================
+
+def kalman_lanes(values, times, lengths, Q_base, R, x0=None, P0=None, t0=None):
+    """
+    Run the time-aware 1D Kalman filter over many independent lanes at once.
+
+    Parameters:
+    -----------
+    values : np.ndarray, shape (lanes, steps)
+        Observations per lane, packed to the left (no NaNs inside a lane).
+    times : np.ndarray, shape (lanes, steps)
+        Observation times in int64 nanoseconds, packed like `values`.
+    lengths : np.ndarray, shape (lanes,)
+        Number of valid observations per lane, sorted in descending order.
+    Q_base, R : np.ndarray, shape (lanes,)
+        Process noise per hour and measurement noise per lane.
+    x0, P0, t0 : np.ndarray, shape (lanes,), optional
+        Filter state to resume from (estimate, uncertainty, time of the last
+        filtered sample in ns). Lanes with NaN `x0` start fresh.
+
+    Returns:
+    --------
+    (out, x_est, P)
+        Filtered values (same shape as `values`) and the final state per lane.
+    """
+    n_lanes, n_steps = values.shape
+    out = np.full((n_lanes, n_steps), np.nan)
+
+    if n_lanes == 0 or n_steps == 0:
+        return out, np.full(n_lanes, np.nan), np.full(n_lanes, np.nan)
+
+    # Initialize: first observation, uncertainty = measurement noise,
+    # unless the lane resumes from a previous run
+    x_est = values[:, 0].astype(float)
+    P = R.astype(float)
+
+    resumed = np.zeros(n_lanes, dtype=bool) if x0 is None else ~np.isnan(x0)
+    if resumed.any():
+        x_est[resumed] = x0[resumed]
+        P[resumed] = P0[resumed]
+
+    # Lanes are sorted by length, so the active lanes at step k are a prefix
+    n_active = np.searchsorted(-lengths, -np.arange(n_steps), side="left")
+
+    for k in range(n_steps):
+        n = n_active[k]
+
+        # Time delta (in hours) for time-varying process noise
+        if k > 0:
+            dt = (times[:n, k] - times[:n, k - 1]) / 1e9 / 3600
+            dt = np.maximum(dt, 0.01)  # Avoid division by zero
+        elif resumed.any():
+            dt = np.full(n, 0.5)  # Default 30 min for first point
+            dt_resumed = (times[:n, 0] - t0[:n]) / 1e9 / 3600
+            dt[resumed[:n]] = np.maximum(dt_resumed[resumed[:n]], 0.01)
+        else:
+            dt = 0.5  # Default 30 min for first point
+
+        # Prediction step
+        x_pred = x_est[:n]
+        P_pred = P[:n] + Q_base[:n] * dt
+
+        # Update step (Kalman gain)
+        K = P_pred / (P_pred + R[:n])
+        x_est[:n] = x_pred + K * (values[:n, k] - x_pred)
+        P[:n] = (1 - K) * P_pred
+
+        out[:n, k] = x_est[:n]
+
+    return out, x_est, P
+
+
+# ============================================================================
+# PERSISTED FILTER STATE
+# ============================================================================
+
+def state_key(col: str, device=None) -> str:
+    """Key of one filtered series in the persisted state dict."""
+    return col if device is None else f"{device}/{col}"
+
+
+def _to_ns(ts) -> int:
+    return pd.Timestamp(ts).as_unit("ns").value
+
+
+def filtered_until(state, device=None):
+    """
+    Latest `last_ts` among the persisted series of `device` (un-prefixed
+    keys when None), as a UTC timestamp, or None when it has no state.
+    Rows up to it were filtered, and returned, by an earlier run.
+    """
+    prefix = f"{device}/" if device is not None else None
+    stamps = [
+        _to_ns(entry["last_ts"])
+        for key, entry in (state or {}).items()
+        if (key.startswith(prefix) if prefix is not None else "/" not in key)
+    ]
+    return pd.Timestamp(max(stamps), tz="UTC") if stamps else None
+
+
+# ============================================================================
+# FRAME-LEVEL SMOOTHING
+# ============================================================================
+
+def kalman_smooth_frame(df: pd.DataFrame, columns, by=None, params=None, state=None) -> pd.DataFrame:
+    """
+    Apply the time-aware Kalman filter to several columns (and devices) at once.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame with DatetimeIndex
+        Sensor data in time order.
+    columns : list of str
+        Columns to smooth.
+    by : str, optional
+        Column identifying independent series (e.g. "device_id"). When None,
+        each column is filtered as a single series over the whole frame.
+    params : dict, optional
+        Column → {"Q_base", "R"} overrides; defaults to `get_sensor_params`.
+    state : dict, optional
+        Persisted filter state keyed by `state_key`. Series with an entry
+        only filter samples newer than its `last_ts` and continue the
+        recursion from `x_est`/`P`; the dict is updated in place.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Copy of `df` with the smoothed columns replaced. Rows at or before
+        a resumed series' `last_ts` are not filtered again and keep their
+        raw values: they are context only (e.g. a re-fetched overlap), and
+        callers must drop them from what they store (see `filtered_until`).
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError("DatetimeIndex required for Kalman smoothing")
+
+    params = params or {}
+    times_ns = df.index.as_unit("ns").asi8
+
+    # Row positions of each independent series, in frame order
+    if by is None:
+        keys = np.zeros(len(df), dtype=np.int64)
+        groups = [np.arange(len(df))]
+    else:
+        keys, _ = pd.factorize(df[by])
+        order = np.argsort(keys, kind="stable")
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        groups = [g for g in np.split(order, bounds) if len(g)]
+
+    # Handle duplicate indices by keeping first occurrence
+    duplicated = pd.MultiIndex.from_arrays([keys, times_ns]).duplicated(keep="first")
+    if duplicated.any():
+        print(f"Warning: {duplicated.sum()} duplicate timestamps found, keeping first occurrence")
+
+    # Build one lane per (column, series) with enough observations
+    arrays = {}
+    lanes = []
+    for col in columns:
+        arr = df[col].to_numpy(dtype=float, na_value=np.nan)
+        arrays[col] = arr
+        valid = ~np.isnan(arr) & ~duplicated
+        p = params.get(col) or get_sensor_params(col)
+
+        for pos in groups:
+            device = df[by].iat[pos[0]] if by is not None else None
+            key = state_key(col, device)
+            prev = state.get(key) if state is not None else None
+
+            pos = pos[valid[pos]]
+            if prev is not None:
+                # Resume: only samples the filter has not seen yet
+                pos = pos[times_ns[pos] > _to_ns(prev["last_ts"])]
+                if len(pos) == 0:
+                    continue
+            elif len(pos) < 3:
+                continue  # Not enough data to filter
+
+            lanes.append((col, key, pos, p["Q_base"], p["R"], prev))
+
+    if not lanes:
+        return df.copy()
+
+    lanes.sort(key=lambda lane: len(lane[2]), reverse=True)
+    lengths = np.array([len(lane[2]) for lane in lanes])
+
+    values = np.zeros((len(lanes), lengths[0]))
+    times = np.zeros((len(lanes), lengths[0]), dtype=np.int64)
+    x0 = np.full(len(lanes), np.nan)
+    P0 = np.full(len(lanes), np.nan)
+    t0 = np.zeros(len(lanes), dtype=np.int64)
+    for i, (col, _, pos, _, _, prev) in enumerate(lanes):
+        values[i, : len(pos)] = arrays[col][pos]
+        times[i, : len(pos)] = times_ns[pos]
+        if prev is not None:
+            x0[i], P0[i], t0[i] = prev["x_est"], prev["P"], _to_ns(prev["last_ts"])
+
+    Q_base = np.array([lane[3] for lane in lanes], dtype=float)
+    R = np.array([lane[4] for lane in lanes], dtype=float)
+
+    out, x_est, P = kalman_lanes(values, times, lengths, Q_base, R, x0, P0, t0)
+
+    # Scatter filtered lanes back into per-column arrays
+    smoothed = {}
+    for i, (col, key, pos, _, _, prev) in enumerate(lanes):
+        n = len(pos)
+        last_ts = pd.Timestamp(times[i, n - 1], tz="UTC").isoformat()
+
+        # Sanity check: detect filter divergence. Only on a series filtered
+        # from scratch: a resumed one has a few new samples, often flat,
+        # whose spread says nothing about the filter.
+        if prev is None and np.std(out[i, :n]) > 3 * np.std(values[i, :n]):
+            print(f"Warning: Kalman filter unstable for {col}, using original data")
+            if state is not None:
+                # The raw rows are emitted; restart the filter at the last one
+                state[key] = {"x_est": float(values[i, n - 1]), "P": float(R[i]), "last_ts": last_ts}
+            continue
+
+        if col not in smoothed:
+            smoothed[col] = arrays[col].copy()
+        smoothed[col][pos] = out[i, :n]
+
+        if state is not None:
+            state[key] = {"x_est": float(x_est[i]), "P": float(P[i]), "last_ts": last_ts}
+
+    # Single bulk assignment back into the frame
+    return df.assign(**smoothed)
+
+
+def kalman_smooth_series(series: pd.Series, Q_base=0.01, R=1.0) -> pd.Series:
+    """
+    Apply 1D Kalman filter with time-gap awareness to a single series.
+
+    Parameters:
+    -----------
+    series : pd.Series with DatetimeIndex
+        The time series to smooth
+    Q_base : float
+        Process noise per hour (how much we expect value to change)
+    R : float
+        Measurement noise (sensor accuracy)
+
+    Returns:
+    --------
+    pd.Series
+        Smoothed time series
+    """
+    name = series.name if series.name is not None else "value"
+    frame = series.to_frame(name)
+    smoothed = kalman_smooth_frame(frame, [name], params={name: {"Q_base": Q_base, "R": R}})
+    return smoothed[name].rename(series.name)
@@ -0,0 +1,297 @@
+# processing/outliers.py
+
+"""
+Rolling outlier removal for LoEco sensor frames.
+
+All measurement columns of all devices are screened in one vectorised
+pass: the frame is laid out as one 2D array (rows × columns), sorted by
+device and time, and the centred rolling window statistics are computed
+for every column at once from cumulative sums, with the windows clipped at
+device boundaries so one device never contributes to another's statistics.
+
+Two rules are available:
+
+    "sigma" : |x - rolling mean|   > n_sigma × rolling std
+    "mad"   : |x - rolling median| > n_sigma × 1.4826 × rolling MAD  (robust)
+
+Where a window has too few samples, the device's statistics over the whole
+frame are used instead, as in the original per-series implementation. The
+MAD spread is floored at the series' resolution (smallest step) and at
+MIN_SPREAD_FRACTION of its standard deviation, since flat or quantized
+windows have a MAD of 0.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Rolling window (samples) and minimum valid samples per window
+WINDOW = 12
+MIN_PERIODS = 3
+
+# Series with fewer valid samples than this are left untouched
+MIN_SAMPLES = 10
+
+# MAD → standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+# Lower bound of the MAD spread, as a fraction of the device's whole-series
+# standard deviation: quantized or flat windows (rain gauge tips, 0.1 °C
+# steps, calm wind) have a MAD of 0, which would flag any change at all
+MIN_SPREAD_FRACTION = 0.5
+
+# Rows per block for the windowed median (bounds memory to block × window × columns)
+MEDIAN_BLOCK = 65536
+
+
+# ============================================================================
+# WINDOW STATISTICS
+# ============================================================================
+# Arrays are laid out columns × rows, rows sorted by device then time, so
+# every column is one contiguous lane and cumulative sums run along it.
+
+def _window_bounds(seg_start, seg_end, window):
+    """Centred window [lo, hi) per row, clipped to its device segment (pandas' center=True)."""
+    rows = np.arange(len(seg_start))
+    lo = rows - window // 2
+    return np.maximum(lo, seg_start), np.minimum(lo + window, seg_end)
+
+
+def _cumulative(values):
+    """Cumulative sums along the rows with a leading zero, so sum[lo:hi] = c[hi] - c[lo]."""
+    out = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=out[:, 1:])
+    return out
+
+
+def _clipped_rows(lo, hi, window):
+    """Rows whose window is cut by a device boundary (or the frame edge)."""
+    start = np.arange(len(lo)) - window // 2
+    return np.flatnonzero((lo != start) | (hi != start + window))
+
+
+def _window_sums(cumulative, lo, hi, window, clipped):
+    """
+    Window sums from a cumulative array. Full-size windows are plain slice
+    differences; only the `clipped` rows (the first and last window // 2
+    rows of each device) need a gather.
+    """
+    n = len(lo)
+    half = window // 2
+    sums = np.empty((cumulative.shape[0], n))
+    if n >= window:
+        np.subtract(cumulative[:, window:], cumulative[:, : n - window + 1], out=sums[:, half : n - window + half + 1])
+    sums[:, clipped] = cumulative[:, hi[clipped]] - cumulative[:, lo[clipped]]
+    return sums
+
+
+def rolling_mean_std(values, lo, hi, window=WINDOW, min_periods=MIN_PERIODS):
+    """
+    Rolling mean and sample std of every lane of `values` (columns × rows)
+    over the windows [lo, hi), from cumulative sums. NaN where a window has
+    fewer than `min_periods` valid samples.
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    clipped = _clipped_rows(lo, hi, window)
+
+    n = _window_sums(_cumulative(valid), lo, hi, window, clipped)
+    mean = _window_sums(_cumulative(filled), lo, hi, window, clipped)
+    np.multiply(filled, filled, out=filled)
+    var = _window_sums(_cumulative(filled), lo, hi, window, clipped)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean /= n
+        # var = (Σx² - n·mean²) / (n - 1), clamped at 0 against rounding
+        var -= mean * mean * n
+        np.maximum(var, 0.0, out=var)
+        var /= n - 1
+
+    enough = n >= max(min_periods, 1)
+    mean[~enough] = np.nan
+    std = np.sqrt(var, where=enough & (n > 1), out=np.full_like(var, np.nan))
+    return mean, std
+
+
+def _nanmedian(windows):
+    """Median over the last axis ignoring NaN (NaNs sort last), and the valid count."""
+    ordered = np.sort(windows, axis=-1)
+    count = (~np.isnan(ordered)).sum(axis=-1)
+
+    lower = np.maximum(count - 1, 0) // 2
+    upper = np.minimum(count // 2, ordered.shape[-1] - 1)
+    median = 0.5 * (
+        np.take_along_axis(ordered, lower[..., None], axis=-1)[..., 0]
+        + np.take_along_axis(ordered, upper[..., None], axis=-1)[..., 0]
+    )
+    return np.where(count > 0, median, np.nan), count
+
+
+def rolling_median_mad(values, lo, hi, min_periods=MIN_PERIODS, block=MEDIAN_BLOCK):
+    """
+    Rolling median and MAD of every lane of `values` (columns × rows) over
+    the windows [lo, hi). Windows are gathered in blocks of `block` rows.
+    """
+    n_cols, n_rows = values.shape
+    window = int((hi - lo).max()) if n_rows else 0
+    median = np.full((n_cols, n_rows), np.nan)
+    mad = np.full((n_cols, n_rows), np.nan)
+
+    # One trailing NaN row that out-of-window positions point at
+    padded = np.concatenate((values, np.full((n_cols, 1), np.nan)), axis=1)
+    offsets = np.arange(window)
+
+    for start in range(0, n_rows, block):
+        stop = min(start + block, n_rows)
+        idx = lo[start:stop, None] + offsets[None, :]
+        idx = np.where(idx < hi[start:stop, None], idx, n_rows)
+        windows = padded[:, idx]
+
+        med, count = _nanmedian(windows)
+        dev, _ = _nanmedian(np.abs(windows - med[..., None]))
+
+        enough = count >= max(min_periods, 1)
+        median[:, start:stop] = np.where(enough, med, np.nan)
+        mad[:, start:stop] = np.where(enough, dev, np.nan)
+
+    return median, mad
+
+
+# ============================================================================
+# OUTLIER REMOVAL
+# ============================================================================
+
+def _device_order(keys, times):
+    """Row order grouping devices and sorting by time, or None when already so."""
+    if len(keys) > 1:
+        step_key, step_time = np.diff(keys), np.diff(times)
+        # Factorized keys number devices by first appearance, so a
+        # non-decreasing key also means every device is contiguous
+        if ((step_key > 0) | ((step_key == 0) & (step_time >= 0))).all():
+            return None
+    return np.lexsort((times, keys))
+
+
+def _resolution(values, starts, lengths):
+    """
+    Smallest non-zero step between consecutive samples of every lane, per
+    device (the sensor's quantization), expanded to rows. NaN when a
+    device's lane never changes.
+    """
+    steps = np.abs(np.diff(values, axis=1))
+    # No step across a device boundary; a trailing column keeps row positions
+    steps[:, starts[1:] - 1] = np.nan
+    steps = np.concatenate((steps, np.full((values.shape[0], 1), np.nan)), axis=1)
+    steps[~(steps > 0)] = np.inf
+
+    smallest = np.minimum.reduceat(steps, starts, axis=1)
+    smallest[np.isinf(smallest)] = np.nan
+    return np.repeat(smallest, lengths, axis=-1)
+
+
+def remove_outliers_frame(
+    df: pd.DataFrame,
+    columns,
+    by="device_id",
+    n_sigma=3,
+    method="sigma",
+    window=WINDOW,
+    min_periods=MIN_PERIODS,
+):
+    """
+    Replace outliers in `columns` with NaN, per device, in one pass.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame with DatetimeIndex
+        Frame with one row per sample; devices in the `by` column.
+    columns : list of str
+        Continuous columns to screen.
+    by : str or None
+        Device column. The whole frame is one series when None or missing.
+    n_sigma : float
+        Threshold in standard deviations (or scaled MADs).
+    method : {"sigma", "mad"}
+        Rolling mean/std or robust rolling median/MAD.
+    window, min_periods : int
+        Centred rolling window in samples and the minimum valid samples in it.
+
+    Returns:
+    --------
+    (pd.DataFrame, pd.Series)
+        Frame with outliers set to NaN (rows in the original order), and
+        the number of points removed per column.
+    """
+    if method not in ("sigma", "mad"):
+        raise ValueError(f"Unknown outlier method: {method!r} (expected 'sigma' or 'mad')")
+
+    columns = [c for c in columns if c in df.columns]
+    out = df.copy()
+    if not columns or df.empty:
+        return out, pd.Series(0, index=columns, dtype="int64")
+
+    # Device-major, time-ordered layout (stable: keeps the order within a device)
+    times = pd.DatetimeIndex(df.index).asi8
+    keys = pd.factorize(df[by])[0] if by is not None and by in df.columns else np.zeros(len(df), dtype=np.int64)
+    order = _device_order(keys, times)
+
+    values = df[columns].to_numpy(dtype="float64", na_value=np.nan)
+    if order is not None:
+        keys, values = keys[order], values[order]
+    values = np.ascontiguousarray(values.T)
+    valid = ~np.isnan(values)
+
+    # Device segments, and per-device arrays expanded to rows
+    _, starts = np.unique(keys, return_index=True)
+    lengths = np.diff(np.append(starts, len(keys)))
+    expand = lambda per_device: np.repeat(per_device, lengths, axis=-1)  # noqa: E731
+
+    lo, hi = _window_bounds(expand(starts), expand(starts + lengths), window)
+
+    # Whole-series statistics per device, for the edges and sparse windows
+    count = np.add.reduceat(valid, starts, axis=1)
+    if method == "sigma":
+        filled = np.where(valid, values, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            whole_mean = np.add.reduceat(filled, starts, axis=1) / count
+            # Deviations from the device mean keep the cumulative sums precise
+            values = values - expand(whole_mean)
+            sum_sq = np.add.reduceat(np.where(valid, values * values, 0.0), starts, axis=1)
+            whole_std = np.sqrt(sum_sq / (count - 1))
+
+        center, spread = rolling_mean_std(values, lo, hi, window, min_periods)
+        center[np.isnan(center)] = 0.0
+        sparse = np.isnan(spread)
+        if sparse.any():
+            spread[sparse] = expand(whole_std)[sparse]
+    else:
+        grouped = pd.DataFrame(values.T).groupby(keys)
+        whole_median = expand(grouped.median().to_numpy().T)
+        whole_mad = expand(pd.DataFrame(np.abs(values - whole_median).T).groupby(keys).median().to_numpy().T)
+
+        whole_std = expand(grouped.std().to_numpy().T)
+
+        center, spread = rolling_median_mad(values, lo, hi, min_periods)
+        center = np.where(np.isnan(center), whole_median, center)
+        spread = MAD_SCALE * np.where(np.isnan(spread), whole_mad, spread)
+        # Never narrower than the sensor resolution or a fraction of the std
+        floor = np.fmax(_resolution(values, starts, lengths), MIN_SPREAD_FRACTION * whole_std)
+        spread = np.fmax(spread, floor)
+
+    with np.errstate(invalid="ignore"):
+        outlier = valid & ~(np.abs(values - center) <= n_sigma * spread)
+
+    # Short series are left as they are
+    outlier &= expand(count >= MIN_SAMPLES)
+
+    removed = pd.Series(outlier.sum(axis=1), index=columns, dtype="int64")
+    for i, col in enumerate(columns):
+        if not removed[col]:
+            continue
+        mask = outlier[i]
+        if order is not None:
+            mask = np.empty(len(df), dtype=bool)
+            mask[order] = outlier[i]
+        out[col] = out[col].mask(mask)
+
+    return out, removed
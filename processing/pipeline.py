@@ -0,0 +1,305 @@
+# processing/pipeline.py
+
+"""
+Per-device processing pipeline for resampled sensor data.
+
+The input is keyed by (device, time): a time-indexed frame with a device
+column, where several devices share the same timestamps. Every device is
+processed on its own frame, so one device's samples never feed another
+device's outlier statistics, Kalman recursion or interpolation:
+
+1. Remove outliers          (processing.outliers, sigma or robust MAD rule)
+2. Kalman smoothing         (processing.kalman, state keyed "<device>/<column>")
+3. Interpolate short gaps   (processing.interpolate, flagged in the interp_mask column)
+4. Forward-fill discrete variables
+
+Devices are independent, so with workers > 1 they are sharded across a
+process pool: devices are packed into shards of similar row counts (a few
+per worker, for load balancing) and each shard is one task, so a pool
+round trip carries many devices. The Kalman state of each device travels
+with its frame and the updates are merged back into the caller's state
+dict. Small frames are processed in-process, where a pool cannot pay for
+its startup.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from processing.interpolate import MASK_ATTR, MAX_GAP, interpolate_gaps, mask_order
+from processing.kalman import filtered_until, kalman_smooth_frame
+from processing.outliers import remove_outliers_frame
+
+
+# Column classes, matched as substrings of the lower-cased column name
+LINEAR_KEYS = ("temp", "hum", "press", "wind", "rain")
+FFILL_KEYS = ("bat", "status", "sensor", "rssi", "snr", "f_cnt", "device")
+
+# Passed through unchanged (neither smoothed, interpolated nor filled):
+# wind directions wrap at 0/360, so averaging 350° and 10° gives 180°, and
+# station metadata is not a measurement. Directions are matched like
+# storage.rollups does ("wind" and "dir" in the lower-cased name).
+PASS_THROUGH_COLUMNS = ("latitude", "longitude", "height_m")
+WIND_KEY, DIRECTION_KEY = "wind", "dir"
+
+# Shards per worker (smooths out devices of different sizes)
+SHARDS_PER_WORKER = 4
+
+# Below this many rows the frame is processed in-process
+PARALLEL_MIN_ROWS = 20000
+
+
+def is_pass_through(column) -> bool:
+    """True for wind directions and station metadata, which are left as they are."""
+    name = column.lower()
+    return column in PASS_THROUGH_COLUMNS or (WIND_KEY in name and DIRECTION_KEY in name)
+
+
+def classify_columns(columns, by="device_id"):
+    """Split columns into (linear, forward-fill) variables; pass-through columns are in neither."""
+    linear_vars = []
+    ffill_vars = []
+
+    for col in columns:
+        if col == by or is_pass_through(col):
+            continue
+        col_lower = col.lower()
+
+        if any(k in col_lower for k in LINEAR_KEYS):
+            linear_vars.append(col)
+        elif any(k in col_lower for k in FFILL_KEYS):
+            ffill_vars.append(col)
+
+    return linear_vars, ffill_vars
+
+
+# ============================================================================
+# ONE DEVICE
+# ============================================================================
+
+def process_device(
+    df: pd.DataFrame,
+    linear_vars,
+    ffill_vars,
+    by="device_id",
+    kalman_state=None,
+    n_sigma=3,
+    max_gap=MAX_GAP,
+    method="sigma",
+    mask_columns=None,
+):
+    """
+    Run the pipeline on the time-ordered frame of a single device.
+    `mask_columns` is the bit order of the interpolation mask (see
+    processing.interpolate.mask_order).
+
+    Rows the Kalman state has already filtered (at or before its latest
+    `last_ts`) take part as context for outliers and gaps, but are left
+    out of the result: the filter does not smooth them again, and they
+    were returned by the run that did.
+
+    Returns:
+    --------
+    (pd.DataFrame, pd.Series, dict)
+        Processed frame of the new rows, outliers removed per column, and
+        the updated Kalman state entries of this device.
+    """
+    state = dict(kalman_state or {})
+    device = df[by].iat[0] if by in df.columns and len(df) else None
+    resumed = filtered_until(state, device)
+
+    out, removed = remove_outliers_frame(df, linear_vars, by=None, n_sigma=n_sigma, method=method)
+    out = kalman_smooth_frame(out, linear_vars, by=by if by in out.columns else None, state=state)
+
+    out = interpolate_gaps(out, linear_vars, max_gap=max_gap, order=mask_columns)
+
+    if ffill_vars:
+        out[ffill_vars] = out[ffill_vars].ffill().bfill()
+
+    if resumed is not None:
+        out = out[out.index > (resumed if out.index.tz is not None else resumed.tz_localize(None))]
+
+    return out, removed, state
+
+
+def _process_task(task):
+    df, linear_vars, ffill_vars, by, state, n_sigma, max_gap, method, mask_columns = task
+    return process_device(
+        df, linear_vars, ffill_vars, by=by, kalman_state=state, n_sigma=n_sigma, max_gap=max_gap, method=method,
+        mask_columns=mask_columns,
+    )
+
+
+def _process_shard(shard):
+    return [(position, _process_task(task)) for position, task in shard]
+
+
+# ============================================================================
+# WHOLE FLEET
+# ============================================================================
+
+def device_frames(df: pd.DataFrame, by="device_id"):
+    """(device, frame) pairs, each frame sorted by time with unique timestamps."""
+    frames = []
+    for device, part in df.groupby(by, sort=True):
+        part = part.sort_index(kind="stable")
+        if part.index.duplicated().any():
+            print(f"Warning: {device}: {part.index.duplicated().sum()} duplicate timestamps, keeping first")
+            part = part[~part.index.duplicated(keep="first")]
+        frames.append((device, part))
+    return frames
+
+
+def shard_tasks(tasks, shards):
+    """
+    Pack device tasks into at most `shards` lists of similar total rows
+    (largest device first into the lightest shard). Items are
+    (position, task) pairs so results can be put back in task order.
+    """
+    shards = max(1, min(shards, len(tasks)))
+    bins = [[] for _ in range(shards)]
+    load = [0] * shards
+
+    for position, task in sorted(enumerate(tasks), key=lambda item: len(item[1][0]), reverse=True):
+        i = load.index(min(load))
+        bins[i].append((position, task))
+        load[i] += len(task[0])
+
+    return [b for b in bins if b]
+
+
+def resolve_workers(workers):
+    """Worker count: None or 0 means one per available CPU."""
+    if not workers:
+        try:
+            return len(os.sched_getaffinity(0))
+        except AttributeError:  # not available on every platform
+            return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def _pool_context():
+    # Fork where available: spawned workers would re-run the calling
+    # script (fetch_dataB.py runs at import and has no __main__ guard)
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def run_tasks(tasks, workers=1):
+    """Run device tasks in-process or sharded over a process pool, in task order."""
+    rows = sum(len(task[0]) for task in tasks)
+    if workers <= 1 or len(tasks) <= 1 or rows < PARALLEL_MIN_ROWS:
+        return [_process_task(task) for task in tasks]
+
+    shards = shard_tasks(tasks, workers * SHARDS_PER_WORKER)
+    results = [None] * len(tasks)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=_pool_context()) as pool:
+        for shard_results in pool.map(_process_shard, shards):
+            for position, result in shard_results:
+                results[position] = result
+
+    return results
+
+
+def interpolate_meteo(
+    df: pd.DataFrame,
+    kalman_state: dict = None,
+    by="device_id",
+    workers=1,
+    n_sigma=3,
+    max_gap=MAX_GAP,
+    method="sigma",
+    mask_columns=None,
+) -> pd.DataFrame:
+    """
+    Complete meteorological data processing pipeline, per device:
+    1. Remove outliers
+    2. Apply Kalman smoothing to raw data
+    3. Interpolate remaining short gaps (up to `max_gap`, flagged in interp_mask)
+    4. Forward-fill discrete variables
+
+    Parameters:
+    -----------
+    df : pd.DataFrame with DatetimeIndex
+        Weather data with columns like TempC_SHT, Hum_SHT, BatV, etc. and
+        a `by` device column; devices may share timestamps.
+    kalman_state : dict, optional
+        Persisted Kalman filter state, updated in place (see processing.kalman)
+    by : str
+        Device column. Without it the frame is processed as one device.
+    workers : int
+        Processes to shard devices over (1 = in this process, 0 = all CPUs).
+    n_sigma : float
+        Outlier threshold in standard deviations (or scaled MADs).
+    max_gap : str or pd.Timedelta
+        Longest gap that is interpolated; longer gaps stay empty.
+    method : {"sigma", "mad"}
+        Outlier rule: rolling mean/std, or robust rolling median/MAD
+        (see processing.outliers).
+    mask_columns : list of str, optional
+        Known bit order of the interpolation mask, e.g. the dataset's
+        load_mask_order(); new columns are appended to it.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Processed weather data, sorted by device and time, with the
+        interp_mask bitmask of interpolated values (see processing.interpolate)
+        and its bit order in df.attrs[MASK_ATTR].
+        Rows a previous run already smoothed (per the Kalman state) are
+        left out.
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError("DatetimeIndex required for time interpolation")
+
+    linear_vars, ffill_vars = classify_columns(df.columns, by=by)
+    # One bit order for every device, so their masks decode alike
+    order = mask_order(linear_vars, mask_columns or ())
+
+    if by in df.columns:
+        frames = device_frames(df, by=by)
+    else:
+        frames = [(None, df.sort_index(kind="stable"))]
+
+    if not frames:
+        return df.copy()
+
+    # Each device only needs (and may only update) its own state entries
+    state = kalman_state if kalman_state is not None else {}
+    if by in df.columns:
+        # Un-prefixed keys belong to the old filter over the interleaved frame
+        for key in [k for k in state if "/" not in k]:
+            del state[key]
+    tasks = [
+        (
+            part,
+            linear_vars,
+            ffill_vars,
+            by,
+            {k: v for k, v in state.items() if device is None or k.startswith(f"{device}/")},
+            n_sigma,
+            max_gap,
+            method,
+            order,
+        )
+        for device, part in frames
+    ]
+
+    workers = resolve_workers(workers)
+    print(f"  → Processing {len(tasks)} devices on {workers} worker(s) (outliers, Kalman, gaps, discrete fill)...")
+    results = run_tasks(tasks, workers=workers)
+
+    removed = pd.concat([r[1] for r in results], axis=1).sum(axis=1)
+    for col, count in removed[removed > 0].items():
+        print(f"     {col}: {int(count)} outliers removed")
+
+    for _, _, device_state in results:
+        state.update(device_state)
+
+    out = pd.concat([r[0] for r in results])
+    out.attrs[MASK_ATTR] = order
+    return out
@@ -0,0 +1,241 @@
+# processing/resample.py
+
+"""
+Per-device resampling on integer epoch bins.
+
+Replaces df.groupby(device).resample(rule).<agg>() and the MultiIndex
+flattening that follows it: the rows are ordered once by (device, time), each
+timestamp is mapped to an integer bin `(t - origin) // step`, and every
+column is aggregated with NumPy over the bin positions (unique / bincount /
+reduceat). The output is the tidy frame the pipeline wants: a time index
+of bin starts plus the device column, sorted by device and time.
+
+Like pandas, every device gets all bins between its first and last
+sample, empty ones included (NaN, or 0 for sums). Bins are aligned to
+midnight UTC, which matches pandas' default origin for rules that divide
+a day (30min, 1h, ...).
+
+Aggregations: "first" / "last" (first / last non-null value, any dtype),
+"mean", "max" and "sum" (numeric columns).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+AGGREGATIONS = ("first", "last", "mean", "max", "sum")
+
+# Column classes (substring of the lower-cased name) → aggregation, for by_class=True
+CLASS_AGGREGATIONS = {
+    "rain": "sum",
+}
+
+DAY_NS = 24 * 3600 * 10**9
+
+
+def column_aggregations(columns, default="first", how=None, by_class=False):
+    """
+    Aggregation per column: `how` overrides, then the column class
+    (CLASS_AGGREGATIONS, when `by_class`), then `default`.
+    """
+    how = how or {}
+    result = {}
+    for col in columns:
+        agg = how.get(col)
+        if agg is None and by_class:
+            agg = next((a for key, a in CLASS_AGGREGATIONS.items() if key in col.lower()), None)
+        agg = agg or default
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation for {col}: {agg!r} (expected one of {AGGREGATIONS})")
+        result[col] = agg
+    return result
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+# `pos` is the output row of every sorted input row, non-decreasing (rows
+# sorted by device and time); `n_out` the number of output rows.
+
+def _pick(pos, valid, n_out, last=False):
+    """Row of the first (or last) valid value per output row; -1 where none."""
+    if valid is None:
+        rows, p = None, pos
+    else:
+        rows = np.flatnonzero(valid)
+        p = pos[rows]
+    picked = np.full(n_out, -1, dtype=np.int64)
+    if len(p) == 0:
+        return picked
+
+    if last:
+        # Last occurrence of each position in a non-decreasing array
+        ends = np.flatnonzero(np.append(p[1:] != p[:-1], True))
+        picked[p[ends]] = ends if rows is None else rows[ends]
+    else:
+        starts = np.flatnonzero(np.insert(p[1:] != p[:-1], 0, True))
+        picked[p[starts]] = starts if rows is None else rows[starts]
+    return picked
+
+
+def _sum_count(values, pos, valid, n_out):
+    weights = np.where(valid, values, 0.0)
+    total = np.bincount(pos, weights=weights, minlength=n_out)
+    count = np.bincount(pos, weights=valid, minlength=n_out)
+    return total, count
+
+
+def _max(values, pos, valid, n_out):
+    out = np.full(n_out, np.nan)
+    rows = np.flatnonzero(valid)
+    if len(rows) == 0:
+        return out
+
+    p = pos[rows]
+    starts = np.flatnonzero(np.insert(p[1:] != p[:-1], 0, True))
+    out[p[starts]] = np.maximum.reduceat(values[rows], starts)
+    return out
+
+
+def _aggregate(column: pd.Series, agg, order, pos, n_out, complete):
+    """
+    Aggregate one column; `order` sorts its rows by (device, time) and
+    `complete` caches the picks of columns without missing values.
+    """
+    if agg in ("first", "last"):
+        valid = column.notna().to_numpy()
+        if valid.all():
+            if agg not in complete:
+                complete[agg] = _pick(pos, None, n_out, last=agg == "last")
+            picked = complete[agg]
+        else:
+            picked = _pick(pos, valid[order], n_out, last=agg == "last")
+        # Gather straight from the unsorted column
+        picked = np.where(picked >= 0, order[np.maximum(picked, 0)], -1)
+        values = column.array
+        if column.dtype == bool and (picked < 0).any():
+            # Empty bins make booleans float (0/1/NaN), as pandas does
+            values = column.astype("float64").array
+        # ExtensionArray.take fills -1 with the dtype's missing value
+        return values.take(picked, allow_fill=True)
+
+    values = pd.to_numeric(column, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)[order]
+    valid = ~np.isnan(values)
+
+    if agg == "max":
+        return _max(values, pos, valid, n_out)
+
+    total, count = _sum_count(values, pos, valid, n_out)
+    if agg == "sum":
+        return total  # empty bins sum to 0, as in pandas
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+# ============================================================================
+# RESAMPLING
+# ============================================================================
+
+def _device_order(codes, times, n_devices):
+    """Row order by (device, time); a stable sort on the codes alone when already time-ordered."""
+    if len(times) < 2 or (np.diff(times) >= 0).all():
+        small = np.int16 if n_devices <= np.iinfo(np.int16).max else np.int64
+        return np.argsort(codes.astype(small), kind="stable")  # radix sort for int16
+    return np.lexsort((times, codes))
+
+
+def resample_frame(
+    df: pd.DataFrame,
+    rule="30min",
+    by="device_id",
+    default="first",
+    how=None,
+    by_class=False,
+) -> pd.DataFrame:
+    """
+    Resample a time-indexed frame per device.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame with DatetimeIndex
+        Samples of any number of devices, in any order.
+    rule : str
+        Bin width (e.g. "30min").
+    by : str
+        Device column.
+    default : str
+        Aggregation for columns without a specific one ("first" matches
+        groupby().resample().first()).
+    how : dict, optional
+        Column → aggregation overrides.
+    by_class : bool
+        Apply CLASS_AGGREGATIONS (rain → sum) by column name.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Time index ("time", bin starts) and the `by` column followed by the
+        aggregated columns, sorted by device and time.
+    """
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError("DatetimeIndex required for resampling")
+
+    step = pd.Timedelta(rule).value
+    if step <= 0:
+        raise ValueError(f"Invalid resampling rule: {rule!r}")
+
+    columns = [c for c in df.columns if c != by]
+    aggregations = column_aggregations(columns, default=default, how=how, by_class=by_class)
+    index_name = df.index.name or "time"
+
+    if df.empty:
+        empty = df.iloc[0:0][[by] + columns]
+        empty.index = pd.DatetimeIndex([], tz=df.index.tz, name=index_name)
+        return empty
+
+    # One sort by (device, time), in the index's own time unit
+    codes, devices = pd.factorize(df[by], sort=True)
+    times = df.index.asi8
+    order = _device_order(codes, times, len(devices))
+    codes, times = codes[order], times[order]
+
+    unit = df.index.unit
+    step = step // pd.Timedelta(1, unit=unit).value
+    day = DAY_NS // pd.Timedelta(1, unit=unit).value
+    if step == 0:
+        raise ValueError(f"Resampling rule {rule!r} is finer than the {unit} index")
+
+    origin = (times.min() // day) * day
+    bins = times - origin
+    bins //= step
+
+    # Output rows: every bin between each device's first and last sample
+    # (rows are sorted, so those are the ends of each device's segment)
+    n_devices = len(devices)
+    starts = np.searchsorted(codes, np.arange(n_devices))
+    ends = np.append(starts[1:], len(codes)) - 1
+    first_bin, last_bin = bins[starts], bins[ends]
+
+    lengths = last_bin - first_bin + 1
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    n_out = int(lengths.sum())
+
+    pos = bins
+    pos += (offsets - first_bin)[codes]
+
+    out_device = np.repeat(np.arange(n_devices), lengths)
+    out_bin = first_bin[out_device] + (np.arange(n_out) - offsets[out_device])
+
+    stamps = (origin + out_bin * step).astype(f"datetime64[{unit}]")
+    index = pd.DatetimeIndex(stamps, name=index_name).tz_localize("UTC")
+    if df.index.tz is None:
+        index = index.tz_localize(None)
+    elif str(df.index.tz) != "UTC":
+        index = index.tz_convert(df.index.tz)
+
+    data = {by: pd.api.extensions.take(devices, out_device)}
+    complete = {}
+    for col in columns:
+        data[col] = _aggregate(df[col], aggregations[col], order, pos, n_out, complete)
+
+    return pd.DataFrame(data, index=index)
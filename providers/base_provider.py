@@ -1,8 +1,14 @@
 # providers/base_provider.py
 
 import abc
+import os
+import shutil
+import uuid
 import pandas as pd
-from providers.schema import LOECO_SCHEMA
+import pyarrow.parquet as pq
+from providers.http import get_session
+from providers.schema import conform, to_arrow
+from storage.dataset import PART_PREFIX, stored_timestamps, write_fragment
 
 
 class BaseProvider(abc.ABC):
@@ -11,10 +17,31 @@ class BaseProvider(abc.ABC):
     Ensures consistent interface and shared behavior.
     """
 
+    # Requests in flight at once for this provider type (overridable per
+    # type with "concurrency" in stations.json); also the HTTP pool size
+    MAX_CONCURRENCY = 4
+
     def __init__(self, name: str, target_file: str):
         self.name = name
         self.target_file = target_file
 
+    # Attributes (and stations.json config keys) identifying a shared fetch:
+    # providers of one class with equal values are fetched together through
+    # the class's fetch_shared(providers). Empty: every provider fetches alone.
+    SHARE_FIELDS = ()
+
+    @property
+    def share_key(self):
+        """Providers with the same non-None key can share one fetch (fetch_shared)."""
+        if not self.SHARE_FIELDS:
+            return None
+        return tuple(getattr(self, field) for field in self.SHARE_FIELDS)
+
+    @property
+    def session(self):
+        """Pooled HTTP session shared by all providers of this type."""
+        return get_session(type(self).__name__, pool_size=self.MAX_CONCURRENCY)
+
     # ---------------------------------------------------------
     # Abstract methods providers must implement
     # ---------------------------------------------------------
@@ -44,7 +71,8 @@ class BaseProvider(abc.ABC):
         owner,
     ):
         """
-        Applies provider→LoEco mapping and ensures all LOECO_SCHEMA fields exist.
+        Applies provider→LoEco mapping and ensures all LOECO_SCHEMA fields
+        exist, each with its schema dtype.
         """
 
         # 1. Keep only columns that appear in the mapping
@@ -64,21 +92,103 @@ class BaseProvider(abc.ABC):
         df["height_m"] = height_m
         df["owner"] = owner
 
-        # 4. Ensure ALL schema fields exist (fill missing with None)
-        for col in LOECO_SCHEMA:
-            if col not in df.columns:
-                df[col] = None
+        # 4. Ensure ALL schema fields exist (typed nulls), cast to the
+        #    schema dtypes and reorder to match the universal schema
+        return conform(df)
+
+    # ---------------------------------------------------------
+    # Shared accumulating writer
+    # ---------------------------------------------------------
+    def monthly_target(self, ts):
+        """
+        Dataset path for the month of `ts`, following the
+        <data>/<YYYY>/<MM>/<type>__<name>.parquet layout of target_file.
+        """
+        folder, filename = os.path.split(self.target_file)
+        root = os.path.dirname(os.path.dirname(folder))
+        return os.path.join(root, f"{ts.year:04d}", f"{ts.month:02d}", filename)
 
-        # 5. Reorder columns to match the universal schema
-        df = df[LOECO_SCHEMA]
+    @classmethod
+    def _as_dataset_dir(cls, path):
+        """
+        Each target is a directory of Parquet fragments, which pandas and
+        pyarrow read exactly like a single file. A legacy single-file
+        target is converted into the directory's first fragment.
+
+        The fragment is written into a hidden sibling directory first; the
+        legacy file is then renamed out of the way, the directory renamed
+        into place, and only then is the old file deleted. A conversion
+        interrupted between the two renames is rolled back on the next call.
+        """
+        parent, name = os.path.split(path)
+
+        if not os.path.exists(path) and os.path.isdir(parent):
+            # Interrupted between the two renames below: put the legacy file back
+            retired = sorted(e for e in os.listdir(parent) if e.startswith(f".{name}.legacy-"))
+            if retired:
+                os.rename(os.path.join(parent, retired[-1]), path)
+
+        if os.path.isfile(path):
+            tag = uuid.uuid4().hex[:8]
+            staging = os.path.join(parent, f".{name}.convert-{tag}")
+            retired = os.path.join(parent, f".{name}.legacy-{tag}")
+
+            try:
+                legacy = to_arrow(pd.read_parquet(path))
+                os.makedirs(staging)
+                pq.write_table(legacy, os.path.join(staging, f"{PART_PREFIX}00000000T000000-legacy.parquet"))
+
+                os.rename(path, retired)
+                try:
+                    os.rename(staging, path)
+                except OSError:
+                    os.rename(retired, path)
+                    raise
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            os.remove(retired)
+        return path
+
+    def save(self, df):
+        """
+        Append rows to the monthly dataset(s) without rewriting history.
+        Rows are deduplicated on timestamp, both within the batch and
+        against timestamps already stored. Fragments are written with the
+        typed LOECO_ARROW_SCHEMA. Returns the number of rows written.
+        """
+        df = conform(df)
 
-        return df
+        missing = df["timestamp"].isna()
+        if missing.any():
+            print(f"[WARN] Dropping {missing.sum()} rows without timestamp for {self.name}")
+            df = df[~missing]
+
+        df = df.drop_duplicates(subset="timestamp", keep="last").sort_values("timestamp")
+
+        written = 0
+        months = df["timestamp"].dt.strftime("%Y-%m")
+
+        for _, part in df.groupby(months, sort=True):
+            target = self._as_dataset_dir(self.monthly_target(part["timestamp"].iloc[0]))
+
+            stored = stored_timestamps(
+                target, part["timestamp"].min(), part["timestamp"].max(), column="timestamp"
+            )
+            new_rows = part[~part["timestamp"].isin(stored)]
+            if new_rows.empty:
+                continue
+
+            write_fragment(target, to_arrow(new_rows))
+            written += len(new_rows)
+
+        return written
 
     # ---------------------------------------------------------
     # Shared run() method used by all providers
     # ---------------------------------------------------------
-    def run(self):
-        """Fetch → normalize → save to Parquet."""
+    def collect(self):
+        """Fetch → normalize. Returns the normalized rows, or None when empty."""
         print(f"→ Fetching data for {self.name}...")
         raw = self.fetch()
 
@@ -87,8 +197,25 @@ class BaseProvider(abc.ABC):
 
         if df is None or df.empty:
             print(f"[WARN] No data returned for {self.name}")
+            return None
+        return df
+
+    def commit(self):
+        """Called once everything collected so far has been saved."""
+        pass
+
+    def run(self):
+        """Fetch → normalize → append to Parquet."""
+        df = self.collect()
+        if df is None:
+            self.commit()
             return
 
         print(f"→ Saving data for {self.name}...")
-        df.to_parquet(self.target_file, index=False)
-        print(f"✓ Saved data → {self.target_file}")
+        written = self.save(df)
+        if written:
+            print(f"✓ Appended {written} rows → {self.target_file}")
+        else:
+            print(f"No new rows to append for {self.name}")
+
+        self.commit()
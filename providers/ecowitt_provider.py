@@ -1,35 +1,133 @@
 # providers/ecowitt_provider.py
 
+import os
+
+import numpy as np
 import pandas as pd
-import requests
-from datetime import datetime
 from providers.base_provider import BaseProvider
+from providers.http import HTTP_TIMEOUT
+from providers.schema import conform
+from utils.state_store import load_state, save_state
+
+
+# ---------------------------------------------------------
+# Unit conversions (Ecowitt API default units → LoEco units)
+# ---------------------------------------------------------
+def f_to_c(x):
+    return (x - 32) * 5 / 9
+
+
+def inches_to_mm(x):
+    return x * 25.4
+
+
+def mph_to_ms(x):
+    return x * 0.44704
+
+
+def inhg_to_hpa(x):
+    return x * 33.8639
+
+
+# ---------------------------------------------------------
+# Field table: (section, key, LoEco column, conversion)
+# ---------------------------------------------------------
+FIELD_TABLE = [
+    ("outdoor", "temperature", "temperature_c", f_to_c),
+    ("outdoor", "humidity", "humidity_pct", None),
+    ("outdoor", "dew_point", "dewpoint_c", f_to_c),
+    ("outdoor", "feels_like", "feels_like_c", f_to_c),
+    ("solar_and_uvi", "solar", "solar_wm2", None),
+    ("solar_and_uvi", "uvi", "uv_index", None),
+    ("rainfall", "rain_rate", "rain_rate_mmhr", inches_to_mm),
+    ("rainfall", "daily", "rain_daily_mm", inches_to_mm),
+    ("wind", "wind_speed", "wind_speed_ms", mph_to_ms),
+    ("wind", "wind_gust", "wind_gust_ms", mph_to_ms),
+    ("wind", "wind_direction", "wind_dir_deg", None),
+    ("pressure", "relative", "pressure_hpa", inhg_to_hpa),
+    ("battery", "sensor_array", "battery_voltage_v", None),
+]
+
+
+def _field(data, section, key):
+    """data[section][key] as a dict ({} when absent)."""
+    field = (data.get(section) or {}).get(key)
+    return field if isinstance(field, dict) else {}
+
+
+def _convert(values, conversion):
+    """Numeric column from raw API values (strings, numbers or None)."""
+    values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype="float64")
+    return conversion(values) if conversion is not None else values
+
+
+def normalize_responses(responses) -> pd.DataFrame:
+    """
+    Normalize a batch of real_time responses (one per MAC) into one frame,
+    one row per response, in a single pass over FIELD_TABLE.
+    The timestamp is the API's `time` (epoch seconds) of each response.
+    """
+    data = [response.get("data") or {} for response in responses]
+
+    epochs = pd.to_numeric(pd.Series([r.get("time") for r in responses], dtype=object), errors="coerce")
+    timestamps = pd.to_datetime(epochs, unit="s", utc=True)
+    # Responses without a server time are stamped with the fetch time
+    timestamps = timestamps.fillna(pd.Timestamp.now(tz="UTC").floor("s"))
+
+    columns = {"timestamp": timestamps.to_numpy()}
+    for section, key, column, conversion in FIELD_TABLE:
+        values = [_field(d, section, key).get("value") for d in data]
+        columns[column] = _convert(values, conversion)
+
+    return pd.DataFrame(columns)
+
+
+def normalize_history(response) -> pd.DataFrame:
+    """
+    Normalize a /device/history response into one frame, one row per
+    timestamp. History fields carry {"list": {"<epoch>": "<value>"}}
+    instead of a single value; fields are aligned on the epoch keys.
+    """
+    data = response.get("data") or {}
+
+    series = {}
+    for section, key, column, conversion in FIELD_TABLE:
+        points = _field(data, section, key).get("list")
+        if not points:
+            continue
+        epochs = np.fromiter(points.keys(), dtype="int64", count=len(points))
+        series[column] = pd.Series(_convert(list(points.values()), conversion), index=epochs)
+
+    if not series:
+        return pd.DataFrame(columns=["timestamp"] + [column for _, _, column, _ in FIELD_TABLE])
+
+    df = pd.DataFrame(series).sort_index()
+    df.insert(0, "timestamp", pd.to_datetime(df.index, unit="s", utc=True))
+    return df.reset_index(drop=True)
 
 
 class EcowittProvider(BaseProvider):
     """
     Fetches weather data from the Ecowitt Cloud API (v3).
-    Normalizes nested Ecowitt JSON into the LoEco universal schema.
+    Normalizes nested Ecowitt JSON into the LoEco universal schema,
+    driven by FIELD_TABLE.
     """
 
-    API_URL = "https://api.ecowitt.net/api/v3/device/real_time"
-
-    SCHEMA_MAP = {
-        "timestamp": "time",
-        "temperature_c": "temp",
-        "humidity_pct": "humidity",
-        "pressure_hpa": "baromrelin",
-        "dew_point_c": "dewpoint",
-        "feels_like_c": "feelslike",
-        "wind_speed_ms": "windspeed",
-        "wind_gust_ms": "windgust",
-        "wind_dir_deg": "winddir",
-        "rain_rate_mmhr": "rainrate",
-        "rain_daily_mm": "raindaily",
-        "solar_wm2": "solarradiation",
-        "uv_index": "uv",
-        "battery_voltage_v": "battery",
-    }
+    BASE_URL = "https://api.ecowitt.net/api/v3"
+
+    MAX_CONCURRENCY = 8
+
+    # Gateways of one account are fetched and normalized as one batch (fetch_shared)
+    SHARE_FIELDS = ("application_key", "api_key", "base_url")
+
+    # History backfill: chunk length, sampling cycle and sections requested
+    HISTORY_CHUNK = "1D"
+    HISTORY_CYCLE = "5min"
+    HISTORY_CALL_BACK = ",".join(dict.fromkeys(section for section, _, _, _ in FIELD_TABLE))
+    HISTORY_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    # Columns produced by the normalizers are already LoEco names
+    SCHEMA_MAP = {"timestamp": "timestamp", **{column: column for _, _, column, _ in FIELD_TABLE}}
 
     def __init__(
         self,
@@ -43,6 +141,8 @@ class EcowittProvider(BaseProvider):
         sensor_type=None,
         height_m=None,
         owner=None,
+        base_url=None,
+        checkpoint_path=None,
     ):
         super().__init__(name, target_file)
 
@@ -50,29 +150,36 @@ class EcowittProvider(BaseProvider):
         self.api_key = api_key
         self.mac = mac
 
+        # Overridable so backfills can run against a local stub server
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        # Per-MAC progress of history backfills
+        self.checkpoint_path = checkpoint_path or os.path.join("data", "ecowitt_backfill.json")
+
+        # Rows handed over by a batch fetch of the whole account (see
+        # fetch_shared), or the error of this gateway's request in it
+        self.shared_rows = None
+        self.shared_error = None
+
         self.latitude = latitude
         self.longitude = longitude
         self.sensor_type = sensor_type
         self.height_m = height_m
         self.owner = owner
 
-    # ---------------------------------------------------------
-    # Helper: safely extract nested values
-    # ---------------------------------------------------------
-    def extract(self, section, field, default=None):
-        """
-        Extracts section[field]["value"] safely.
-        Example: extract(indoor, "temperature") → float(value)
-        """
-        try:
-            return float(section[field]["value"])
-        except Exception:
-            return default
-
     # ---------------------------------------------------------
     # REQUIRED ABSTRACT METHOD IMPLEMENTATION
     # ---------------------------------------------------------
     def fetch(self):
+        if self.shared_error is not None:
+            error, self.shared_error = self.shared_error, None
+            raise error
+        if self.shared_rows is not None:
+            rows, self.shared_rows = self.shared_rows, None
+            return rows
+        return self.fetch_real_time()
+
+    def fetch_real_time(self):
+        """One /device/real_time request for this gateway."""
         params = {
             "application_key": self.application_key,
             "api_key": self.api_key,
@@ -80,7 +187,7 @@ class EcowittProvider(BaseProvider):
             "call_back": "all",
         }
 
-        response = requests.get(self.API_URL, params=params)
+        response = self.session.get(f"{self.base_url}/device/real_time", params=params, timeout=HTTP_TIMEOUT)
         print("Ecowitt API response:", response.text)
         response.raise_for_status()
         return response.json()
@@ -89,146 +196,17 @@ class EcowittProvider(BaseProvider):
     # REQUIRED ABSTRACT METHOD IMPLEMENTATION
     # ---------------------------------------------------------
     def normalize(self, raw):
-        data = raw.get("data", {})
+        if isinstance(raw, pd.DataFrame):
+            return raw  # already normalized by normalize_batch
 
-        if not data:
+        if not raw.get("data"):
             print("[ERROR] Ecowitt returned no data:", raw)
             return pd.DataFrame()
 
-        # Sections
-        outdoor = data.get("outdoor", {})
-        indoor = data.get("indoor", {})
-        solar = data.get("solar_and_uvi", {})
-        rainfall = data.get("rainfall", {})
-        wind = data.get("wind", {})
-        pressure = data.get("pressure", {})
-        battery = data.get("battery", {})
-
-        # -----------------------------
-        # Outdoor temperature & humidity
-        # -----------------------------
-        temp_f = self.extract(outdoor, "temperature")
-        humidity = self.extract(outdoor, "humidity")
-        dew_f = self.extract(outdoor, "dew_point")
-        feels_f = self.extract(outdoor, "feels_like")
-
-        # -----------------------------
-        # Solar & UV
-        # -----------------------------
-        solar_wm2 = None
-        try:
-            solar_wm2 = float(solar.get("solar", {}).get("value"))
-        except Exception:
-            pass
-
-        uv_index = None
-        try:
-            uv_index = float(solar.get("uvi", {}).get("value"))
-        except Exception:
-            pass
-
-        # -----------------------------
-        # Rainfall (convert inches → mm)
-        # -----------------------------
-        def inches_to_mm(x):
-            return x * 25.4 if x is not None else None
-
-        rain_rate_in = None
-        try:
-            rain_rate_in = float(rainfall.get("rain_rate", {}).get("value"))
-        except Exception:
-            pass
-
-        rain_daily_in = None
-        try:
-            rain_daily_in = float(rainfall.get("daily", {}).get("value"))
-        except Exception:
-            pass
-
-        rain_rate_mmhr = inches_to_mm(rain_rate_in)
-        rain_daily_mm = inches_to_mm(rain_daily_in)
-
-        # -----------------------------
-        # Wind (mph → m/s)
-        # -----------------------------
-        def mph_to_ms(x):
-            return x * 0.44704 if x is not None else None
-
-        wind_speed_mph = None
-        wind_gust_mph = None
-        wind_dir_deg = None
-
-        try:
-            wind_speed_mph = float(wind.get("wind_speed", {}).get("value"))
-        except Exception:
-            pass
-
-        try:
-            wind_gust_mph = float(wind.get("wind_gust", {}).get("value"))
-        except Exception:
-            pass
-
-        try:
-            wind_dir_deg = float(wind.get("wind_direction", {}).get("value"))
-        except Exception:
-            pass
-
-        wind_speed_ms = mph_to_ms(wind_speed_mph)
-        wind_gust_ms = mph_to_ms(wind_gust_mph)
-
-        # -----------------------------
-        # Pressure (inHg → hPa)
-        # -----------------------------
-        pressure_rel = pressure.get("relative", {})
-        pressure_inhg = None
-        try:
-            pressure_inhg = float(pressure_rel.get("value"))
-        except Exception:
-            pass
-
-        pressure_hpa = pressure_inhg * 33.8639 if pressure_inhg is not None else None
-
-        # -----------------------------
-        # Battery
-        # -----------------------------
-        battery_v = None
-        try:
-            battery_v = float(battery.get("sensor_array", {}).get("value"))
-        except Exception:
-            pass
-
-        # -----------------------------
-        # Unit conversions
-        # -----------------------------
-        def f_to_c(f):
-            return (f - 32) * 5 / 9 if f is not None else None
-
-        temp_c = f_to_c(temp_f)
-        dew_c = f_to_c(dew_f)
-        feels_c = f_to_c(feels_f)
-
-        # -----------------------------
-        # Build normalized row
-        # -----------------------------
-        row = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "temperature_c": temp_c,
-            "humidity_pct": humidity,
-            "pressure_hpa": pressure_hpa,
-            "dew_point_c": dew_c,
-            "feels_like_c": feels_c,
-            "wind_speed_ms": wind_speed_ms,
-            "wind_gust_ms": wind_gust_ms,
-            "wind_dir_deg": wind_dir_deg,
-            "rain_rate_mmhr": rain_rate_mmhr,
-            "rain_daily_mm": rain_daily_mm,
-            "solar_wm2": solar_wm2,
-            "uv_index": uv_index,
-            "battery_voltage_v": battery_v,
-        }
-
-        df = pd.DataFrame([row])
+        return self.normalize_batch([self], [raw])
 
+    def to_schema(self, df):
+        """Apply the LoEco schema and this station's metadata to a normalized frame."""
         return self.apply_schema(
             df=df,
             mapping=self.SCHEMA_MAP,
@@ -240,3 +218,145 @@ class EcowittProvider(BaseProvider):
             height_m=self.height_m,
             owner=self.owner,
         )
+
+    # ---------------------------------------------------------
+    # Batch fetch and normalization (many gateways in one pass)
+    # ---------------------------------------------------------
+    @classmethod
+    def fetch_shared(cls, providers):
+        """
+        Fetch the real_time data of every gateway of one account, normalize
+        all responses in a single normalize_batch pass and hand each
+        provider its rows. Each provider's next fetch() then returns those
+        rows (or raises its request's error) instead of calling the API.
+
+        Requests are made one after the other on the pooled session: the
+        group holds a single slot of the orchestrator's per-type limit, so
+        accounts (not gateways) are what run concurrently.
+        """
+        results = []
+        for provider in providers:
+            try:
+                results.append((provider.fetch_real_time(), None))
+            except Exception as e:
+                results.append((None, e))
+
+        for response, error in results:
+            if error is None and not (response or {}).get("data"):
+                print("[ERROR] Ecowitt returned no data:", response)
+
+        df = cls.normalize_batch(providers, [response for response, _ in results])
+        rows = {} if df.empty else {
+            str(station): part.reset_index(drop=True) for station, part in df.groupby("station", sort=False, observed=True)
+        }
+
+        for provider, (_, error) in zip(providers, results):
+            provider.shared_error = error
+            provider.shared_rows = rows.get(provider.name, pd.DataFrame())
+
+    @classmethod
+    def normalize_batch(cls, providers, responses):
+        """
+        Normalize real_time responses of many providers (one response per
+        provider, same order) into a single LoEco frame, with per-row
+        station metadata, instead of one small frame per gateway.
+        """
+        pairs = [(p, r) for p, r in zip(providers, responses) if r and r.get("data")]
+        if not pairs:
+            return pd.DataFrame()
+
+        df = normalize_responses([r for _, r in pairs])
+
+        df["schema_version"] = 1
+        df["provider"] = "ecowitt"
+        for attr, column in (
+            ("name", "station"),
+            ("latitude", "latitude"),
+            ("longitude", "longitude"),
+            ("sensor_type", "sensor_type"),
+            ("height_m", "height_m"),
+            ("owner", "owner"),
+        ):
+            df[column] = [getattr(p, attr) for p, _ in pairs]
+
+        return conform(df)
+
+    # ---------------------------------------------------------
+    # History backfill (chunked, resumable)
+    # ---------------------------------------------------------
+    def fetch_history(self, start, end, cycle_type=None):
+        """One /device/history request for [start, end] (UTC timestamps)."""
+        params = {
+            "application_key": self.application_key,
+            "api_key": self.api_key,
+            "mac": self.mac,
+            "start_date": start.strftime(self.HISTORY_DATE_FORMAT),
+            "end_date": end.strftime(self.HISTORY_DATE_FORMAT),
+            "cycle_type": cycle_type or self.HISTORY_CYCLE,
+            "call_back": self.HISTORY_CALL_BACK,
+        }
+
+        response = self.session.get(f"{self.base_url}/device/history", params=params, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+
+        raw = response.json()
+        if raw.get("code") not in (0, "0", None):
+            raise RuntimeError(f"Ecowitt history error {raw.get('code')}: {raw.get('msg')}")
+        return raw
+
+    def backfill_checkpoint(self):
+        """End of the last backfilled chunk for this MAC, or None."""
+        done_until = load_state(self.checkpoint_path).get(self.mac, {}).get("done_until")
+        return pd.Timestamp(done_until) if done_until else None
+
+    def _save_checkpoint(self, done_until):
+        state = load_state(self.checkpoint_path)
+        state.setdefault(self.mac, {})["done_until"] = done_until.isoformat()
+        save_state(self.checkpoint_path, state)
+
+    def backfill(self, start=None, end=None, chunk=None, cycle_type=None):
+        """
+        Download history from `start` (default: this MAC's checkpoint) to
+        `end` (default: now) in chunks, writing each chunk into the monthly
+        Parquet targets through save() and checkpointing after every
+        chunk, so an interrupted backfill resumes where it stopped when
+        run again without `start`. An explicit range is always downloaded,
+        also before the checkpoint (stored timestamps are skipped by
+        save()); the checkpoint never moves backwards.
+        Returns the number of rows written.
+        """
+        if not self.mac:
+            raise ValueError(f"No MAC configured for {self.name}")
+
+        end = self._utc(end) if end is not None else pd.Timestamp.now(tz="UTC").floor("s")
+        checkpoint = self.backfill_checkpoint()
+
+        if start is None:
+            if checkpoint is None:
+                raise ValueError(f"No backfill checkpoint for {self.mac}; pass a start date")
+            start = checkpoint
+        else:
+            start = self._utc(start)
+
+        step = pd.Timedelta(chunk or self.HISTORY_CHUNK)
+        written = 0
+
+        while start < end:
+            stop = min(start + step, end)
+            print(f"→ Backfilling {self.name}: {start} → {stop}")
+
+            df = normalize_history(self.fetch_history(start, stop, cycle_type=cycle_type))
+            if not df.empty:
+                written += self.save(self.to_schema(df))
+
+            if checkpoint is None or stop > checkpoint:
+                self._save_checkpoint(stop)
+                checkpoint = stop
+            start = stop
+
+        return written
+
+    @staticmethod
+    def _utc(ts):
+        ts = pd.Timestamp(ts)
+        return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
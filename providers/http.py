@@ -0,0 +1,70 @@
+# providers/http.py
+
+"""
+Shared HTTP sessions for providers.
+
+One pooled requests.Session per API (keyed by provider class), so
+connections and TLS handshakes are reused across all stations of the same
+provider type instead of being opened per request. Every session retries
+idempotent requests on connection errors, 429 and 5xx responses with
+exponential backoff (honouring Retry-After), and every call is expected to
+pass HTTP_TIMEOUT.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+HTTP_TIMEOUT = (5, 30)          # (connect, read) seconds
+RETRIES = 3
+BACKOFF_FACTOR = 0.5            # 0.5s, 1s, 2s, ...
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_POOL_SIZE = 10
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE, retries=RETRIES, backoff_factor=BACKOFF_FACTOR) -> requests.Session:
+    """A Session with a connection pool of `pool_size` and retry/backoff."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(key, pool_size=DEFAULT_POOL_SIZE) -> requests.Session:
+    """
+    Shared session for `key` (e.g. a provider class name), created on
+    first use. Sessions are shared between threads; the adapter's pool
+    bounds the number of open sockets to `pool_size` per host.
+    """
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = make_session(pool_size)
+        return session
+
+
+def close_sessions():
+    """Close all shared sessions (end of a run)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,256 @@
+# providers/mqtt_provider.py
+
+import threading
+import time
+import uuid
+
+import pandas as pd
+from providers.base_provider import BaseProvider
+from providers.ttn_provider import TTNProvider
+from providers.ttn_stream import read_messages
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # optional dependency, only needed for live ingest
+    mqtt = None
+
+
+class TTNMQTTProvider(BaseProvider):
+    """
+    Consumes TTN uplinks in real time from the TTN MQTT server instead of
+    polling the Storage Integration.
+
+    Uplinks are buffered in memory as they arrive and normalised in
+    micro-batches: every fetch() drains the buffer, so each run (or each
+    `loeco serve` poll) stores exactly the uplinks received since the last
+    one. If normalising or saving a drained batch fails, its uplinks go
+    back to the front of the buffer and are retried with the next flush.
+    serve_forever() flushes on its own whenever `flush_rows` uplinks are
+    buffered or `flush_seconds` have passed, and keeps listening when a
+    flush fails.
+
+    Any MQTT broker speaking the TTN topic layout works (host/port/tls are
+    configurable, e.g. a local Mosquitto); a paho-compatible `client` can
+    also be injected.
+    """
+
+    TOPIC = "v3/{username}/devices/{device}/up"
+
+    MAX_CONCURRENCY = 4
+
+    def __init__(
+        self,
+        name,
+        token,
+        application_id,
+        target_file,
+        latitude=None,
+        longitude=None,
+        sensor_type=None,
+        height_m=None,
+        owner=None,
+        device_id=None,
+        host="eu1.cloud.thethings.network",
+        port=8883,
+        tls=True,
+        tenant="ttn",
+        flush_rows=1000,
+        flush_seconds=60,
+        client=None,
+    ):
+        super().__init__(name, target_file)
+
+        self.token = token
+        self.application_id = application_id
+        self.device_id = device_id
+
+        self.host = host
+        self.port = int(port)
+        self.tls = tls
+        self.username = f"{application_id}@{tenant}"
+
+        self.flush_rows = int(flush_rows)
+        self.flush_seconds = float(flush_seconds)
+
+        self.client = client
+        self.connected = False
+
+        # Raw uplink payloads received since the last drain, and the last
+        # drained batch until it has been saved
+        self.buffer = []
+        self.drained = []
+        self.lock = threading.Lock()
+        self.flush_now = threading.Event()
+
+        self.latitude = latitude
+        self.longitude = longitude
+        self.sensor_type = sensor_type
+        self.height_m = height_m
+        self.owner = owner
+
+    # ---------------------------------------------------------
+    # MQTT connection
+    # ---------------------------------------------------------
+    def topic(self):
+        return self.TOPIC.format(username=self.username, device=self.device_id or "+")
+
+    def _make_client(self):
+        if mqtt is None:
+            raise ImportError("paho-mqtt is required for the ttn_mqtt provider (pip install paho-mqtt)")
+
+        client_id = f"loeco-{self.name}-{uuid.uuid4().hex[:8]}"
+        try:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+        except AttributeError:  # paho-mqtt < 2.0
+            client = mqtt.Client(client_id=client_id)
+
+        if self.tls:
+            client.tls_set()
+        return client
+
+    def start(self):
+        """Connect and subscribe; messages are then buffered in the background."""
+        if self.connected:
+            return
+
+        if self.client is None:
+            self.client = self._make_client()
+
+        self.client.username_pw_set(self.username, self.token)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+
+        self.client.connect(self.host, self.port)
+        self.client.loop_start()
+        self.connected = True
+
+    def stop(self):
+        if self.connected:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self.connected = False
+
+    def on_connect(self, client, userdata, *args):
+        # (Re)subscribe on every connect, so reconnects keep receiving
+        client.subscribe(self.topic(), qos=0)
+
+    def on_message(self, client, userdata, message):
+        with self.lock:
+            self.buffer.append(bytes(message.payload))
+            if len(self.buffer) >= self.flush_rows:
+                self.flush_now.set()
+
+    # ---------------------------------------------------------
+    # REQUIRED ABSTRACT METHOD IMPLEMENTATION
+    # ---------------------------------------------------------
+    def fetch(self):
+        """Drain the uplinks buffered since the last fetch."""
+        self.start()
+
+        with self.lock:
+            payloads, self.buffer = self.buffer, []
+            self.drained = payloads
+            self.flush_now.clear()
+
+        return payloads or None
+
+    # ---------------------------------------------------------
+    # REQUIRED ABSTRACT METHOD IMPLEMENTATION
+    # ---------------------------------------------------------
+    def normalize(self, raw):
+        if not raw:
+            return pd.DataFrame()
+
+        # Every MQTT message is one JSON document (possibly pretty-printed)
+        df = read_messages(raw)
+        if self.device_id is not None:
+            df = df[df["device_id"] == self.device_id]
+        if df.empty:
+            return pd.DataFrame()
+
+        rows = df.drop(columns=["device_id", "f_cnt"]).rename(columns={"received_at": "timestamp"})
+        rows["timestamp"] = rows["timestamp"].dt.floor("s")
+
+        return self.apply_schema(
+            df=rows.reset_index(drop=True),
+            mapping=TTNProvider.SCHEMA_MAP,
+            provider="ttn",
+            station=self.name,
+            latitude=self.latitude,
+            longitude=self.longitude,
+            sensor_type=self.sensor_type,
+            height_m=self.height_m,
+            owner=self.owner,
+        )
+
+    # ---------------------------------------------------------
+    # A drained batch is only dropped once it has been saved
+    # ---------------------------------------------------------
+    def restore(self):
+        """Put the last drained batch back in front of the buffer (its save failed)."""
+        with self.lock:
+            self.buffer[:0] = self.drained
+            self.drained = []
+
+    def collect(self):
+        self.drained = []
+        try:
+            return super().collect()
+        except Exception:
+            self.restore()
+            raise
+
+    def run(self):
+        try:
+            super().run()
+        except Exception:
+            self.restore()
+            raise
+
+    def commit(self):
+        self.drained = []
+
+    # ---------------------------------------------------------
+    # Standalone ingest loop with size/time flush thresholds
+    # ---------------------------------------------------------
+    def serve_forever(self, stop_event=None):
+        """
+        Keep consuming and flush the buffer to Parquet whenever
+        `flush_rows` uplinks are waiting or `flush_seconds` have passed.
+        A failed flush is logged, its uplinks stay buffered and it is
+        retried after `flush_seconds`. Flushes the remainder when
+        `stop_event` is set.
+        """
+        stop_event = stop_event or threading.Event()
+        self.start()
+
+        last_flush = time.monotonic()
+        retry_at = 0.0
+        try:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                if now < retry_at:
+                    # Back off after a failed flush; uplinks keep buffering
+                    self.flush_now.clear()
+                    stop_event.wait(min(retry_at - now, 1.0))
+                    continue
+
+                timeout = max(0.0, last_flush + self.flush_seconds - now)
+                self.flush_now.wait(timeout=min(timeout, 1.0))
+
+                if self.flush_now.is_set() or time.monotonic() - last_flush >= self.flush_seconds:
+                    if not self._flush():
+                        retry_at = time.monotonic() + self.flush_seconds
+                    last_flush = time.monotonic()
+        finally:
+            self._flush()
+            self.stop()
+
+    def _flush(self):
+        """run(), logging a failure instead of raising; True when it succeeded."""
+        try:
+            self.run()
+            return True
+        except Exception as e:
+            print(f"[ERROR] Flushing {self.name} failed, keeping {len(self.buffer)} uplinks buffered: {e}")
+            return False
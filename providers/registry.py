@@ -0,0 +1,82 @@
+# providers/registry.py
+
+"""
+Provider registry with lazy imports.
+
+Provider classes are looked up by their stations.json `type` and imported
+only when first requested, so a run only pays for the providers that are
+actually enabled. A type resolves, in order, to:
+
+1. an explicit dotted path on the entry: "class": "my_pkg.netatmo:NetatmoProvider"
+2. a built-in provider (BUILTIN_PROVIDERS)
+3. an installed package's entry point in the "loeco.providers" group, e.g.
+   [project.entry-points."loeco.providers"]
+   netatmo = "loeco_netatmo:NetatmoProvider"
+"""
+
+import importlib
+from importlib.metadata import entry_points
+
+
+ENTRY_POINT_GROUP = "loeco.providers"
+
+BUILTIN_PROVIDERS = {
+    "ttn": "providers.ttn_provider:TTNProvider",
+    "ecowitt": "providers.ecowitt_provider:EcowittProvider",
+    "ttn_mqtt": "providers.mqtt_provider:TTNMQTTProvider",
+}
+
+_registry = dict(BUILTIN_PROVIDERS)
+_classes = {}
+
+
+def register(provider_type, path):
+    """Register (or override) the dotted path of a provider type."""
+    _registry[provider_type] = path
+    _classes.pop(provider_type, None)
+
+
+def import_path(path):
+    """Import "package.module:Class" (or "package.module.Class")."""
+    module_name, _, attr = path.partition(":") if ":" in path else path.rpartition(".")
+    if not module_name or not attr:
+        raise ImportError(f"Invalid provider path: {path!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _entry_point(provider_type):
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name == provider_type:
+            return ep
+    return None
+
+
+def provider_types():
+    """All known provider types (built-in, registered and entry points), without importing them."""
+    types = set(_registry)
+    types.update(ep.name for ep in entry_points(group=ENTRY_POINT_GROUP))
+    return sorted(types)
+
+
+def provider_class(provider_type, path=None):
+    """
+    Provider class for `provider_type`, imported on first use.
+    `path` (an entry's "class") takes precedence over the registry.
+    Raises KeyError for unknown types.
+    """
+    key = path or provider_type
+    if key in _classes:
+        return _classes[key]
+
+    if path:
+        cls = import_path(path)
+    elif provider_type in _registry:
+        cls = import_path(_registry[provider_type])
+    else:
+        ep = _entry_point(provider_type)
+        if ep is None:
+            raise KeyError(f"Unknown provider type: {provider_type}")
+        cls = ep.load()
+
+    _classes[key] = cls
+    return cls
@@ -7,208 +7,277 @@ This schema defines the full set of normalized observation fields used across
 all providers (TTN, Ecowitt, future sensors). Every Parquet file produced by
 LoEco must contain ALL of these columns, even if many are null.
 
+Each field has a fixed Arrow type, enforced when files are written:
+- measurements are float32, coordinates float64
+- provider / station / sensor_type (and other labels) are dictionary-encoded
+- timestamp is timestamp[ms, UTC], schema_version int16
+
 This ensures:
-- Stable long-term storage
+- Stable long-term storage (identical types across providers and runs)
 - Provider-agnostic downstream processing
 - Zero-cost schema evolution
 - Efficient Parquet compression (null-heavy columns compress extremely well)
 """
 
-LOECO_SCHEMA = [
+import pandas as pd
+import pyarrow as pa
+
+
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+STRING_DICT = pa.dictionary(pa.int32(), pa.string())
+MEASUREMENT = pa.float32()
+
+LOECO_ARROW_SCHEMA = pa.schema([
 
     # ----------------------------------------------------------------------
     # Metadata
     # ----------------------------------------------------------------------
-    "schema_version",
-    "timestamp",
-    "provider",
-    "station",
-    "latitude",
-    "longitude",
-    "sensor_type",
-    "height_m",
+    pa.field("schema_version", pa.int16()),
+    pa.field("timestamp", TIMESTAMP),
+    pa.field("provider", STRING_DICT),
+    pa.field("station", STRING_DICT),
+    pa.field("latitude", pa.float64()),
+    pa.field("longitude", pa.float64()),
+    pa.field("sensor_type", STRING_DICT),
+    pa.field("height_m", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Primary weather - Temperature & Humidity
     # ----------------------------------------------------------------------
-    "temperature_c",
-    "humidity_pct",
-    "dewpoint_c",
-    "wet_bulb_temperature_c",
-    "feels_like_c",
-    "heat_index_c",
-    "wind_chill_c",
-    "thw_index_c",
-    "thsw_index_c",
-    "black_bulb_temperature_c",
+    pa.field("temperature_c", MEASUREMENT),
+    pa.field("humidity_pct", MEASUREMENT),
+    pa.field("dewpoint_c", MEASUREMENT),
+    pa.field("wet_bulb_temperature_c", MEASUREMENT),
+    pa.field("feels_like_c", MEASUREMENT),
+    pa.field("heat_index_c", MEASUREMENT),
+    pa.field("wind_chill_c", MEASUREMENT),
+    pa.field("thw_index_c", MEASUREMENT),
+    pa.field("thsw_index_c", MEASUREMENT),
+    pa.field("black_bulb_temperature_c", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Primary weather - Pressure
     # ----------------------------------------------------------------------
-    "pressure_hpa",
-    "vapor_pressure_hpa",
+    pa.field("pressure_hpa", MEASUREMENT),
+    pa.field("vapor_pressure_hpa", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Primary weather - Wind
     # ----------------------------------------------------------------------
-    "wind_speed_ms",
-    "wind_gust_ms",
-    "wind_dir_deg",
-    "wind_speed_avg_10min_ms",
-    "wind_dir_avg_10min_deg",
+    pa.field("wind_speed_ms", MEASUREMENT),
+    pa.field("wind_gust_ms", MEASUREMENT),
+    pa.field("wind_dir_deg", MEASUREMENT),
+    pa.field("wind_speed_avg_10min_ms", MEASUREMENT),
+    pa.field("wind_dir_avg_10min_deg", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Primary weather - Precipitation
     # ----------------------------------------------------------------------
-    "rain_mm",
-    "rain_rate_mmhr",
-    "rain_daily_mm",
-    "rain_event_mm",
-    "precipitation_type",
-    "precipitation_type_code",
+    pa.field("rain_mm", MEASUREMENT),
+    pa.field("rain_rate_mmhr", MEASUREMENT),
+    pa.field("rain_daily_mm", MEASUREMENT),
+    pa.field("rain_event_mm", MEASUREMENT),
+    pa.field("precipitation_type", STRING_DICT),
+    pa.field("precipitation_type_code", pa.int16()),
 
     # ----------------------------------------------------------------------
     # Primary weather - Solar & UV
     # ----------------------------------------------------------------------
-    "solar_wm2",
-    "solar_radiation_perceived_wm2",
-    "uv_index",
-    "lux",
+    pa.field("solar_wm2", MEASUREMENT),
+    pa.field("solar_radiation_perceived_wm2", MEASUREMENT),
+    pa.field("uv_index", MEASUREMENT),
+    pa.field("lux", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Primary weather - Visibility & ET
     # ----------------------------------------------------------------------
-    "visibility_m",
-    "et_mm",
-    "et_daily_mm",
+    pa.field("visibility_m", MEASUREMENT),
+    pa.field("et_mm", MEASUREMENT),
+    pa.field("et_daily_mm", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Indoor conditions
     # ----------------------------------------------------------------------
-    "temperature_indoor_c",
-    "humidity_indoor_pct",
-    "pressure_indoor_hpa",
-    "co2_indoor_ppm",
+    pa.field("temperature_indoor_c", MEASUREMENT),
+    pa.field("humidity_indoor_pct", MEASUREMENT),
+    pa.field("pressure_indoor_hpa", MEASUREMENT),
+    pa.field("co2_indoor_ppm", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Extra temperatures
     # ----------------------------------------------------------------------
-    "temperature_1_c",
-    "temperature_2_c",
-    "temperature_3_c",
-    "temperature_4_c",
-    "temperature_5_c",
-    "water_temperature_c",
+    pa.field("temperature_1_c", MEASUREMENT),
+    pa.field("temperature_2_c", MEASUREMENT),
+    pa.field("temperature_3_c", MEASUREMENT),
+    pa.field("temperature_4_c", MEASUREMENT),
+    pa.field("temperature_5_c", MEASUREMENT),
+    pa.field("water_temperature_c", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Extra humidity
     # ----------------------------------------------------------------------
-    "humidity_1_pct",
-    "humidity_2_pct",
-    "humidity_3_pct",
-    "humidity_4_pct",
-    "humidity_5_pct",
+    pa.field("humidity_1_pct", MEASUREMENT),
+    pa.field("humidity_2_pct", MEASUREMENT),
+    pa.field("humidity_3_pct", MEASUREMENT),
+    pa.field("humidity_4_pct", MEASUREMENT),
+    pa.field("humidity_5_pct", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Soil temperature
     # ----------------------------------------------------------------------
-    "soil_temperature_1_c",
-    "soil_temperature_2_c",
-    "soil_temperature_3_c",
-    "soil_temperature_4_c",
-    "soil_temperature_5_c",
+    pa.field("soil_temperature_1_c", MEASUREMENT),
+    pa.field("soil_temperature_2_c", MEASUREMENT),
+    pa.field("soil_temperature_3_c", MEASUREMENT),
+    pa.field("soil_temperature_4_c", MEASUREMENT),
+    pa.field("soil_temperature_5_c", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Soil moisture
     # ----------------------------------------------------------------------
-    "soil_moisture_1_pct",
-    "soil_moisture_2_pct",
-    "soil_moisture_3_pct",
-    "soil_moisture_4_pct",
-    "soil_moisture_5_pct",
+    pa.field("soil_moisture_1_pct", MEASUREMENT),
+    pa.field("soil_moisture_2_pct", MEASUREMENT),
+    pa.field("soil_moisture_3_pct", MEASUREMENT),
+    pa.field("soil_moisture_4_pct", MEASUREMENT),
+    pa.field("soil_moisture_5_pct", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Soil advanced (professional sensors)
     # ----------------------------------------------------------------------
-    "soil_ec_dsm",
-    "soil_water_potential_kpa",
-    "soil_salinity_ppt",
+    pa.field("soil_ec_dsm", MEASUREMENT),
+    pa.field("soil_water_potential_kpa", MEASUREMENT),
+    pa.field("soil_salinity_ppt", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Leaf wetness
     # ----------------------------------------------------------------------
-    "leaf_wetness_1",
-    "leaf_wetness_2",
-    "leaf_wetness_3",
-    "leaf_wetness_4",
-    "leaf_wetness_5",
+    pa.field("leaf_wetness_1", MEASUREMENT),
+    pa.field("leaf_wetness_2", MEASUREMENT),
+    pa.field("leaf_wetness_3", MEASUREMENT),
+    pa.field("leaf_wetness_4", MEASUREMENT),
+    pa.field("leaf_wetness_5", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Air quality - Particulate matter
     # ----------------------------------------------------------------------
-    "pm1_0_ugm3",
-    "pm2_5_ugm3",
-    "pm4_0_ugm3",
-    "pm10_ugm3",
+    pa.field("pm1_0_ugm3", MEASUREMENT),
+    pa.field("pm2_5_ugm3", MEASUREMENT),
+    pa.field("pm4_0_ugm3", MEASUREMENT),
+    pa.field("pm10_ugm3", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Air quality - Gases
     # ----------------------------------------------------------------------
-    "co2_ppm",
-    "co_ppm",
-    "no2_ppb",
-    "o3_ppb",
-    "voc_index",
-    "formaldehyde_mgm3",
+    pa.field("co2_ppm", MEASUREMENT),
+    pa.field("co_ppm", MEASUREMENT),
+    pa.field("no2_ppb", MEASUREMENT),
+    pa.field("o3_ppb", MEASUREMENT),
+    pa.field("voc_index", MEASUREMENT),
+    pa.field("formaldehyde_mgm3", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Air quality - Index
     # ----------------------------------------------------------------------
-    "aqi",
+    pa.field("aqi", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Lightning
     # ----------------------------------------------------------------------
-    "lightning_strike_count",
-    "lightning_distance_km",
+    pa.field("lightning_strike_count", pa.int32()),
+    pa.field("lightning_distance_km", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Power & signal
     # ----------------------------------------------------------------------
-    "battery_voltage_v",
-    "battery_pct",
-    "solar_panel_voltage_v",
-    "signal_strength_dbm",
-    "reception_quality_pct",
+    pa.field("battery_voltage_v", MEASUREMENT),
+    pa.field("battery_pct", MEASUREMENT),
+    pa.field("solar_panel_voltage_v", MEASUREMENT),
+    pa.field("signal_strength_dbm", MEASUREMENT),
+    pa.field("reception_quality_pct", MEASUREMENT),
 
     # ----------------------------------------------------------------------
     # Status & diagnostics
     # ----------------------------------------------------------------------
-    "sensor_status",
-    "uptime_seconds",
-    "transmission_failures",
+    pa.field("sensor_status", STRING_DICT),
+    pa.field("uptime_seconds", pa.int64()),
+    pa.field("transmission_failures", pa.int32()),
 
     # ----------------------------------------------------------------------
     # Reserved future observation classes (20 fields)
     # ----------------------------------------------------------------------
-    "obs_future_01",
-    "obs_future_02",
-    "obs_future_03",
-    "obs_future_04",
-    "obs_future_05",
-    "obs_future_06",
-    "obs_future_07",
-    "obs_future_08",
-    "obs_future_09",
-    "obs_future_10",
-    "obs_future_11",
-    "obs_future_12",
-    "obs_future_13",
-    "obs_future_14",
-    "obs_future_15",
-    "obs_future_16",
-    "obs_future_17",
-    "obs_future_18",
-    "obs_future_19",
-    "obs_future_20",
-]
+    pa.field("obs_future_01", MEASUREMENT),
+    pa.field("obs_future_02", MEASUREMENT),
+    pa.field("obs_future_03", MEASUREMENT),
+    pa.field("obs_future_04", MEASUREMENT),
+    pa.field("obs_future_05", MEASUREMENT),
+    pa.field("obs_future_06", MEASUREMENT),
+    pa.field("obs_future_07", MEASUREMENT),
+    pa.field("obs_future_08", MEASUREMENT),
+    pa.field("obs_future_09", MEASUREMENT),
+    pa.field("obs_future_10", MEASUREMENT),
+    pa.field("obs_future_11", MEASUREMENT),
+    pa.field("obs_future_12", MEASUREMENT),
+    pa.field("obs_future_13", MEASUREMENT),
+    pa.field("obs_future_14", MEASUREMENT),
+    pa.field("obs_future_15", MEASUREMENT),
+    pa.field("obs_future_16", MEASUREMENT),
+    pa.field("obs_future_17", MEASUREMENT),
+    pa.field("obs_future_18", MEASUREMENT),
+    pa.field("obs_future_19", MEASUREMENT),
+    pa.field("obs_future_20", MEASUREMENT),
+])
+
+
+# Column names, in schema order
+LOECO_SCHEMA = LOECO_ARROW_SCHEMA.names
+
+
+# ----------------------------------------------------------------------
+# Conversion helpers
+# ----------------------------------------------------------------------
+def pandas_dtype(arrow_type):
+    """pandas dtype used in memory for a schema field type."""
+    if arrow_type == TIMESTAMP:
+        return pd.DatetimeTZDtype("ns", "UTC")
+    if pa.types.is_dictionary(arrow_type):
+        return "category"
+    if pa.types.is_integer(arrow_type):
+        return {8: "Int8", 16: "Int16", 32: "Int32", 64: "Int64"}[arrow_type.bit_width]
+    return arrow_type.to_pandas_dtype()
+
+
+def conform(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return `df` with exactly the LoEco columns, in schema order, each cast
+    to its schema dtype. Missing columns are filled with typed nulls.
+    Categorical (dictionary) columns always have string categories, even
+    when all-null, so they convert to the schema's string dictionaries.
+    """
+    columns = {}
+    for field in LOECO_ARROW_SCHEMA:
+        dtype = pandas_dtype(field.type)
+
+        if field.name not in df.columns:
+            if pa.types.is_dictionary(field.type):
+                dtype = pd.CategoricalDtype(pd.Index([], dtype="string"))
+            columns[field.name] = pd.Series(None, index=df.index, dtype=dtype)
+            continue
+
+        values = df[field.name]
+        if field.type == TIMESTAMP:
+            # Millisecond resolution is the stored precision
+            values = pd.to_datetime(values, utc=True, errors="coerce").dt.floor("ms")
+        elif pa.types.is_dictionary(field.type):
+            # Not astype(str): an all-null column would get float64 categories
+            values = values.astype("string")
+        elif not isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.to_numeric(values, errors="coerce")
+            if pa.types.is_integer(field.type):
+                values = values.round()
+        columns[field.name] = values.astype(dtype)
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a LoEco frame into an Arrow table with LOECO_ARROW_SCHEMA."""
+    return pa.Table.from_pandas(conform(df), schema=LOECO_ARROW_SCHEMA, preserve_index=False)
@@ -1,10 +1,11 @@
 # providers/ttn_provider.py
 
-import json
-import requests
+import os
 import pandas as pd
-from datetime import datetime, timedelta
 from providers.base_provider import BaseProvider
+from providers.http import HTTP_TIMEOUT
+from providers.ttn_stream import CHUNK_SIZE, read_uplinks
+from utils.ttn_cursor import TTNCursor
 
 
 class TTNProvider(BaseProvider):
@@ -18,6 +19,11 @@ class TTNProvider(BaseProvider):
         "{app_id}/packages/storage/uplink_message"
     )
 
+    MAX_CONCURRENCY = 4
+
+    # One Storage Integration stream per application (fetch_shared)
+    SHARE_FIELDS = ("application_id", "token")
+
     SCHEMA_MAP = {
         "timestamp": "timestamp",
         "temperature_c": "temperature_c",
@@ -47,13 +53,34 @@ class TTNProvider(BaseProvider):
         sensor_type=None,
         height_m=None,
         owner=None,
+        cursor_path=None,
+        backfill=False,
+        device_id=None,
+        keep_history=False,
     ):
         super().__init__(name, target_file)
 
         self.token = token
         self.application_id = application_id
         self.lookback = lookback
-        self.device_id = name  # device_id matches provider name
+        # end_device_ids.device_id this station is fed by; None takes
+        # every device of the application
+        self.device_id = device_id
+
+        # Store every fetched uplink instead of only the latest one, so a
+        # single fetch fills the history since the cursor
+        self.keep_history = keep_history
+
+        # High-water mark of received_at, so runs only fetch new uplinks;
+        # `lookback` is only used for the first run or a forced backfill
+        self.cursor = TTNCursor(cursor_path or os.path.join("data", f"{name}.cursor.json"))
+        self.backfill = backfill
+        self.pending_marks = {}
+        self.cursor_dirty = False
+
+        # Rows handed over from a stream shared with other providers of
+        # the same application (see fetch_shared)
+        self.uplinks = None
 
         self.latitude = latitude
         self.longitude = longitude
@@ -64,7 +91,12 @@ class TTNProvider(BaseProvider):
     # ---------------------------------------------------------
     # Fetch TTN uplinks via SSE stream
     # ---------------------------------------------------------
-    def fetch(self):
+    def stream_params(self):
+        """Storage Integration params for this provider's cursor."""
+        return self.cursor.params(self.application_id, self.lookback, backfill=self.backfill)
+
+    def stream(self, params):
+        """Stream the application's uplinks into a DataFrame (all devices)."""
         url = self.TTN_URL.format(app_id=self.application_id)
 
         headers = {
@@ -72,56 +104,99 @@ class TTNProvider(BaseProvider):
             "Accept": "text/event-stream",
         }
 
-        params = {"last": self.lookback}
-
-        rows = []
-
-        with requests.get(url, headers=headers, params=params, stream=True) as r:
+        with self.session.get(url, headers=headers, params=params, stream=True, timeout=HTTP_TIMEOUT) as r:
             r.raise_for_status()
+            return read_uplinks(r.iter_content(chunk_size=CHUNK_SIZE))
+
+    def own_rows(self, uplinks):
+        """Rows of `uplinks` that belong to this provider's device."""
+        if self.device_id is None:
+            return uplinks
+        return uplinks[uplinks["device_id"] == self.device_id]
+
+    @classmethod
+    def shared_params(cls, providers):
+        """
+        One set of params covering every provider's cursor: the longest
+        lookback if any provider needs one, else the earliest `after`.
+        """
+        params = [provider.stream_params() for provider in providers]
+
+        lookbacks = [p["last"] for p in params if "last" in p]
+        if lookbacks:
+            return {"last": max(lookbacks, key=pd.Timedelta)}
+        return {"after": min((p["after"] for p in params), key=pd.Timestamp)}
+
+    @classmethod
+    def fetch_shared(cls, providers):
+        """
+        Open a single stream for several providers of the same application
+        and hand each provider its rows, demultiplexed on device_id.
+        Each provider's next fetch() then uses those rows instead of
+        streaming the application again.
+        """
+        unassigned = [provider.name for provider in providers if provider.device_id is None]
+        if len(unassigned) > 1:
+            print(f"[WARN] TTN providers {', '.join(unassigned)} share application "
+                  f"{providers[0].application_id} without a device_id; each gets every device's uplinks")
+
+        uplinks = providers[0].stream(cls.shared_params(providers))
+
+        for provider in providers:
+            provider.uplinks = provider.own_rows(uplinks)
 
-            for line in r.iter_lines():
-                if not line:
-                    continue
+    def fetch(self):
+        params = self.stream_params()
+        after = pd.Timestamp(params["after"]) if "after" in params else None
+
+        self.pending_marks = {}
 
-                decoded = line.decode("utf-8").strip()
+        if self.uplinks is not None:
+            df, self.uplinks = self.uplinks, None
+        else:
+            df = self.own_rows(self.stream(params))
 
-                if decoded.startswith("data: "):
-                    decoded = decoded[6:]
+        if after is not None:
+            df = df[df["received_at"] > after]
 
-                if not decoded.startswith("{"):
-                    continue
+        if df.empty:
+            print("[WARN] TTN returned no valid uplinks")
+            return None
 
-                try:
-                    payload = json.loads(decoded)
-                    result = payload.get("result", payload)
+        self.pending_marks = df.groupby("device_id")["received_at"].max().to_dict()
 
-                    uplink = result.get("uplink_message", {})
-                    decoded_payload = uplink.get("decoded_payload", {})
-                    ts = result.get("received_at")
+        if self.keep_history:
+            # All uplinks as one frame. Re-sent uplinks are dropped per
+            # device on the full-resolution received_at: flooring first
+            # would merge devices reporting within the same second
+            rows = df.drop_duplicates(subset=["device_id", "received_at"], keep="last")
+            rows = rows.drop(columns=["device_id", "f_cnt"]).rename(columns={"received_at": "timestamp"})
+            return rows.sort_values("timestamp", kind="stable").reset_index(drop=True)
 
-                    # Parse timestamp safely
-                    ts_clean = ts.split(".")[0] + "Z" if ts else None
-                    ts_parsed = (
-                        datetime.fromisoformat(ts_clean.replace("Z", "+00:00"))
-                        if ts_clean
-                        else None
-                    )
+        # Return the latest uplink only (second resolution)
+        latest = df.loc[df["received_at"].idxmax()]
+        row = {"timestamp": latest["received_at"].floor("s")}
+        row.update(latest.drop(["device_id", "received_at", "f_cnt"]).to_dict())
+        return row
 
-                    if ts_parsed:
-                        row = {"timestamp": ts_parsed}
-                        row.update(decoded_payload)
-                        rows.append(row)
+    # ---------------------------------------------------------
+    # Move the cursor past what was collected; persist it once saved
+    # ---------------------------------------------------------
+    def collect(self):
+        df = super().collect()
 
-                except Exception:
-                    continue
+        # Later fetches in this process continue after these uplinks
+        for device_id, received_at in self.pending_marks.items():
+            self.cursor.advance(self.application_id, device_id, received_at)
+        self.cursor_dirty = self.cursor_dirty or bool(self.pending_marks)
+        self.pending_marks = {}
 
-        if not rows:
-            print("[WARN] TTN returned no valid uplinks")
-            return None
+        return df
 
-        # Return the latest uplink only
-        rows = sorted(rows, key=lambda r: r["timestamp"])
-        return rows[-1]
+    def commit(self):
+        if self.cursor_dirty:
+            self.cursor.save()
+            self.cursor_dirty = False
 
     # ---------------------------------------------------------
     # Normalize TTN uplink into LoEco schema
@@ -130,7 +205,9 @@ class TTNProvider(BaseProvider):
         if raw is None:
             return pd.DataFrame()
 
-        df = pd.DataFrame([raw])
+        # A frame of uplinks (keep_history) or the latest uplink's row;
+        # apply_schema is vectorised over all rows either way
+        df = raw if isinstance(raw, pd.DataFrame) else pd.DataFrame([raw])
 
         return self.apply_schema(
             df=df,
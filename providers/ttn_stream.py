@@ -0,0 +1,178 @@
+# providers/ttn_stream.py
+
+"""
+Streaming decoder for TTN Storage Integration responses.
+
+Reads the HTTP body in large chunks, splits SSE events (or NDJSON lines)
+directly on bytes, parses each JSON payload once (with orjson when it is
+installed) and emits columnar batches instead of a list of per-uplink dicts.
+Timestamps are parsed once per batch, not once per uplink.
+
+Messages that arrive already separated (MQTT payloads) skip the splitter
+and are decoded one document each by read_messages().
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # optional fast path
+    _loads = json.loads
+
+
+CHUNK_SIZE = 1 << 16     # bytes read from the socket at a time
+BATCH_SIZE = 10_000      # uplinks per emitted batch
+
+
+# ---------------------------------------------------------
+# Event splitting
+# ---------------------------------------------------------
+def iter_payloads(chunks):
+    """
+    Yield raw JSON payloads (bytes) from an SSE or NDJSON byte stream.
+
+    SSE events are terminated by a blank line; their `data:` lines are
+    joined. Lines that are bare JSON objects (NDJSON) are yielded as-is.
+    Comments and other SSE fields (`event:`, `id:`) are ignored.
+    """
+    buffer = bytearray()
+    data_lines = []
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+
+            stop = end - 1 if end > start and buffer[end - 1] == 0x0D else end  # \r\n
+
+            if stop == start:
+                # Blank line: end of an SSE event
+                if data_lines:
+                    yield data_lines[0] if len(data_lines) == 1 else b"\n".join(data_lines)
+                    data_lines = []
+            elif buffer.startswith(b"data:", start, stop):
+                offset = start + 5
+                if offset < stop and buffer[offset] == 0x20:  # optional space
+                    offset += 1
+                data_lines.append(bytes(buffer[offset:stop]))
+            elif buffer[start] == 0x7B:  # "{" — NDJSON line
+                yield bytes(buffer[start:stop])
+
+            start = end + 1
+
+        del buffer[:start]
+
+    if data_lines:
+        yield data_lines[0] if len(data_lines) == 1 else b"\n".join(data_lines)
+    if buffer.strip().startswith(b"{"):
+        yield bytes(buffer.strip())
+
+
+# ---------------------------------------------------------
+# Columnar uplink batches
+# ---------------------------------------------------------
+def iter_uplink_batches(chunks, batch_size=BATCH_SIZE):
+    """
+    Decode a TTN uplink stream into columnar batches.
+
+    Each batch is a dict of equal-length arrays:
+        device_id   : object array
+        received_at : DatetimeIndex, UTC (parsed once per batch)
+        f_cnt       : float64 (NaN when absent)
+        <field>     : one array per decoded_payload key (None when absent)
+    Uplinks without an uplink_message or a valid received_at are dropped.
+    """
+    yield from iter_message_batches(iter_payloads(chunks), batch_size=batch_size)
+
+
+def iter_message_batches(messages, batch_size=BATCH_SIZE):
+    """
+    Columnar batches (as iter_uplink_batches) from already separated
+    messages, e.g. MQTT payloads: each item is one complete JSON document,
+    which may span several lines.
+    """
+    device_ids, received_at, f_cnt, payloads = [], [], [], []
+
+    for raw in messages:
+        try:
+            message = _loads(raw)
+        except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
+            continue
+        # Valid JSON that is not an uplink object (a list, string, number)
+        if not isinstance(message, dict):
+            continue
+
+        result = message.get("result", message)
+        uplink = result.get("uplink_message") if isinstance(result, dict) else None
+        if not uplink or not isinstance(uplink, dict):
+            continue
+
+        ids = result.get("end_device_ids")
+        device_ids.append(ids.get("device_id") if isinstance(ids, dict) else None)
+        received_at.append(result.get("received_at"))
+        f_cnt.append(uplink.get("f_cnt"))
+
+        decoded_payload = uplink.get("decoded_payload")
+        payloads.append(decoded_payload if isinstance(decoded_payload, dict) else {})
+
+        if len(payloads) >= batch_size:
+            batch = _columnar(device_ids, received_at, f_cnt, payloads)
+            if batch:
+                yield batch
+            device_ids, received_at, f_cnt, payloads = [], [], [], []
+
+    if payloads:
+        batch = _columnar(device_ids, received_at, f_cnt, payloads)
+        if batch:
+            yield batch
+
+
+def _columnar(device_ids, received_at, f_cnt, payloads):
+    times = pd.to_datetime(pd.Series(received_at, dtype=object), utc=True, format="ISO8601", errors="coerce")
+    valid = times.notna().to_numpy()
+    if not valid.any():
+        return None
+
+    batch = {
+        "device_id": np.fromiter(device_ids, dtype=object, count=len(device_ids))[valid],
+        "received_at": pd.DatetimeIndex(times[valid]),
+        "f_cnt": np.array([np.nan if v is None else v for v in f_cnt], dtype=float)[valid],
+    }
+
+    # Union of decoded_payload keys, in first-seen order
+    keys = dict.fromkeys(k for payload in payloads for k in payload)
+    for key in keys:
+        if key in batch:
+            continue
+        values = (payload.get(key) for payload in payloads)
+        batch[key] = np.fromiter(values, dtype=object, count=len(payloads))[valid]
+
+    return batch
+
+
+def read_uplinks(chunks, batch_size=BATCH_SIZE) -> pd.DataFrame:
+    """Decode a whole TTN uplink stream into a single DataFrame."""
+    return _frame(iter_uplink_batches(chunks, batch_size=batch_size))
+
+
+def read_messages(messages, batch_size=BATCH_SIZE) -> pd.DataFrame:
+    """Decode separate uplink messages (one JSON document each) into a single DataFrame."""
+    return _frame(iter_message_batches(messages, batch_size=batch_size))
+
+
+def _frame(batches):
+    frames = [pd.DataFrame(batch).infer_objects() for batch in batches]
+    if not frames:
+        return pd.DataFrame(columns=["device_id", "received_at", "f_cnt"])
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
@@ -0,0 +1,191 @@
+# storage/compaction.py
+
+"""
+Compaction of small Parquet fragments.
+
+Ingest writes one small `part-*.parquet` fragment per run into each
+partition directory (see storage.dataset). Compaction merges a partition's
+fragments into right-sized files, sorted by time and deduplicated on
+(device, timestamp, f_cnt). Compacted files are written into the partition
+under hidden temporary names, which readers skip, and renamed into place
+before the fragments they replace are removed, so a reader or a crash can
+see duplicate rows for a moment but never a partition with rows missing.
+"""
+
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage.dataset import PART_PREFIX, PART_SUFFIX, list_fragments
+
+
+TARGET_FILE_BYTES = 64 * 1024 * 1024     # target size of a compacted file
+ROW_GROUP_BYTES = 8 * 1024 * 1024        # target size of a row group
+MIN_FRAGMENTS = 2                        # leave partitions with fewer alone
+
+DEVICE_KEYS = ("device_id", "station")
+TIME_KEYS = ("time", "timestamp")
+
+
+# ---------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------
+def find_partitions(root):
+    """Directories under `root` that contain fragments (hidden dirs skipped)."""
+    partitions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith((".", "_")))
+        if any(f.startswith(PART_PREFIX) and f.endswith(PART_SUFFIX) for f in filenames):
+            partitions.append(dirpath)
+    return partitions
+
+
+def _size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+# ---------------------------------------------------------
+# Merge
+# ---------------------------------------------------------
+def _merge(fragments) -> pd.DataFrame:
+    """Concatenate fragments, sort by time and drop duplicate observations."""
+    df = pd.concat((pd.read_parquet(path) for path in fragments), sort=False)
+
+    time_key = next((k for k in TIME_KEYS if k in df.columns), None)
+    by_index = time_key is None and isinstance(df.index, pd.DatetimeIndex)
+    index_name = df.index.name or "time"
+
+    if by_index:
+        df = df.reset_index(names=index_name)
+        time_key = index_name
+
+    if time_key is not None:
+        df = df.sort_values(time_key, kind="stable")
+        keys = [k for k in DEVICE_KEYS if k in df.columns] + [time_key]
+        if "f_cnt" in df.columns:
+            keys.append("f_cnt")
+        # Later fragments win over earlier ones for the same observation
+        df = df.drop_duplicates(subset=keys, keep="last")
+
+    if by_index:
+        df = df.set_index(time_key)
+    else:
+        df = df.reset_index(drop=True)
+
+    return df
+
+
+def _to_table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    """
+    Convert the merged frame back to Arrow with the schema of the newest
+    fragment, so compaction keeps typed columns (float32, dictionary
+    strings, ms timestamps) instead of re-inferring them from pandas.
+    """
+    preserve_index = isinstance(df.index, pd.DatetimeIndex)
+    names = list(df.columns) + ([df.index.name or "time"] if preserve_index else [])
+
+    if set(names) == set(schema.names):
+        try:
+            return pa.Table.from_pandas(df, schema=schema, preserve_index=preserve_index)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass  # fragments disagree on types; fall back to inference
+
+    return pa.Table.from_pandas(df, preserve_index=preserve_index)
+
+
+def _write_files(table: pa.Table, directory, stamp, bytes_per_row, target_file_bytes, row_group_bytes):
+    """
+    Write `table` into `directory` as right-sized files under hidden
+    temporary names. Returns (temporary path, final path) pairs.
+    """
+    rows_per_file = max(1, int(target_file_bytes // bytes_per_row))
+    rows_per_group = max(1, min(rows_per_file, int(row_group_bytes // bytes_per_row)))
+
+    files = []
+    try:
+        for n, offset in enumerate(range(0, max(table.num_rows, 1), rows_per_file)):
+            # Named after the compaction start, so fragments keep sorting in write order
+            name = f"{PART_PREFIX}{stamp}-compacted-{n:04d}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}"
+            tmp_path = os.path.join(directory, f".{name}.tmp")
+            files.append((tmp_path, os.path.join(directory, name)))
+            pq.write_table(table.slice(offset, rows_per_file), tmp_path, row_group_size=rows_per_group)
+    except BaseException:
+        for tmp_path, _ in files:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+    return files
+
+
+# ---------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------
+def compact_partition(
+    directory,
+    target_file_bytes=TARGET_FILE_BYTES,
+    row_group_bytes=ROW_GROUP_BYTES,
+    min_fragments=MIN_FRAGMENTS,
+    dry_run=False,
+):
+    """
+    Compact one partition directory. Returns a report dict, or None when
+    the partition has fewer than `min_fragments` fragments.
+
+    The new files are written next to the fragments under hidden temporary
+    names and renamed into place one by one (os.replace is atomic); only
+    then are the merged fragments unlinked. Fragments appended by a writer
+    while compaction was running are never touched. A crash in between
+    leaves the merged fragments next to the compacted files; the rows they
+    duplicate are dropped by the next compaction.
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    fragments = list_fragments(directory)
+    if len(fragments) < max(min_fragments, 1):
+        return None
+
+    bytes_before = _size(fragments)
+    df = _merge(fragments)
+    rows_before = sum(pq.ParquetFile(p).metadata.num_rows for p in fragments)
+
+    report = {
+        "partition": directory,
+        "files_before": len(fragments),
+        "bytes_before": bytes_before,
+        "rows_before": rows_before,
+        "rows_after": len(df),
+    }
+
+    if dry_run:
+        report.update(files_after=None, bytes_after=None)
+        return report
+
+    table = _to_table(df, pq.read_schema(fragments[-1]))
+    bytes_per_row = max(bytes_before / max(rows_before, 1), 1.0)
+
+    files = _write_files(table, directory, stamp, bytes_per_row, target_file_bytes, row_group_bytes)
+
+    # Publish the compacted files, then retire the fragments they replace
+    for tmp_path, path in files:
+        os.replace(tmp_path, path)
+    for path in fragments:
+        os.remove(path)
+
+    report.update(
+        files_after=len(files),
+        bytes_after=_size(path for _, path in files),
+    )
+    return report
+
+
+def compact_all(root, **kwargs):
+    """Compact every partition under `root`; returns the list of reports."""
+    reports = []
+    for directory in find_partitions(root):
+        report = compact_partition(directory, **kwargs)
+        if report is not None:
+            reports.append(report)
+    return reports
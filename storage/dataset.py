@@ -0,0 +1,222 @@
+# storage/dataset.py
+
+"""
+Append-only, Hive-partitioned Parquet datasets.
+
+Layout:
+    <root>/device_id=<device>/year=<YYYY>/month=<MM>/part-<utc>-<id>.parquet
+
+Partition values are URI-encoded in the directory names (see
+partition_value) and decoded again by read_dataset.
+
+Every run writes one small fragment per partition it has new rows for;
+existing files are never read back or rewritten, so the write cost of a run
+is proportional to the new data only. Fragments are merged periodically by
+storage.compaction (compact_data.py). The partition values live in the
+directory names, not in the fragment files.
+"""
+
+import os
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+PART_PREFIX = "part-"
+PART_SUFFIX = ".parquet"
+
+
+# ---------------------------------------------------------
+# Paths
+# ---------------------------------------------------------
+def partition_value(value) -> str:
+    """
+    A partition value as a single, safe path segment. Values are URI-encoded,
+    as pyarrow's hive partitioning decodes them, so a device ID with "/",
+    ".." or spaces can neither leave the dataset root nor add directories.
+    A leading "." or "_" is encoded as well: readers skip such directories.
+    """
+    text = str(value)
+    if not text:
+        raise ValueError("Partition values must not be empty")
+    quoted = quote(text, safe="")
+    if quoted[0] in "._":
+        quoted = f"%{ord(quoted[0]):02X}{quoted[1:]}"
+    return quoted
+
+
+def partition_dir(root, **keys) -> str:
+    """Hive-style partition directory, e.g. root/device_id=x/year=2026/month=01."""
+    parts = [f"{key}={partition_value(value)}" for key, value in keys.items()]
+    return os.path.join(root, *parts)
+
+
+def list_fragments(directory):
+    """Sorted list of fragment files in a partition directory."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith(PART_PREFIX) and name.endswith(PART_SUFFIX)
+    )
+
+
+def _fragment_name():
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return f"{PART_PREFIX}{stamp}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}"
+
+
+# ---------------------------------------------------------
+# Writing
+# ---------------------------------------------------------
+def write_fragment(directory, df, index=True) -> str:
+    """
+    Write `df` (a DataFrame or an Arrow table) as a new fragment in
+    `directory`. The file is written under a temporary name and renamed into place, so
+    readers never see a partially written fragment.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, _fragment_name())
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+
+    if isinstance(df, pa.Table):
+        pq.write_table(df, tmp_path)
+    else:
+        df.to_parquet(tmp_path, index=index)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def file_max_timestamp(path, column="time"):
+    """
+    Latest value of `column` in one Parquet file, read from the footer
+    statistics only (no data pages are decoded). None when unknown.
+    """
+    metadata = pq.ParquetFile(path).metadata
+    names = metadata.schema.names
+    if column not in names:
+        return None
+    col_idx = names.index(column)
+
+    latest = None
+    for rg in range(metadata.num_row_groups):
+        stats = metadata.row_group(rg).column(col_idx).statistics
+        if stats is None or not stats.has_min_max:
+            continue
+        value = _utc(pd.Timestamp(stats.max))
+        if latest is None or value > latest:
+            latest = value
+
+    return latest
+
+
+def max_timestamp(directory, column="time"):
+    """Latest value of `column` across a partition's fragments (footer stats only)."""
+    latest = None
+
+    for path in list_fragments(directory):
+        value = file_max_timestamp(path, column)
+        if value is not None and (latest is None or value > latest):
+            latest = value
+
+    return latest
+
+
+def stored_timestamps(directory, start, end, column="time") -> pd.DatetimeIndex:
+    """
+    Timestamps already stored in a partition between `start` and `end`.
+    Only fragments whose footer min/max overlap the range are opened, and
+    only the timestamp column is read from them.
+    """
+    found = []
+
+    for path in list_fragments(directory):
+        parquet_file = pq.ParquetFile(path)
+        metadata = parquet_file.metadata
+        names = metadata.schema.names
+        if column not in names:
+            continue
+        col_idx = names.index(column)
+
+        for rg in range(metadata.num_row_groups):
+            stats = metadata.row_group(rg).column(col_idx).statistics
+            if stats is not None and stats.has_min_max:
+                lo, hi = (_utc(pd.Timestamp(v)) for v in (stats.min, stats.max))
+                if hi < start or lo > end:
+                    continue
+            values = parquet_file.read_row_group(rg, columns=[column]).column(0).to_pandas()
+            found.append(pd.to_datetime(values, utc=True))
+
+    if not found:
+        return pd.DatetimeIndex([], tz="UTC")
+    return pd.DatetimeIndex(pd.concat(found, ignore_index=True)).unique()
+
+
+def _utc(ts: pd.Timestamp) -> pd.Timestamp:
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def append_partitioned(root, df: pd.DataFrame, by="device_id") -> pd.DataFrame:
+    """
+    Append new rows of a time-indexed frame to a device/year/month dataset.
+
+    Rows at or before the latest timestamp already stored in their
+    partition are skipped. Returns the rows that were actually written.
+    """
+    if df.empty:
+        return df
+
+    index = pd.DatetimeIndex(df.index)
+    keys = [df[by], index.year, index.month]
+    written = []
+
+    for (device, year, month), part in df.groupby(keys, sort=True):
+        directory = partition_dir(root, **{by: device}, year=f"{year:04d}", month=f"{month:02d}")
+
+        last_ts = max_timestamp(directory, column=part.index.name or "time")
+        new_only = part[part.index > last_ts] if last_ts is not None else part
+        if new_only.empty:
+            continue
+
+        path = write_fragment(directory, new_only.drop(columns=[by]).sort_index())
+        print(f"Appended {len(new_only)} rows → {path}")
+        written.append(new_only)
+
+    if not written:
+        return df.iloc[0:0]
+    return pd.concat(written).sort_index()
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+def read_dataset(root, columns=None, filter=None) -> pd.DataFrame:
+    """
+    Read a partitioned dataset back into one frame.
+    Partition keys (e.g. device_id) come back as columns.
+
+    The schema is unified over all fragments: a column that is all-null in
+    one fragment (null type) and typed in another is read with the typed
+    one, and narrower numeric types are promoted, instead of every fragment
+    being cast to whichever schema pyarrow happened to inspect first.
+    """
+    options = dict(
+        format="parquet",
+        partitioning="hive",
+        exclude_invalid_files=True,
+        ignore_prefixes=[".", "_"],
+    )
+    dataset = ds.dataset(root, **options)
+    schemas = [dataset.schema] + [fragment.physical_schema for fragment in dataset.get_fragments()]
+    schema = pa.unify_schemas(schemas, promote_options="permissive")
+    if not schema.equals(dataset.schema):
+        dataset = ds.dataset(root, schema=schema, **options)
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
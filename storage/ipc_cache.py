@@ -0,0 +1,184 @@
+# storage/ipc_cache.py
+
+"""
+Memory-mapped Arrow IPC cache of hot Parquet files.
+
+Parquet is compact but every read pays for decompression and decoding.
+read_table() keeps an uncompressed Arrow IPC (Feather v2) copy of a
+Parquet file or fragment directory under <cache_dir>, and opens it with
+memory mapping: repeated reads of the same partition cost page faults
+instead of decode CPU, and the columns are used in place (zero-copy).
+
+Each cache file records the signature of its source (fragment names,
+sizes and modification times) in its schema metadata. When the source
+changes (a new fragment, a compaction, a rewritten file) the signature
+no longer matches and the copy is rebuilt on the next read. The cache only
+pays off for inputs that rarely change (closed months): a file rewritten
+between every two reads costs a decode plus an uncompressed write each
+time, so read such files directly. prune_cache() deletes copies whose
+source is gone or has changed. The cache is disposable: deleting
+<cache_dir> only costs one rebuild per partition.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from storage.dataset import list_fragments
+
+
+CACHE_DIR = os.path.join("data", ".cache")
+CACHE_SUFFIX = ".arrow"
+SOURCE_KEY = b"loeco.cache.source"
+PATH_KEY = b"loeco.cache.path"
+
+
+# ---------------------------------------------------------
+# Source signature / cache paths
+# ---------------------------------------------------------
+def source_files(path):
+    """Parquet files behind `path` (a single file or a fragment directory)."""
+    return list_fragments(path) if os.path.isdir(path) else [path]
+
+
+def source_signature(path) -> str:
+    """Fingerprint of the files behind `path`; changes whenever any of them does."""
+    entries = []
+    for file in source_files(path):
+        stat = os.stat(file)
+        entries.append([os.path.basename(file), stat.st_size, stat.st_mtime_ns])
+    return json.dumps(entries, separators=(",", ":"))
+
+
+def cache_path(path, cache_dir=CACHE_DIR) -> str:
+    """Cache file for `path`: readable name plus a hash of the absolute path."""
+    source = os.path.abspath(path)
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    name = os.path.basename(source.rstrip(os.sep))
+    return os.path.join(cache_dir, f"{name}-{digest}{CACHE_SUFFIX}")
+
+
+# ---------------------------------------------------------
+# Cache files
+# ---------------------------------------------------------
+def _open(target, signature):
+    """Memory-mapped table at `target`, or None when missing or stale."""
+    if not os.path.exists(target):
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(target, "r"))
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    metadata = reader.schema.metadata or {}
+    if metadata.get(SOURCE_KEY) != signature.encode("utf-8"):
+        return None
+    return reader.read_all()
+
+
+def _write(target, table, signature, source):
+    """Write `table` uncompressed (so it can be mapped) under a temporary name, then rename."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_KEY] = signature.encode("utf-8")
+    metadata[PATH_KEY] = os.path.abspath(source).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f"{target}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, target)
+
+
+def _read_parquet(path, schema=None) -> pa.Table:
+    return ds.dataset(source_files(path), schema=schema, format="parquet").to_table()
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+def read_table(path, columns=None, schema=None, cache_dir=CACHE_DIR) -> pa.Table:
+    """
+    Read a Parquet file or fragment directory through the IPC cache.
+
+    Parameters:
+    -----------
+    path : str
+        Parquet file, or directory of part-*.parquet fragments.
+    columns : list of str, optional
+        Columns to return (selected from the mapped table, no copy).
+        Stored pandas index columns are kept so to_pandas() restores the index.
+    schema : pa.Schema, optional
+        Schema to read the Parquet files with (e.g. LOECO_ARROW_SCHEMA,
+        so legacy files are cached with the typed schema).
+    cache_dir : str
+        Cache directory.
+
+    Returns:
+    --------
+    pa.Table backed by the memory-mapped cache file.
+    """
+    signature = source_signature(path)
+    target = cache_path(path, cache_dir)
+
+    table = _open(target, signature)
+    if table is None:
+        _write(target, _read_parquet(path, schema), signature, path)
+        table = _open(target, signature)
+
+    if columns is None:
+        return table
+
+    index_columns = [
+        col for col in (table.schema.pandas_metadata or {}).get("index_columns", [])
+        if isinstance(col, str) and col not in columns
+    ]
+    return table.select([col for col in columns if col in table.schema.names] + index_columns)
+
+
+def read_pandas(path, columns=None, schema=None, cache_dir=CACHE_DIR):
+    """read_table() as a DataFrame."""
+    return read_table(path, columns=columns, schema=schema, cache_dir=cache_dir).to_pandas()
+
+
+def prune_cache(cache_dir=CACHE_DIR, keep=None):
+    """
+    Delete stale cache files: copies whose source no longer exists or has
+    changed since it was cached, and copies for which `keep(source path)`
+    is False. Returns the number deleted.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    deleted = 0
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        target = os.path.join(cache_dir, name)
+        try:
+            metadata = pa.ipc.open_file(pa.memory_map(target, "r")).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            metadata = {}
+
+        source = metadata.get(PATH_KEY, b"").decode("utf-8")
+        if (
+            source
+            and os.path.exists(source)
+            and metadata.get(SOURCE_KEY) == source_signature(source).encode("utf-8")
+            and (keep is None or keep(source))
+        ):
+            continue
+        os.remove(target)
+        deleted += 1
+    return deleted
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Delete every cached copy."""
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,192 @@
+# storage/query.py
+
+"""
+Column-pruned reads over the LoEco provider dataset.
+
+Layout (written by BaseProvider.save):
+    <root>/<YYYY>/<MM>/<type>__<station>.parquet/part-*.parquet
+
+read_observations() never loads the full ~120-column universal schema
+unless asked to. Month directories and station targets outside the query
+are skipped by path alone; inside the remaining fragments only the
+requested columns are decoded, and the time range is pushed down to the
+Parquet row-group statistics so non-overlapping row groups are not read.
+
+With cache=True the targets of the last closed months (CACHE_MONTHS) are
+read through the memory-mapped Arrow IPC cache (storage.ipc_cache)
+instead, so dashboards re-reading them do not decode them again. The
+current month is appended to by every run and is always read from
+Parquet; copies of months that left the window are pruned.
+"""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from providers.schema import LOECO_ARROW_SCHEMA, TIMESTAMP
+from storage.ipc_cache import CACHE_DIR, prune_cache, read_table, source_files
+
+
+TARGET_SUFFIX = ".parquet"
+TYPE_SEPARATOR = "__"
+KEY_COLUMNS = ["timestamp", "station"]
+
+# Closed months (before the current one) served from the IPC cache with cache=True
+CACHE_MONTHS = 2
+
+
+# ---------------------------------------------------------
+# Path pruning
+# ---------------------------------------------------------
+def _month_dirs(root, start=None, end=None):
+    """<root>/<YYYY>/<MM> directories overlapping [start, end]."""
+    if not os.path.isdir(root):
+        return
+
+    for year in sorted(os.listdir(root)):
+        if len(year) != 4 or not year.isdigit():
+            continue
+        for month in sorted(os.listdir(os.path.join(root, year))):
+            if len(month) != 2 or not month.isdigit():
+                continue
+
+            first = pd.Timestamp(year=int(year), month=int(month), day=1, tz="UTC")
+            if start is not None and first + pd.offsets.MonthBegin(1) <= start:
+                continue
+            if end is not None and first > end:
+                continue
+            yield os.path.join(root, year, month)
+
+
+def observation_targets(root="data", stations=None, providers=None, start=None, end=None):
+    """
+    <type>__<station>.parquet targets (fragment directories or legacy
+    files) for the given stations / provider types in [start, end].
+    Stations and provider types are matched on the target name, so other
+    targets are never opened.
+    """
+    start, end = _utc(start), _utc(end)
+    targets = []
+
+    for month_dir in _month_dirs(root, start, end):
+        for entry in sorted(os.listdir(month_dir)):
+            if not entry.endswith(TARGET_SUFFIX) or TYPE_SEPARATOR not in entry:
+                continue
+
+            provider_type, station = entry[: -len(TARGET_SUFFIX)].split(TYPE_SEPARATOR, 1)
+            if stations is not None and station not in stations:
+                continue
+            if providers is not None and provider_type not in providers:
+                continue
+
+            targets.append(os.path.join(month_dir, entry))
+
+    return targets
+
+
+def observation_files(root="data", stations=None, providers=None, start=None, end=None):
+    """Parquet files behind observation_targets()."""
+    targets = observation_targets(root, stations=stations, providers=providers, start=start, end=end)
+    # Legacy targets are single files, current ones fragment directories
+    return [path for target in targets for path in source_files(target)]
+
+
+def _is_cacheable(target, months=CACHE_MONTHS):
+    """True when `target` lies in one of the last `months` closed month directories."""
+    month_dir = os.path.dirname(os.path.normpath(target))
+    year, month = os.path.basename(os.path.dirname(month_dir)), os.path.basename(month_dir)
+    if not (year.isdigit() and month.isdigit()):
+        return False
+    first = pd.Timestamp(year=int(year), month=int(month), day=1, tz="UTC")
+    current = pd.Timestamp.now(tz="UTC").normalize().replace(day=1)
+    return current - pd.DateOffset(months=months) <= first < current
+
+
+def _utc(ts):
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+# ---------------------------------------------------------
+# Query
+# ---------------------------------------------------------
+def read_observations(
+    stations=None,
+    columns=None,
+    start=None,
+    end=None,
+    root="data",
+    providers=None,
+    cache=False,
+    cache_dir=CACHE_DIR,
+) -> pd.DataFrame:
+    """
+    Read LoEco observations with projection and predicate pushdown.
+
+    Parameters:
+    -----------
+    stations : iterable of str, optional
+        Station names (provider `name` in stations.json). All when None.
+    columns : iterable of str, optional
+        Schema columns to read besides timestamp and station. All when None.
+    start, end : timestamp-like, optional
+        Inclusive time range (naive values are taken as UTC).
+    root : str
+        Data directory.
+    providers : iterable of str, optional
+        Provider types (e.g. "ttn", "ecowitt"). All when None.
+    cache : bool
+        Read the targets of the last CACHE_MONTHS closed months through
+        the memory-mapped IPC cache in `cache_dir`.
+    cache_dir : str
+        IPC cache directory.
+
+    Returns:
+    --------
+    pd.DataFrame sorted by station and timestamp, with the schema dtypes
+    (float32 measurements, categorical labels, UTC timestamps).
+    """
+    stations = None if stations is None else set([stations] if isinstance(stations, str) else stations)
+    providers = None if providers is None else set([providers] if isinstance(providers, str) else providers)
+    start, end = _utc(start), _utc(end)
+
+    if columns is None:
+        projection = list(LOECO_ARROW_SCHEMA.names)
+    else:
+        unknown = [c for c in columns if c not in LOECO_ARROW_SCHEMA.names]
+        if unknown:
+            raise KeyError(f"Not in LOECO_SCHEMA: {unknown}")
+        projection = KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS]
+
+    targets = observation_targets(root, stations=stations, providers=providers, start=start, end=end)
+    hot = [target for target in targets if _is_cacheable(target)] if cache else []
+    if cache:
+        prune_cache(cache_dir, keep=_is_cacheable)
+    files = [path for target in targets if target not in hot for path in source_files(target)]
+    if not hot and not files:
+        return LOECO_ARROW_SCHEMA.empty_table().select(projection).to_pandas()
+
+    predicate = None
+    if start is not None:
+        predicate = ds.field("timestamp") >= pa.scalar(start.to_pydatetime(), type=TIMESTAMP)
+    if end is not None:
+        upper = ds.field("timestamp") <= pa.scalar(end.to_pydatetime(), type=TIMESTAMP)
+        predicate = upper if predicate is None else predicate & upper
+
+    tables = []
+    if hot:
+        # Cached copies are full typed tables; project and filter them in memory
+        cached = [read_table(target, schema=LOECO_ARROW_SCHEMA, cache_dir=cache_dir) for target in hot]
+        tables.append(ds.dataset(cached, schema=LOECO_ARROW_SCHEMA).to_table(columns=projection, filter=predicate))
+    if files:
+        # The explicit schema lets legacy (untyped) files be read alongside typed ones
+        dataset = ds.dataset(files, schema=LOECO_ARROW_SCHEMA, format="parquet")
+        tables.append(dataset.to_table(columns=projection, filter=predicate))
+
+    df = pa.concat_tables(tables).to_pandas()
+
+    return df.sort_values(["station", "timestamp"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,228 @@
+# storage/ring_buffer.py
+
+"""
+Fixed-size rolling window of recent observations per device.
+
+The window is a ring of `slots = window / resolution` time bins per device
+(e.g. 7 days at 30 min = 336 slots), stored as plain arrays:
+
+    values.npy : float64 [devices, slots, columns]
+    bins.npy   : int64   [devices, slots]   time bin held by each slot
+    meta.json  : devices, columns, window, resolution
+
+A sample at time t goes to slot (t // resolution) % slots and overwrites
+whatever older bin was there, so updates are in place and the files never
+grow. The arrays are .npy files opened with numpy memory mapping: readers
+map them instead of decoding anything, so the read cost is constant too.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+EMPTY_BIN = np.iinfo("int64").min
+
+VALUES_FILE = "values.npy"
+BINS_FILE = "bins.npy"
+META_FILE = "meta.json"
+
+
+class RingBuffer:
+    """
+    Rolling window of numeric columns per device, backed by memory-mapped
+    .npy files in `path` (a directory).
+    """
+
+    def __init__(self, path, devices, columns, window="7D", resolution="30min", mode="r+"):
+        self.path = path
+        self.devices = list(devices)
+        self.columns = list(columns)
+        self.window = window
+        self.resolution = resolution
+
+        self.step = pd.Timedelta(resolution).value
+        self.slots = int(pd.Timedelta(window).value // self.step)
+        if self.slots < 1:
+            raise ValueError(f"Window {window} is shorter than the resolution {resolution}")
+
+        self.values = np.lib.format.open_memmap(os.path.join(path, VALUES_FILE), mode=mode)
+        self.bins = np.lib.format.open_memmap(os.path.join(path, BINS_FILE), mode=mode)
+
+    # ---------------------------------------------------------
+    # Creation / opening
+    # ---------------------------------------------------------
+    @classmethod
+    def create(cls, path, devices, columns, window="7D", resolution="30min"):
+        """Create an empty window (overwrites an existing one at `path`)."""
+        devices, columns = list(devices), list(columns)
+        slots = int(pd.Timedelta(window).value // pd.Timedelta(resolution).value)
+        os.makedirs(path, exist_ok=True)
+
+        values = np.lib.format.open_memmap(
+            os.path.join(path, VALUES_FILE), mode="w+", dtype="float64",
+            shape=(len(devices), slots, len(columns)),
+        )
+        values[:] = np.nan
+        values.flush()
+
+        bins = np.lib.format.open_memmap(
+            os.path.join(path, BINS_FILE), mode="w+", dtype="int64", shape=(len(devices), slots),
+        )
+        bins[:] = EMPTY_BIN
+        bins.flush()
+        del values, bins
+
+        cls._write_meta(path, devices, columns, window, resolution)
+        return cls(path, devices, columns, window, resolution)
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        """Open an existing window; mode "r" for readers, "r+" to update."""
+        with open(os.path.join(path, META_FILE), "r") as f:
+            meta = json.load(f)
+        return cls(path, meta["devices"], meta["columns"], meta["window"], meta["resolution"], mode=mode)
+
+    @classmethod
+    def open_or_create(cls, path, devices, columns, window="7D", resolution="30min"):
+        """
+        Open `path` for updating, creating it when missing. The window is
+        rebuilt (keeping its data) when new devices or columns appear, or
+        recreated empty when window/resolution changed.
+        """
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return cls.create(path, devices, columns, window, resolution)
+
+        ring = cls.open(path, mode="r+")
+        if (ring.window, ring.resolution) != (window, resolution):
+            ring.close()
+            return cls.create(path, devices, columns, window, resolution)
+
+        new_devices = [d for d in devices if d not in ring.devices]
+        new_columns = [c for c in columns if c not in ring.columns]
+        if new_devices or new_columns:
+            ring = ring._grow(new_devices, new_columns)
+        return ring
+
+    @staticmethod
+    def _write_meta(path, devices, columns, window, resolution):
+        meta = {"devices": devices, "columns": columns, "window": window, "resolution": resolution}
+        tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+
+    def _grow(self, new_devices, new_columns):
+        """Rewrite the arrays with extra devices/columns (rare: new sensor or field)."""
+        values, bins = np.array(self.values), np.array(self.bins)
+        devices, columns = self.devices + new_devices, self.columns + new_columns
+        self.close()
+
+        ring = RingBuffer.create(self.path, devices, columns, self.window, self.resolution)
+        ring.values[: values.shape[0], :, : values.shape[2]] = values
+        ring.bins[: bins.shape[0]] = bins
+        ring.flush()
+        return ring
+
+    def flush(self):
+        self.values.flush()
+        self.bins.flush()
+
+    def close(self):
+        self.flush()
+        self.values = self.bins = None
+
+    # ---------------------------------------------------------
+    # Update
+    # ---------------------------------------------------------
+    def update(self, df: pd.DataFrame, by="device_id"):
+        """
+        Write the rows of a time-indexed frame into the window in place.
+        Rows are binned to the resolution; within the frame the latest row
+        for a slot wins (a later row of the same bin, or a newer bin that
+        wraps onto the same slot). Only bins newer than what a
+        slot already holds are written: a bin that is already stored is
+        never overwritten, so re-sent (e.g. overlapping) rows cannot replace
+        values written by an earlier run. Columns not in the window are
+        ignored. Returns the number of slots written.
+        """
+        if df.empty:
+            return 0
+
+        index = pd.DatetimeIndex(df.index)
+        index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+        time_bins = index.as_unit("ns").asi8 // self.step
+
+        device_idx = pd.Index(self.devices).get_indexer(df[by])
+        known = device_idx >= 0
+        if not known.all():
+            raise KeyError(f"Devices not in the window: {sorted(set(df[by][~known]))}")
+
+        columns = [c for c in self.columns if c in df.columns]
+        column_idx = np.array([self.columns.index(c) for c in columns], dtype=int)
+        values = df[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+
+        # Time order, so the last row of a slot below is the latest
+        order = np.argsort(time_bins, kind="stable")
+        time_bins, device_idx, values = time_bins[order], device_idx[order], values[order]
+
+        slot_idx = time_bins % self.slots
+        newer = time_bins > self.bins[device_idx, slot_idx]
+        time_bins, device_idx, slot_idx, values = (
+            time_bins[newer], device_idx[newer], slot_idx[newer], values[newer]
+        )
+
+        # One row per (device, slot), the latest: numpy leaves the order of
+        # repeated indices in a fancy assignment unspecified
+        key = device_idx.astype(np.int64) * self.slots + slot_idx
+        _, from_end = np.unique(key[::-1], return_index=True)
+        last = len(key) - 1 - from_end
+        time_bins, device_idx, slot_idx, values = time_bins[last], device_idx[last], slot_idx[last], values[last]
+
+        # A slot taken over by a newer bin starts empty
+        self.values[device_idx, slot_idx, :] = np.nan
+
+        self.values[device_idx[:, None], slot_idx[:, None], column_idx[None, :]] = values
+        self.bins[device_idx, slot_idx] = time_bins
+        return len(last)
+
+    # ---------------------------------------------------------
+    # Read
+    # ---------------------------------------------------------
+    def frame(self, devices=None, columns=None, by="device_id") -> pd.DataFrame:
+        """
+        The current window as a time-indexed frame with a `by` column,
+        like latest.parquet. Bins older than the window behind the newest
+        bin of any device are left out.
+        """
+        columns = list(columns) if columns is not None else self.columns
+        column_idx = [self.columns.index(c) for c in columns if c in self.columns]
+        devices = list(devices) if devices is not None else self.devices
+
+        head = self.bins.max() if self.bins.size else EMPTY_BIN
+        if head == EMPTY_BIN:
+            return pd.DataFrame(columns=[by] + columns, index=pd.DatetimeIndex([], tz="UTC", name="time"))
+
+        frames = []
+        for device in devices:
+            if device not in self.devices:
+                continue
+            d = self.devices.index(device)
+            bins = np.asarray(self.bins[d])
+            live = bins > head - self.slots
+            order = np.argsort(bins[live])
+
+            index = pd.to_datetime(bins[live][order] * self.step, utc=True)
+            part = pd.DataFrame(
+                np.asarray(self.values[d])[live][order][:, column_idx],
+                index=pd.DatetimeIndex(index, name="time"),
+                columns=[self.columns[i] for i in column_idx],
+            )
+            part.insert(0, by, device)
+            frames.append(part)
+
+        if not frames:
+            return pd.DataFrame(columns=[by] + columns, index=pd.DatetimeIndex([], tz="UTC", name="time"))
+        return pd.concat(frames).sort_index(kind="stable")
@@ -0,0 +1,295 @@
+# storage/rollups.py
+
+"""
+Pre-aggregated hourly, daily and monthly rollups per device.
+
+Layout:
+    <root>/hourly/<YYYY>.parquet
+    <root>/daily.parquet
+    <root>/monthly.parquet
+
+Every table holds one row per (device, period) with mergeable partial
+aggregates, so new rows are folded in without touching the raw history:
+
+    <col>__sum, <col>__count, <col>__min, <col>__max    measurements
+    <col>__sum, <col>__count                            rain totals (is_summed)
+    <dir>__u_sum, <dir>__v_sum, <dir>__count            wind direction, as the
+                                                        speed-weighted unit vector
+
+Merging two partials is a sum of sums and counts and a min of mins / max
+of maxes, so update_rollups() only aggregates the rows a run actually
+wrote and merges them into the (small) existing tables. read_rollup()
+derives means, rain totals and vector-averaged wind direction on read.
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+ROLLUP_DIR = os.path.join("data", "rollups")
+
+# level → (period, file split) ; a split of "%Y" writes one file per year
+LEVELS = {
+    "hourly": ("1h", "%Y"),
+    "daily": ("1D", None),
+    "monthly": ("MS", None),
+}
+
+# Accumulated quantities: summed over the period instead of averaged
+SUM_COLUMNS = ("rain_mm", "rain_event_mm")
+
+# (speed, direction) pairs whose direction is vector-averaged
+WIND_COLUMNS = (("wind_speed_ms", "wind_dir_deg"), ("wind_speed_avg_10min_ms", "wind_dir_avg_10min_deg"))
+
+# The same classes for other fields (e.g. raw TTN decoder names such as
+# "Rain_mm" or "WindDir"), matched as substrings of the lower-cased column
+# name like processing.pipeline does: rain amounts are summed unless they
+# are rates or running totals, wind directions are vector-averaged,
+# weighted by a wind speed column when there is one
+SUM_KEYS = ("rain",)
+NOT_SUM_KEYS = ("rate", "intensity", "daily", "total")
+WIND_KEY, DIRECTION_KEY, SPEED_KEYS = "wind", "dir", ("speed", "spd")
+
+# Counters, flags and station metadata that are not measurements
+EXCLUDE_COLUMNS = ("f_cnt", "schema_version", "year", "month", "interp_mask", "latitude", "longitude", "height_m")
+
+TIME_COLUMN = "time"
+SEPARATOR = "__"
+
+
+# ---------------------------------------------------------
+# Partial aggregates
+# ---------------------------------------------------------
+def _period_start(times: pd.DatetimeIndex, period) -> pd.DatetimeIndex:
+    """Start of the period each UTC timestamp falls in."""
+    if period == "MS":
+        months = times.tz_convert(None).to_period("M").to_timestamp()
+        return pd.DatetimeIndex(months).tz_localize("UTC")
+    return times.floor(period)
+
+
+def _measurement_columns(df, by):
+    numeric = df.select_dtypes("number").columns
+    return [c for c in numeric if c != by and c not in EXCLUDE_COLUMNS]
+
+
+def is_summed(column) -> bool:
+    """True for accumulated quantities (rain amounts), summed over a period."""
+    name = column.lower()
+    if column in SUM_COLUMNS:
+        return True
+    return any(k in name for k in SUM_KEYS) and not any(k in name for k in NOT_SUM_KEYS)
+
+
+def wind_pairs(columns):
+    """
+    (speed, direction) pairs of the wind directions among `columns`; speed
+    is None for a direction without a speed column (every reading weighs 1).
+    """
+    pairs = [(s, d) for s, d in WIND_COLUMNS if s in columns and d in columns]
+    paired = {d for _, d in pairs}
+
+    def is_wind(c, *keys):
+        name = c.lower()
+        return WIND_KEY in name and any(k in name for k in keys)
+
+    speeds = [c for c in columns if is_wind(c, *SPEED_KEYS) and not is_wind(c, DIRECTION_KEY)]
+    for column in columns:
+        if column not in paired and is_wind(column, DIRECTION_KEY):
+            pairs.append((speeds[0] if speeds else None, column))
+    return pairs
+
+
+def aggregate(df: pd.DataFrame, period, by="device_id") -> pd.DataFrame:
+    """
+    Partial aggregates of a time-indexed frame per (`by`, period start).
+    Returns a frame with `by`, TIME_COLUMN and <col>__<stat> columns.
+    """
+    times = pd.DatetimeIndex(df.index)
+    times = times.tz_localize("UTC") if times.tz is None else times.tz_convert("UTC")
+
+    columns = _measurement_columns(df, by)
+    values = df[columns].astype("float64")
+    values.index = pd.RangeIndex(len(values))
+
+    pairs = wind_pairs(columns)
+    directions = {d for _, d in pairs}
+    plain = [c for c in columns if c not in directions]
+    means = [c for c in plain if not is_summed(c)]
+
+    # Speed-weighted unit vectors; calm or missing pairs do not count
+    for speed, direction in pairs:
+        radians = np.deg2rad(values[direction])
+        weight = values[speed] if speed is not None else 1.0
+        valid = values[direction].notna() & (values[speed].notna() if speed is not None else True)
+        values[f"{direction}{SEPARATOR}u"] = (weight * np.sin(radians)).where(valid)
+        values[f"{direction}{SEPARATOR}v"] = (weight * np.cos(radians)).where(valid)
+
+    keys = [df[by].to_numpy(), _period_start(times, period)]
+    grouped = values.groupby(keys, sort=True)
+
+    parts = [
+        grouped[plain].sum(min_count=1).add_suffix(f"{SEPARATOR}sum"),
+        grouped[plain].count().add_suffix(f"{SEPARATOR}count"),
+        grouped[means].min().add_suffix(f"{SEPARATOR}min"),
+        grouped[means].max().add_suffix(f"{SEPARATOR}max"),
+    ]
+    for direction in sorted(directions):
+        vectors = grouped[[f"{direction}{SEPARATOR}u", f"{direction}{SEPARATOR}v"]]
+        parts.append(vectors.sum(min_count=1).add_suffix("_sum"))
+        parts.append(vectors.count().iloc[:, :1].set_axis([f"{direction}{SEPARATOR}count"], axis=1))
+
+    out = pd.concat(parts, axis=1)
+    out.index.names = [by, TIME_COLUMN]
+    return out.reset_index()
+
+
+def merge(frames, by="device_id") -> pd.DataFrame:
+    """Merge partial aggregates of the same (`by`, period) keys."""
+    df = pd.concat([f for f in frames if not f.empty], ignore_index=True, sort=False)
+    if df.empty:
+        return df
+
+    grouped = df.groupby([by, TIME_COLUMN], sort=True)
+    stat = {c: c.rsplit(SEPARATOR, 1)[-1] for c in df.columns if SEPARATOR in c}
+
+    sums = [c for c, s in stat.items() if s in ("sum", "u_sum", "v_sum")]
+    counts = [c for c, s in stat.items() if s == "count"]
+    parts = [
+        grouped[sums].sum(min_count=1),
+        grouped[counts].sum().astype("int64"),
+        grouped[[c for c, s in stat.items() if s == "min"]].min(),
+        grouped[[c for c, s in stat.items() if s == "max"]].max(),
+    ]
+    out = pd.concat(parts, axis=1)
+    return out[[c for c in df.columns if c in out.columns]].reset_index()
+
+
+# ---------------------------------------------------------
+# Storage
+# ---------------------------------------------------------
+def rollup_path(root, level, period_start=None) -> str:
+    """Table holding `level` rollups (for the period starting at `period_start`)."""
+    _, split = LEVELS[level]
+    if split is None:
+        return os.path.join(root, f"{level}.parquet")
+    return os.path.join(root, level, f"{period_start.strftime(split)}.parquet")
+
+
+def _write(path, df):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def update_rollups(root, df: pd.DataFrame, by="device_id", levels=None) -> dict:
+    """
+    Fold new rows of a time-indexed frame into every rollup level.
+
+    Only pass rows that have not been rolled up before (e.g. the rows
+    append_partitioned() returns): partials are added, not replaced.
+    Returns the number of rollup rows touched per level.
+    """
+    if df.empty:
+        return {}
+
+    touched = {}
+    for level in levels or LEVELS:
+        period, split = LEVELS[level]
+        new = aggregate(df, period, by=by)
+
+        if split is None:
+            groups = [(rollup_path(root, level), new)]
+        else:
+            files = new[TIME_COLUMN].dt.strftime(split)
+            groups = [
+                (rollup_path(root, level, part[TIME_COLUMN].iloc[0]), part)
+                for _, part in new.groupby(files, sort=True)
+            ]
+
+        for path, part in groups:
+            existing = pd.read_parquet(path) if os.path.exists(path) else part.iloc[0:0]
+            _write(path, merge([existing, part], by=by))
+
+        touched[level] = len(new)
+    return touched
+
+
+def rebuild_rollups(root, df: pd.DataFrame, by="device_id", levels=None) -> dict:
+    """Recompute the rollups from scratch from the full history in `df`."""
+    for level in levels or LEVELS:
+        _, split = LEVELS[level]
+        target = rollup_path(root, level) if split is None else os.path.join(root, level)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+    return update_rollups(root, df, by=by, levels=levels)
+
+
+# ---------------------------------------------------------
+# Reading
+# ---------------------------------------------------------
+def read_rollup(level, root=ROLLUP_DIR, devices=None, start=None, end=None, by="device_id") -> pd.DataFrame:
+    """
+    Rollup table for `level` ("hourly", "daily" or "monthly") with derived
+    statistics: <col>__mean (or the <col>__sum total for rain amounts),
+    <col>__min, <col>__max, <col>__count, and <dir>__mean as the
+    vector-averaged wind direction in degrees.
+
+    Time-indexed by period start (UTC), with a `by` column.
+    """
+    _, split = LEVELS[level]
+    if split is None:
+        paths = [rollup_path(root, level)]
+    else:
+        directory = os.path.join(root, level)
+        paths = sorted(
+            os.path.join(directory, name)
+            for name in (os.listdir(directory) if os.path.isdir(directory) else [])
+            if name.endswith(".parquet")
+        )
+
+    filters = []
+    if devices is not None:
+        filters.append((by, "in", list([devices] if isinstance(devices, str) else devices)))
+    if start is not None:
+        filters.append((TIME_COLUMN, ">=", _utc(start)))
+    if end is not None:
+        filters.append((TIME_COLUMN, "<=", _utc(end)))
+
+    frames = [pd.read_parquet(p, filters=filters or None) for p in paths if os.path.exists(p)]
+    if not frames:
+        return pd.DataFrame(columns=[by], index=pd.DatetimeIndex([], tz="UTC", name=TIME_COLUMN))
+    df = pd.concat(frames, ignore_index=True, sort=False)
+
+    out = {by: df[by]}
+    for column in df.columns:
+        if not column.endswith(f"{SEPARATOR}count"):
+            continue
+        name = column[: -len(f"{SEPARATOR}count")]
+        count = df[column].where(df[column] > 0)
+
+        if f"{name}{SEPARATOR}u_sum" in df:
+            u, v = df[f"{name}{SEPARATOR}u_sum"], df[f"{name}{SEPARATOR}v_sum"]
+            out[f"{name}{SEPARATOR}mean"] = np.rad2deg(np.arctan2(u, v)).round(6) % 360
+        elif is_summed(name):
+            out[f"{name}{SEPARATOR}sum"] = df[f"{name}{SEPARATOR}sum"]
+        else:
+            out[f"{name}{SEPARATOR}mean"] = df[f"{name}{SEPARATOR}sum"] / count
+            out[f"{name}{SEPARATOR}min"] = df[f"{name}{SEPARATOR}min"]
+            out[f"{name}{SEPARATOR}max"] = df[f"{name}{SEPARATOR}max"]
+        out[column] = df[column]
+
+    result = pd.DataFrame(out)
+    result.index = pd.DatetimeIndex(df[TIME_COLUMN], name=TIME_COLUMN)
+    return result.sort_index(kind="stable")
+
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
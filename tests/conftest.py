@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Import the project modules (providers, storage, ...) from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,68 @@
+# tests/test_base_provider.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from providers.ecowitt_provider import EcowittProvider
+
+
+def make_provider(tmp_path):
+    target = tmp_path / "data" / "2026" / "01" / "ecowitt__gw1.parquet"
+    return EcowittProvider("gw1", application_key="app", api_key="key", mac="AA:01", target_file=str(target))
+
+
+def rows(start, periods):
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=periods, freq="5min", tz="UTC"),
+        "station": "gw1",
+        "temperature_c": 5.0,
+    })
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    """A month still stored as a single Parquet file."""
+    provider = make_provider(tmp_path)
+    path = provider.monthly_target(pd.Timestamp("2026-01-10"))
+    os.makedirs(os.path.dirname(path))
+    rows("2026-01-10", 3).to_parquet(path)
+    return provider, path
+
+
+def test_legacy_file_is_converted_to_a_fragment_directory(legacy):
+    provider, path = legacy
+
+    assert provider.save(rows("2026-01-10 00:10", 3)) == 2
+
+    assert os.path.isdir(path)
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+    assert len(pd.read_parquet(path)) == 5
+
+
+def test_failed_conversion_keeps_the_legacy_file(legacy, monkeypatch):
+    provider, path = legacy
+    rename = os.rename
+
+    def failing_rename(src, dst):
+        if ".convert-" in os.path.basename(src):
+            raise OSError("rename failed")
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", failing_rename)
+    with pytest.raises(OSError):
+        provider.save(rows("2026-01-10 00:10", 3))
+
+    assert os.path.isfile(path)
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+
+
+def test_interrupted_conversion_is_rolled_back(legacy):
+    provider, path = legacy
+    # Crash after the legacy file was moved away, before the directory took its place
+    os.rename(path, os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.legacy-abcd1234"))
+
+    provider.save(rows("2026-01-10 00:10", 3))
+
+    assert len(pd.read_parquet(path)) == 5
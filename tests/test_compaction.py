@@ -0,0 +1,41 @@
+# tests/test_compaction.py
+
+import os
+
+import pandas as pd
+
+from storage.compaction import compact_partition
+from storage.dataset import list_fragments, read_dataset, write_fragment
+
+
+def frame(start, periods):
+    index = pd.date_range(start, periods=periods, freq="30min", tz="UTC", name="time")
+    return pd.DataFrame({"temperature_c": range(periods)}, index=index, dtype="float64")
+
+
+def test_compaction_replaces_fragments_in_place(tmp_path):
+    directory = tmp_path / "device_id=node1" / "year=2026" / "month=01"
+    write_fragment(str(directory), frame("2026-01-01", 4))
+    write_fragment(str(directory), frame("2026-01-01 01:00", 4))  # overlaps by two rows
+    untouched = os.listdir(directory)
+
+    report = compact_partition(str(directory))
+
+    assert report["files_before"] == 2 and report["files_after"] == 1
+    assert report["rows_after"] == 6
+    assert not set(untouched) & set(os.listdir(directory))
+    assert [name for name in os.listdir(directory) if name.startswith(".")] == []
+
+    df = read_dataset(str(tmp_path))
+    assert len(df) == 6
+    assert df.index.is_unique
+
+
+def test_readers_skip_temporary_files(tmp_path):
+    directory = tmp_path / "device_id=node1" / "year=2026" / "month=01"
+    path = write_fragment(str(directory), frame("2026-01-01", 4))
+    # A compacted file that has not been renamed into place yet
+    (directory / ".part-20260101T000000-compacted-0000-abcd1234.parquet.tmp").write_bytes(open(path, "rb").read())
+
+    assert list_fragments(str(directory)) == [path]
+    assert len(read_dataset(str(tmp_path))) == 4
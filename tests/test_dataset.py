@@ -0,0 +1,59 @@
+# tests/test_dataset.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from storage.dataset import append_partitioned, partition_dir, read_dataset
+
+
+@pytest.mark.parametrize("device", ["../../etc", "a/b", "node 1", ".hidden", "_tmp", "..", "ü-ñ%"])
+def test_partition_values_stay_one_directory_under_root(tmp_path, device):
+    root = str(tmp_path / "observations")
+    directory = partition_dir(root, device_id=device, year="2026", month="01")
+
+    relative = os.path.relpath(directory, root).split(os.sep)
+    assert len(relative) == 3
+    assert relative[0].startswith("device_id=")
+    assert not relative[0].split("=", 1)[1].startswith((".", "_"))
+    assert " " not in relative[0] and "/" not in relative[0]
+
+
+def test_partition_dir_rejects_empty_values(tmp_path):
+    with pytest.raises(ValueError):
+        partition_dir(str(tmp_path), device_id="")
+
+
+def test_unsafe_device_ids_round_trip(tmp_path):
+    root = tmp_path / "data" / "observations"
+    devices = ["../escape", "a/b", "node 1", ".hidden"]
+    index = pd.DatetimeIndex(pd.date_range("2026-01-15", periods=2, freq="30min", tz="UTC").repeat(4), name="time")
+    df = pd.DataFrame({"device_id": devices * 2, "temperature": range(8)}, index=index, dtype=object)
+    df["temperature"] = df["temperature"].astype("float64")
+
+    written = append_partitioned(str(root), df)
+
+    assert len(written) == 8
+    assert sorted(os.listdir(tmp_path / "data")) == ["observations"]
+    stored = read_dataset(str(root))
+    assert sorted(stored["device_id"].astype(str).unique()) == sorted(devices)
+    assert len(stored) == 8
+
+    # Appending the same rows again finds them in the same partitions
+    assert append_partitioned(str(root), df).empty
+
+
+def test_column_null_in_one_fragment_and_string_in_another(tmp_path):
+    root = str(tmp_path / "observations")
+    index = pd.DatetimeIndex(pd.date_range("2026-01-15", periods=2, freq="30min", tz="UTC"), name="time")
+    # All-null for one device (Arrow null type), a string for the other
+    append_partitioned(root, pd.DataFrame({"device_id": "a", "Exti_pin_level": [None, None]}, index=index))
+    append_partitioned(root, pd.DataFrame({"device_id": "b", "Exti_pin_level": ["High", "Low"]}, index=index))
+
+    stored = read_dataset(root)
+
+    assert len(stored) == 4
+    by_device = stored.groupby(stored["device_id"].astype(str))["Exti_pin_level"]
+    assert by_device.get_group("a").isna().all()
+    assert list(by_device.get_group("b")) == ["High", "Low"]
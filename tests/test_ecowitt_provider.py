@@ -0,0 +1,210 @@
+# tests/test_ecowitt_provider.py
+
+import pandas as pd
+import pytest
+
+from providers.ecowitt_provider import EcowittProvider
+
+
+class FakeResponse:
+    def __init__(self, body, status=200):
+        self.body = body
+        self.status_code = status
+        self.text = str(body)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers API calls from `handler(path, params)`, recording every call."""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        path = url.split("/api/v3", 1)[-1]
+        self.calls.append((path, dict(params)))
+        return self.handler(path, params)
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    def install(handler):
+        session = FakeSession(handler)
+        monkeypatch.setattr(EcowittProvider, "session", property(lambda self: session))
+        return session
+
+    return install
+
+
+def make_provider(tmp_path, name="gw1", mac="AA:01"):
+    target = tmp_path / "data" / "2026" / "01" / f"ecowitt__{name}.parquet"
+    return EcowittProvider(
+        name,
+        application_key="app",
+        api_key="key",
+        mac=mac,
+        target_file=str(target),
+        checkpoint_path=str(tmp_path / "data" / "ecowitt_backfill.json"),
+    )
+
+
+# ---------------------------------------------------------
+# Batch fetch of many gateways
+# ---------------------------------------------------------
+def real_time(params):
+    if params["mac"] == "BAD":
+        return FakeResponse({}, status=500)
+    temperature_f = 50 + int(params["mac"][-2:])
+    return FakeResponse({"code": 0, "time": "1768900000", "data": {"outdoor": {"temperature": {"value": str(temperature_f)}}}})
+
+
+def test_fetch_shared_normalizes_all_gateways_in_one_batch(tmp_path, fake_session, monkeypatch):
+    session = fake_session(lambda path, params: real_time(params))
+    providers = [make_provider(tmp_path, f"gw{i}", mac=f"AA:{i:02d}") for i in range(3)]
+    providers.append(make_provider(tmp_path, "broken", mac="BAD"))
+
+    batches = []
+    normalize_batch = EcowittProvider.normalize_batch.__func__
+    monkeypatch.setattr(
+        EcowittProvider, "normalize_batch",
+        classmethod(lambda cls, p, r: batches.append(len(p)) or normalize_batch(cls, p, r)),
+    )
+
+    EcowittProvider.fetch_shared(providers)
+
+    assert len(session.calls) == 4
+    assert batches == [4]
+    for i, provider in enumerate(providers[:3]):
+        df = provider.collect()
+        assert df["station"].tolist() == [provider.name]
+        assert df["temperature_c"].iloc[0] == pytest.approx((50 + i - 32) * 5 / 9)
+
+    with pytest.raises(OSError):
+        providers[3].collect()
+
+    # Handed-over rows are used once; the next fetch calls the API again
+    providers[0].fetch()
+    assert len(session.calls) == 5
+
+
+# ---------------------------------------------------------
+# History backfill: chunks, checkpoint and resume
+# ---------------------------------------------------------
+def history(params, fail_from=None):
+    """Canned /device/history page: 5-minute points over [start_date, end_date]."""
+    start = pd.Timestamp(params["start_date"], tz="UTC")
+    end = pd.Timestamp(params["end_date"], tz="UTC")
+    if fail_from is not None and start >= fail_from:
+        return FakeResponse({"code": -1, "msg": "rate limited"})
+
+    points = {str(int(t.timestamp())): "50" for t in pd.date_range(start, end, freq="5min")}
+    return FakeResponse({"code": 0, "msg": "success", "data": {"outdoor": {"temperature": {"list": points}}}})
+
+
+def requested_chunks(session):
+    return [(params["start_date"], params["end_date"]) for path, params in session.calls if path == "/device/history"]
+
+
+def stored_timestamps(provider):
+    df = pd.read_parquet(provider.monthly_target(pd.Timestamp("2026-01-01")))
+    return df["timestamp"]
+
+
+def test_backfill_downloads_in_chunks_and_checkpoints(tmp_path, fake_session):
+    session = fake_session(lambda path, params: history(params))
+    provider = make_provider(tmp_path)
+
+    written = provider.backfill(start="2026-01-01", end="2026-01-03 12:00", chunk="1D")
+
+    assert requested_chunks(session) == [
+        ("2026-01-01 00:00:00", "2026-01-02 00:00:00"),
+        ("2026-01-02 00:00:00", "2026-01-03 00:00:00"),
+        ("2026-01-03 00:00:00", "2026-01-03 12:00:00"),
+    ]
+    # Chunk edges overlap by one point; it is stored once
+    timestamps = stored_timestamps(provider)
+    assert written == len(timestamps) == 2.5 * 288 + 1
+    assert timestamps.is_unique
+    assert provider.backfill_checkpoint() == pd.Timestamp("2026-01-03 12:00", tz="UTC")
+
+
+def test_interrupted_backfill_resumes_from_checkpoint(tmp_path, fake_session):
+    fail_from = pd.Timestamp("2026-01-02", tz="UTC")
+    session = fake_session(lambda path, params: history(params, fail_from=fail_from))
+    provider = make_provider(tmp_path)
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        provider.backfill(start="2026-01-01", end="2026-01-04", chunk="1D")
+
+    # The first chunk is saved and checkpointed, the failed one is not
+    assert provider.backfill_checkpoint() == pd.Timestamp("2026-01-02", tz="UTC")
+    assert stored_timestamps(provider).max() == pd.Timestamp("2026-01-02", tz="UTC")
+
+    session = fake_session(lambda path, params: history(params))
+    provider.backfill(end="2026-01-04", chunk="1D")
+
+    # The rerun skips the finished chunk
+    assert requested_chunks(session) == [
+        ("2026-01-02 00:00:00", "2026-01-03 00:00:00"),
+        ("2026-01-03 00:00:00", "2026-01-04 00:00:00"),
+    ]
+    timestamps = stored_timestamps(provider)
+    assert len(timestamps) == 3 * 288 + 1
+    assert timestamps.is_unique
+    assert provider.backfill_checkpoint() == pd.Timestamp("2026-01-04", tz="UTC")
+
+
+def test_backfill_without_start_continues_from_checkpoint(tmp_path, fake_session):
+    session = fake_session(lambda path, params: history(params))
+    provider = make_provider(tmp_path)
+
+    with pytest.raises(ValueError, match="pass a start date"):
+        provider.backfill(end="2026-01-02")
+    assert session.calls == []
+
+    provider.backfill(start="2026-01-01", end="2026-01-02", chunk="1D")
+    provider.backfill(end="2026-01-02 06:00", chunk="1D")
+
+    assert requested_chunks(session)[-1] == ("2026-01-02 00:00:00", "2026-01-02 06:00:00")
+    assert provider.backfill_checkpoint() == pd.Timestamp("2026-01-02 06:00", tz="UTC")
+
+
+def test_fetch_shared_keeps_one_request_in_flight(tmp_path, fake_session):
+    in_flight, peak = [0], [0]
+
+    def handler(path, params):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            return real_time(params)
+        finally:
+            in_flight[0] -= 1
+
+    session = fake_session(handler)
+    providers = [make_provider(tmp_path, f"gw{i}", mac=f"AA:{i:02d}") for i in range(6)]
+
+    EcowittProvider.fetch_shared(providers)
+
+    # The group holds one slot of the per-type limit
+    assert peak[0] == 1
+    assert [params["mac"] for _, params in session.calls] == [p.mac for p in providers]
+
+
+def test_explicit_range_before_the_checkpoint_is_downloaded(tmp_path, fake_session):
+    session = fake_session(lambda path, params: history(params))
+    provider = make_provider(tmp_path)
+    provider.backfill(start="2026-01-03", end="2026-01-04", chunk="1D")
+
+    written = provider.backfill(start="2026-01-01", end="2026-01-02", chunk="1D")
+
+    assert written == 288 + 1
+    assert requested_chunks(session)[-1] == ("2026-01-01 00:00:00", "2026-01-02 00:00:00")
+    # The checkpoint does not move back
+    assert provider.backfill_checkpoint() == pd.Timestamp("2026-01-04", tz="UTC")
@@ -0,0 +1,124 @@
+# tests/test_fetch_data.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import fetch_data
+from providers.http import close_sessions
+
+
+class FakeProvider:
+    """Records how many providers of its type run at once."""
+
+    MAX_CONCURRENCY = 4
+    SHARE_FIELDS = ()
+
+    lock = threading.Lock()
+    running = {}
+    peak = {}
+
+    def __init__(self, name, target_file, **kwargs):
+        self.name = name
+        self.type = type(self).__name__
+
+    def run(self):
+        cls = FakeProvider
+        with cls.lock:
+            cls.running[self.type] = cls.running.get(self.type, 0) + 1
+            cls.peak[self.type] = max(cls.peak.get(self.type, 0), cls.running[self.type])
+        time.sleep(0.1)
+        with cls.lock:
+            cls.running[self.type] -= 1
+
+
+class SlowProvider(FakeProvider):
+    MAX_CONCURRENCY = 2
+
+
+class OtherProvider(FakeProvider):
+    MAX_CONCURRENCY = 3
+
+
+class SharedProvider(FakeProvider):
+    """Fetched once per application, like TTNProvider."""
+
+    SHARE_FIELDS = ("application_id", "token")
+    fetches = []
+
+    @classmethod
+    def fetch_shared(cls, providers):
+        cls.fetches.append(sorted(provider.name for provider in providers))
+
+
+@pytest.fixture
+def fake_types(tmp_path, monkeypatch):
+    """stations.json types "slow" and "other" resolve to the fake providers."""
+    classes = {"slow": SlowProvider, "other": OtherProvider, "shared": SharedProvider}
+
+    def provider_class(provider_type, path=None):
+        if provider_type not in classes:
+            raise KeyError(f"Unknown provider type: {provider_type}")
+        return classes[provider_type]
+
+    monkeypatch.setattr(fetch_data, "provider_class", provider_class)
+    monkeypatch.chdir(tmp_path)  # build_target_file creates data/<YYYY>/<MM>
+    FakeProvider.running.clear()
+    FakeProvider.peak.clear()
+    SharedProvider.fetches.clear()
+    yield classes
+    close_sessions()
+
+
+def entries(provider_type, n, enabled=True, **config):
+    return [
+        {"type": provider_type, "name": f"{provider_type}{i}", "enabled": enabled, "config": dict(config)}
+        for i in range(n)
+    ]
+
+
+def test_concurrency_limits_from_classes_and_config(fake_types):
+    config = {
+        "providers": entries("slow", 1) + entries("other", 1) + entries("missing", 1) + entries("off", 1, enabled=False),
+        "concurrency": {"other": 5, "missing": 9},
+    }
+
+    assert fetch_data.concurrency_limits(config) == {"slow": 2, "other": 5}
+
+
+def test_run_all_bounds_each_type_by_its_limit(fake_types):
+    providers = entries("slow", 6) + entries("other", 6) + entries("missing", 1)
+
+    results = asyncio.run(fetch_data.run_all(providers, {"slow": 2, "other": 3}))
+
+    assert sum(r.startswith("✓ Completed") for r in results) == 12
+    assert "[ERROR] Unknown provider type: missing" in results
+    assert FakeProvider.peak == {"SlowProvider": 2, "OtherProvider": 3}
+
+
+def test_shared_groups_by_type_and_share_fields(fake_types):
+    app_a = entries("shared", 3, application_id="a", token="t")
+    app_b = entries("shared", 1, application_id="b", token="t")
+    other_token = entries("shared", 1, application_id="a", token="u")
+    providers = app_a + app_b + other_token + entries("slow", 2) + entries("missing", 1)
+    providers += entries("shared", 1, enabled=False, application_id="a", token="t")
+
+    groups = fetch_data.shared_groups(providers)
+
+    assert [[entry["name"] for entry in group] for group in groups] == [
+        ["shared0", "shared1", "shared2"],
+        ["shared0"],
+        ["shared0"],
+    ]
+    assert groups[0] == app_a and groups[1] == app_b and groups[2] == other_token
+
+
+def test_run_all_fetches_each_group_once(fake_types):
+    providers = entries("shared", 3, application_id="a", token="t") + entries("slow", 2)
+
+    results = asyncio.run(fetch_data.run_all(providers, {"shared": 1, "slow": 2}))
+
+    assert SharedProvider.fetches == [["shared0", "shared1", "shared2"]]
+    assert sum(r.startswith("✓ Completed") for r in results) == 5
@@ -0,0 +1,50 @@
+# tests/test_generate_plot.py
+
+import pandas as pd
+
+import generate_plot
+from providers.schema import to_arrow
+from storage.dataset import write_fragment
+from storage.ring_buffer import RingBuffer
+
+
+def test_ring_buffer_without_some_plotted_columns(tmp_path, monkeypatch):
+    window_dir = str(tmp_path / "latest_window")
+    monkeypatch.setattr(generate_plot, "LATEST_WINDOW_DIR", window_dir)
+
+    # An SHT-only fleet: no black bulb probe, no battery reading
+    index = pd.date_range("2026-01-15", periods=3, freq="30min", tz="UTC", name="time")
+    rows = pd.DataFrame({"device_id": "sht1", "TempC_SHT": [4.0, 5.0, 6.0], "Hum_SHT": [80.0, 81.0, 82.0]}, index=index)
+    ring = RingBuffer.create(window_dir, ["sht1"], ["TempC_SHT", "Hum_SHT"])
+    ring.update(rows)
+    ring.close()
+
+    df = generate_plot.load_latest()
+
+    assert list(df.columns) == ["device_id", "dry_bulb", "hum"]
+    assert list(df["dry_bulb"]) == [4.0, 5.0, 6.0]
+
+
+def test_provider_dataset_is_read_through_read_observations(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    monkeypatch.setattr(generate_plot, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(generate_plot, "LATEST_WINDOW_DIR", str(data_dir / "latest_window"))
+
+    now = pd.Timestamp.now(tz="UTC").floor("30min")
+    rows = pd.DataFrame({
+        "timestamp": pd.date_range(now - pd.Timedelta("10D"), now, freq="1D"),
+        "station": "gw1",
+        "temperature_c": 5.0,
+        "humidity_pct": 80.0,
+        "wind_speed_ms": 3.0,
+    })
+    for month, part in rows.groupby(rows["timestamp"].dt.strftime("%Y/%m")):
+        write_fragment(str(data_dir / month / "ecowitt__gw1.parquet"), to_arrow(part))
+
+    df = generate_plot.load_latest()
+
+    # Only the last 7 days, only the plotted columns
+    assert len(df) == 7
+    assert df.index.min() >= now - pd.Timedelta(generate_plot.LATEST_WINDOW)
+    assert set(df.columns) == {"device_id", "dry_bulb", "black_bulb", "hum", "bat"}
+    assert (df["device_id"] == "gw1").all() and (df["dry_bulb"] == 5.0).all()
@@ -0,0 +1,55 @@
+# tests/test_interpolate.py
+
+import numpy as np
+import pandas as pd
+
+from processing.interpolate import (
+    MASK_ATTR,
+    MASK_COLUMN,
+    interpolated,
+    load_mask_order,
+    save_mask_order,
+)
+from processing.pipeline import interpolate_meteo
+from storage.dataset import append_partitioned, read_dataset
+
+
+def run(start, columns, gaps):
+    """Two devices of 30-minute samples with one gap per entry of `gaps` (column → rows)."""
+    index = pd.date_range(start, periods=12, freq="30min", tz="UTC", name="time")
+    frames = []
+    for device in ("node1", "node2"):
+        df = pd.DataFrame({col: np.linspace(10, 12, 12) for col in columns}, index=index)
+        for col, rows in gaps.items():
+            df.iloc[rows, df.columns.get_loc(col)] = np.nan
+        df.insert(0, "device_id", device)
+        frames.append(df)
+    return pd.concat(frames)
+
+
+def test_mask_round_trips_through_the_dataset(tmp_path):
+    root = str(tmp_path / "observations")
+
+    # Second run has an extra column, listed first: existing bits must not move
+    runs = [
+        run("2026-01-15 00:00", ["TempC_SHT", "Hum_SHT"], {"Hum_SHT": [4, 5]}),
+        run("2026-01-15 06:00", ["Wind_ms", "TempC_SHT", "Hum_SHT"], {"TempC_SHT": [3], "Wind_ms": [7, 8]}),
+    ]
+    for df in runs:
+        out = interpolate_meteo(df, mask_columns=load_mask_order(root))
+        save_mask_order(root, out.attrs[MASK_ATTR])
+        append_partitioned(root, out)
+
+    assert load_mask_order(root) == ["TempC_SHT", "Hum_SHT", "Wind_ms"]
+
+    stored = read_dataset(root).sort_values(["device_id", "time"])
+    assert stored[MASK_COLUMN].dtype == np.uint64
+
+    flags = interpolated(stored, order=load_mask_order(root))
+    hours = pd.DatetimeIndex(stored.index).strftime("%H:%M")
+    filled = {col: sorted(set(hours[flags[col].to_numpy()])) for col in flags.columns}
+    assert filled == {
+        "TempC_SHT": ["07:30"],
+        "Hum_SHT": ["02:00", "02:30"],
+        "Wind_ms": ["09:30", "10:00"],
+    }
@@ -0,0 +1,33 @@
+# tests/test_ipc_cache.py
+
+import os
+
+import pandas as pd
+
+from storage.dataset import write_fragment
+from storage.ipc_cache import cache_path, prune_cache, read_table
+
+
+def fragment(directory, start):
+    index = pd.date_range(start, periods=3, freq="30min", tz="UTC", name="time")
+    return write_fragment(directory, pd.DataFrame({"temperature_c": [1.0, 2.0, 3.0]}, index=index))
+
+
+def test_prune_deletes_copies_of_changed_or_missing_sources(tmp_path):
+    cache_dir = str(tmp_path / ".cache")
+    kept, changed, removed = (str(tmp_path / name) for name in ("kept", "changed", "removed"))
+    for directory in (kept, changed, removed):
+        fragment(directory, "2026-01-15")
+        assert read_table(directory, cache_dir=cache_dir).num_rows == 3
+
+    fragment(changed, "2026-01-16")
+    for path in os.listdir(removed):
+        os.remove(os.path.join(removed, path))
+    os.rmdir(removed)
+
+    assert prune_cache(cache_dir) == 2
+    assert os.listdir(cache_dir) == [os.path.basename(cache_path(kept, cache_dir))]
+
+    # `keep` drops valid copies too, e.g. months that left the cache window
+    assert prune_cache(cache_dir, keep=lambda source: False) == 1
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,47 @@
+# tests/test_kalman.py
+
+import numpy as np
+import pandas as pd
+
+from processing.kalman import filtered_until, kalman_smooth_frame
+
+
+def frame(start, values):
+    index = pd.date_range(start, periods=len(values), freq="30min", tz="UTC", name="time")
+    return pd.DataFrame({"device_id": "node1", "TempC_SHT": np.asarray(values, dtype=float)}, index=index)
+
+
+def test_resumed_lane_with_constant_readings_advances(capsys):
+    state = {}
+    history = frame("2026-01-15 00:00", 10 + np.sin(np.arange(48) / 4))
+    kalman_smooth_frame(history, ["TempC_SHT"], by="device_id", state=state)
+    x_est = state["node1/TempC_SHT"]["x_est"]
+
+    # A flat (e.g. quantized) reading, run after run
+    for run in range(3):
+        new = frame(pd.Timestamp("2026-01-16 00:00", tz="UTC") + pd.Timedelta(hours=2 * run), [12.0] * 4)
+        out = kalman_smooth_frame(new, ["TempC_SHT"], by="device_id", state=state)
+
+        assert filtered_until(state, "node1") == new.index[-1]
+        # Smoothed towards the new level, not replaced by the raw readings
+        assert x_est < out["TempC_SHT"].iloc[0] < 12.0
+        x_est = state["node1/TempC_SHT"]["x_est"]
+
+    assert "unstable" not in capsys.readouterr().out
+
+
+def test_unstable_lane_still_advances_the_state(monkeypatch):
+    import processing.kalman as kalman
+
+    def diverging(values, times, lengths, Q_base, R, x0=None, P0=None, t0=None):
+        return values * 100, values[:, -1], np.ones(len(values))
+
+    monkeypatch.setattr(kalman, "kalman_lanes", diverging)
+    state = {}
+    df = frame("2026-01-15 00:00", np.arange(6))
+
+    out = kalman_smooth_frame(df, ["TempC_SHT"], by="device_id", state=state)
+
+    assert out["TempC_SHT"].tolist() == df["TempC_SHT"].tolist()
+    assert filtered_until(state, "node1") == df.index[-1]
+    assert state["node1/TempC_SHT"]["x_est"] == 5.0
@@ -0,0 +1,162 @@
+# tests/test_loeco.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import loeco
+from storage.dataset import read_dataset
+from storage.ring_buffer import RingBuffer
+from storage.rollups import read_rollup
+from utils.state_store import load_state
+
+
+class FakeProvider:
+    """Saves nothing itself; records the rows it was asked to save."""
+
+    share_key = None
+
+    def __init__(self, name):
+        self.name = name
+        self.saved = []
+
+    def save(self, df):
+        self.saved.append(df)
+        return len(df)
+
+    def commit(self):
+        pass
+
+
+def rows(station, start, hours, temperature=10.0):
+    timestamps = pd.date_range(start, periods=hours * 12, freq="5min", tz="UTC")
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "station": station,
+        "provider": "fake",
+        "temperature_c": temperature + np.sin(np.arange(len(timestamps)) / 10),
+        "humidity_pct": 80.0,
+    })
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    def build():
+        daemon = loeco.Daemon({"providers": []}, flush_seconds=0, data_dir=str(tmp_path / "data"))
+        for name in ("gw1", "gw2"):
+            daemon.providers[name] = FakeProvider(name)
+            daemon.buffers[name] = []
+        return daemon
+
+    return build
+
+
+def test_flush_smooths_saved_rows_with_state_kept_in_memory(daemon, monkeypatch):
+    first = daemon()
+    first.buffers["gw1"].append(rows("gw1", "2026-01-15 00:00", 6))
+    first.buffers["gw2"].append(rows("gw2", "2026-01-15 00:00", 6, temperature=20.0))
+    first.flush()
+
+    state = load_state(first.kalman_state_path)
+    assert state == first.kalman_state
+    assert {key.split("/")[0] for key in state} == {"gw1", "gw2"}
+
+    # Later flushes never go back to disk for the state
+    monkeypatch.setattr(loeco, "load_state", lambda path: pytest.fail("state reloaded"))
+    first.buffers["gw1"].append(rows("gw1", "2026-01-15 06:00", 3))
+    first.flush()
+    first.close()
+
+    stored = read_dataset(first.dataset_dir)
+    gw1 = stored[stored["device_id"] == "gw1"].sort_index()
+    assert gw1.index.is_unique
+    assert gw1.index.max() == pd.Timestamp("2026-01-15 08:30", tz="UTC")
+    assert len(gw1) == 18
+    # Only each device's last CONTEXT of raw rows is kept between flushes
+    kept = first.recent.reset_index().groupby("device_id")["time"].min()
+    assert kept.to_dict() == {
+        "gw1": pd.Timestamp("2026-01-15 03:00", tz="UTC"),
+        "gw2": pd.Timestamp("2026-01-15 00:00", tz="UTC"),
+    }
+
+    window = RingBuffer.open(first.window_dir).frame()
+    assert set(window["device_id"]) == {"gw1", "gw2"}
+    assert "temperature_c" in window.columns
+
+
+def test_processed_files_stay_out_of_fetch_dataB_paths(daemon, tmp_path):
+    d = daemon()
+    d.buffers["gw1"].append(rows("gw1", "2026-01-15 00:00", 6))
+    d.flush()
+    d.close()
+
+    data = tmp_path / "data"
+    assert not (data / "kalman_state.json").exists()
+    assert not (data / "observations").exists()
+    assert not (data / "rollups").exists()
+    assert os.path.exists(d.kalman_state_path)
+    assert os.path.commonpath([d.dataset_dir, d.rollup_dir, d.window_dir]) == str(data / loeco.DAEMON_DIR)
+
+
+def test_failed_processing_is_retried_on_the_next_flush(daemon, monkeypatch):
+    d = daemon()
+    append = loeco.append_partitioned
+    monkeypatch.setattr(loeco, "append_partitioned", lambda *a: (_ for _ in ()).throw(OSError("disk full")))
+
+    d.buffers["gw1"].append(rows("gw1", "2026-01-15 00:00", 3))
+    d.flush()
+    assert d.kalman_state == {}
+    assert len(d.pending) == 1
+
+    monkeypatch.setattr(loeco, "append_partitioned", append)
+    d.flush()
+    d.close()
+
+    assert d.pending == []
+    assert d.kalman_state
+    assert len(read_dataset(d.dataset_dir)) == 6
+
+
+def test_failing_provider_does_not_drop_the_rest_of_its_group(daemon, capsys):
+    d = daemon()
+    good = rows("gw2", "2026-01-15 00:00", 1)
+
+    class Broken(FakeProvider):
+        def collect(self):
+            raise OSError("gateway offline")
+
+    class Working(FakeProvider):
+        def collect(self):
+            return good
+
+    d.providers["gw1"], d.providers["gw2"] = Broken("gw1"), Working("gw2")
+
+    assert d._collect_group([d.providers["gw1"], d.providers["gw2"]]) == len(good)
+    assert d.buffers["gw1"] == []
+    assert d.buffers["gw2"] == [good]
+    assert "[ERROR] Collecting gw1 failed: gateway offline" in capsys.readouterr().out
+
+
+def test_directions_and_station_metadata_are_not_smoothed(daemon, tmp_path):
+    d = daemon()
+    df = rows("gw1", "2026-01-15 00:00", 6)
+    # Wind veering across north, from a fixed station
+    df["wind_speed_ms"] = 3.0
+    df["wind_dir_deg"] = np.where(np.arange(len(df)) % 2, 350.0, 10.0)
+    df["latitude"], df["longitude"], df["height_m"] = 52.1, 5.2, 2.0
+    d.buffers["gw1"].append(df)
+
+    os.makedirs(d.rollup_dir)
+    d.flush()
+    d.close()
+
+    stored = read_dataset(d.dataset_dir)
+    # First reading of each 30-minute bin, never averaged across the wrap
+    assert set(stored["wind_dir_deg"]) == {10.0}
+    assert (stored[["latitude", "longitude", "height_m"]] == [52.1, 5.2, 2.0]).all().all()
+    assert not any(key.endswith(("wind_dir_deg", "latitude", "longitude", "height_m")) for key in d.kalman_state)
+
+    hourly = read_rollup("hourly", root=d.rollup_dir)
+    assert not any(c.startswith(("latitude", "longitude", "height_m")) for c in hourly.columns)
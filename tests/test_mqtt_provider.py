@@ -0,0 +1,128 @@
+# tests/test_mqtt_provider.py
+
+import json
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from providers.mqtt_provider import TTNMQTTProvider
+
+
+class FakeClient:
+    """Stands in for a paho client; messages are injected via on_message."""
+
+    def __init__(self):
+        self.subscribed = []
+
+    def username_pw_set(self, username, password):
+        pass
+
+    def connect(self, host, port):
+        self.on_connect(self, None, None, None)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append(topic)
+
+
+def uplink(minute, temperature, indent=None):
+    message = {
+        "end_device_ids": {"device_id": "node1"},
+        "received_at": f"2026-01-15T10:{minute:02d}:00.123456Z",
+        "uplink_message": {"f_cnt": minute, "decoded_payload": {"temperature_c": temperature, "humidity_pct": 80}},
+    }
+    return json.dumps(message, indent=indent).encode()
+
+
+@pytest.fixture
+def provider(tmp_path):
+    target = tmp_path / "data" / "2026" / "01" / "ttn_mqtt__node1.parquet"
+    return TTNMQTTProvider(
+        "node1", token="x", application_id="app", target_file=str(target), flush_seconds=0.05, client=FakeClient()
+    )
+
+
+def receive(provider, *payloads):
+    for payload in payloads:
+        provider.on_message(provider.client, None, SimpleNamespace(payload=payload))
+
+
+def stored(provider):
+    return pd.read_parquet(provider.monthly_target(pd.Timestamp("2026-01-15"))).sort_values("timestamp")
+
+
+def test_pretty_printed_payloads_are_decoded(provider):
+    receive(provider, uplink(0, 5.0, indent=2), uplink(1, 6.0))
+
+    df = provider.normalize(provider.fetch())
+
+    assert df["temperature_c"].tolist() == [5.0, 6.0]
+    assert provider.client.subscribed == ["v3/app@ttn/devices/+/up"]
+
+
+def test_failed_save_keeps_uplinks_buffered(provider, monkeypatch):
+    receive(provider, uplink(0, 5.0), uplink(1, 6.0))
+    save = provider.save
+    monkeypatch.setattr(provider, "save", lambda df: (_ for _ in ()).throw(OSError("disk full")))
+
+    with pytest.raises(OSError):
+        provider.run()
+    assert len(provider.buffer) == 2
+
+    # Arrived meanwhile; stays behind the restored uplinks
+    receive(provider, uplink(2, 7.0))
+    monkeypatch.setattr(provider, "save", save)
+    provider.run()
+
+    assert provider.buffer == []
+    assert stored(provider)["temperature_c"].tolist() == [5.0, 6.0, 7.0]
+
+
+def test_failed_normalize_keeps_uplinks_buffered(provider, monkeypatch):
+    receive(provider, uplink(0, 5.0))
+    monkeypatch.setattr(provider, "normalize", lambda raw: (_ for _ in ()).throw(ValueError("bad batch")))
+
+    with pytest.raises(ValueError):
+        provider.run()
+    assert provider.buffer == [uplink(0, 5.0)]
+
+
+def test_listener_survives_a_failed_flush(provider, monkeypatch):
+    save = provider.save
+    calls = []
+
+    def flaky_save(df):
+        calls.append(len(df))
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return save(df)
+
+    monkeypatch.setattr(provider, "save", flaky_save)
+    receive(provider, uplink(0, 5.0), uplink(1, 6.0))
+
+    stop = threading.Event()
+    listener = threading.Thread(target=provider.serve_forever, args=(stop,))
+    listener.start()
+    try:
+        for _ in range(100):  # up to 5 s
+            if len(calls) >= 2:
+                break
+            assert listener.is_alive()
+            stop.wait(0.05)
+    finally:
+        stop.set()
+        listener.join(timeout=5)
+
+    assert not listener.is_alive()
+    assert calls[:2] == [2, 2]
+    assert stored(provider)["temperature_c"].tolist() == [5.0, 6.0]
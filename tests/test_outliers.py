@@ -0,0 +1,33 @@
+# tests/test_outliers.py
+
+import numpy as np
+import pandas as pd
+
+from processing.outliers import remove_outliers_frame
+
+
+def test_quantized_series_lose_nothing_to_the_mad_rule():
+    index = pd.date_range("2026-01-15", periods=96, freq="30min", tz="UTC", name="time")
+    # Flat stretches with single-step changes: the rolling MAD is 0 almost everywhere
+    temperature = 20 + 0.1 * (np.arange(96) // 17 % 3)
+    rain = np.zeros(96)
+    rain[[20, 45, 46, 70]] = 0.2
+    wind = np.where(np.arange(96) % 23 == 0, 0.5, 0.0)
+    df = pd.DataFrame({"device_id": "node1", "TempC_SHT": temperature, "Rain_mm": rain, "Wind_ms": wind}, index=index)
+
+    out, removed = remove_outliers_frame(df, ["TempC_SHT", "Rain_mm", "Wind_ms"], method="mad")
+
+    assert (removed == 0).all()
+    pd.testing.assert_frame_equal(out, df)
+
+
+def test_mad_rule_still_removes_spikes():
+    index = pd.date_range("2026-01-15", periods=96, freq="30min", tz="UTC", name="time")
+    temperature = np.round(10 + np.sin(np.arange(96) / 8), 1)
+    temperature[[30, 60]] = [45.0, -30.0]
+    df = pd.DataFrame({"device_id": "node1", "TempC_SHT": temperature}, index=index)
+
+    out, removed = remove_outliers_frame(df, ["TempC_SHT"], method="mad")
+
+    assert removed["TempC_SHT"] == 2
+    assert out["TempC_SHT"].isna().sum() == 2
@@ -0,0 +1,81 @@
+# tests/test_pipeline.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import pipeline
+from processing.pipeline import interpolate_meteo, shard_tasks
+
+
+def fleet():
+    index = pd.date_range("2026-01-15", periods=96, freq="30min", tz="UTC", name="time")
+    temperature = 10 + np.sin(np.arange(96) / 8)
+    # A burst of three spikes inflates the rolling std enough to hide them
+    temperature[40:43] = [30.0, 31.0, 30.0]
+    frames = [
+        pd.DataFrame({"device_id": device, "TempC_SHT": temperature, "BatV": 3.7}, index=index)
+        for device in ("node1", "node2")
+    ]
+    return pd.concat(frames)
+
+
+def test_outlier_method_reaches_the_outlier_stage(capsys):
+    sigma = interpolate_meteo(fleet(), method="sigma")
+    sigma_log = capsys.readouterr().out
+    mad = interpolate_meteo(fleet(), method="mad")
+    mad_log = capsys.readouterr().out
+
+    assert "outliers removed" in mad_log
+    assert sigma_log != mad_log
+    # The robust rule drops the burst, which the smoothed output no longer follows
+    spikes = mad.index.isin(fleet().index[40:43])
+    assert (mad.loc[spikes, "TempC_SHT"] < 20).all()
+    assert (sigma.loc[spikes, "TempC_SHT"] > mad.loc[spikes, "TempC_SHT"]).all()
+
+
+def test_unknown_outlier_method_is_rejected():
+    with pytest.raises(ValueError, match="Unknown outlier method"):
+        interpolate_meteo(fleet(), method="iqr")
+
+
+def test_directions_and_coordinates_pass_through_unmodified():
+    df = fleet()
+    # Wrapping around north, with a gap: interpolating it would give ~180°
+    direction = np.tile([350.0, np.nan, 10.0], 32)
+    df["WindDir"] = df["wind_dir_deg"] = np.tile(direction, 2)
+    df["latitude"], df["longitude"], df["height_m"] = 52.5, 13.4, np.nan
+
+    out = interpolate_meteo(df)
+
+    for device, part in out.groupby("device_id"):
+        np.testing.assert_array_equal(part["WindDir"].to_numpy(), direction)
+        np.testing.assert_array_equal(part["wind_dir_deg"].to_numpy(), direction)
+        assert (part["latitude"] == 52.5).all() and (part["longitude"] == 13.4).all()
+        assert part["height_m"].isna().all()
+
+
+def test_process_pool_matches_one_worker(monkeypatch):
+    # Six devices with different offsets, so a mix-up between shards would show
+    df = pd.concat([
+        part.assign(device_id=f"node{i}", TempC_SHT=part["TempC_SHT"] + i)
+        for i, part in enumerate([fleet().iloc[:96]] * 6)
+    ])
+    monkeypatch.setattr(pipeline, "PARALLEL_MIN_ROWS", 0)
+
+    serial_state, pooled_state = {}, {}
+    serial = interpolate_meteo(df, kalman_state=serial_state, workers=1)
+    pooled = interpolate_meteo(df, kalman_state=pooled_state, workers=2)
+
+    pd.testing.assert_frame_equal(pooled, serial)
+    assert pooled_state == serial_state
+    assert len(serial_state) == 6
+
+
+def test_shards_balance_rows_and_keep_every_task():
+    tasks = [(pd.DataFrame(index=range(n)),) for n in (50, 40, 30, 20, 10, 10)]
+
+    shards = shard_tasks(tasks, 3)
+
+    assert sorted(position for shard in shards for position, _ in shard) == list(range(6))
+    assert sorted(sum(len(task[0]) for _, task in shard) for shard in shards) == [50, 50, 60]
@@ -0,0 +1,81 @@
+# tests/test_query.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from providers.schema import to_arrow
+from storage.dataset import write_fragment
+from storage.ipc_cache import cache_path, read_table
+from storage.query import read_observations
+
+
+def month_start(months_back):
+    """First day of the month `months_back` months before the current one."""
+    current = pd.Timestamp.now(tz="UTC").normalize().replace(day=1)
+    return current - pd.DateOffset(months=months_back)
+
+
+def save(root, station, start, periods=4, provider="ttn", **values):
+    """Append one fragment of LoEco rows to <root>/<YYYY>/<MM>/<type>__<station>.parquet."""
+    start = pd.Timestamp(start)
+    target = os.path.join(root, f"{start.year:04d}", f"{start.month:02d}", f"{provider}__{station}.parquet")
+    df = pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=periods, freq="30min"),
+        "station": station,
+        "temperature_c": values.get("temperature_c", 5.0),
+        "humidity_pct": values.get("humidity_pct", 80.0),
+    })
+    write_fragment(target, to_arrow(df))
+    return target
+
+
+def test_projection_returns_only_the_requested_columns(tmp_path):
+    root = str(tmp_path / "data")
+    save(root, "node1", "2026-01-15")
+
+    df = read_observations(columns=["humidity_pct"], root=root)
+
+    assert list(df.columns) == ["timestamp", "station", "humidity_pct"]
+    assert len(df) == 4
+    with pytest.raises(KeyError):
+        read_observations(columns=["not_a_column"], root=root)
+
+
+def test_time_range_station_and_provider_filters(tmp_path):
+    root = str(tmp_path / "data")
+    save(root, "node1", "2026-01-15")
+    save(root, "node1", "2026-02-15")
+    save(root, "node2", "2026-02-15", provider="ecowitt")
+
+    df = read_observations(columns=["temperature_c"], start="2026-02-15 00:30", end="2026-02-15 01:00", root=root)
+    assert sorted(df["station"].astype(str)) == ["node1", "node1", "node2", "node2"]
+    assert df["timestamp"].between(pd.Timestamp("2026-02-15 00:30", tz="UTC"),
+                                   pd.Timestamp("2026-02-15 01:00", tz="UTC")).all()
+
+    assert len(read_observations(stations="node1", root=root)) == 8
+    assert set(read_observations(providers="ecowitt", root=root)["station"]) == {"node2"}
+    assert read_observations(start="2027-01-01", root=root).empty
+
+
+def test_cache_follows_closed_months(tmp_path):
+    root, cache_dir = str(tmp_path / "data"), str(tmp_path / ".cache")
+    current = save(root, "node1", month_start(0))
+    closed = save(root, "node1", month_start(1))
+    expired = save(root, "node1", month_start(3))
+    # A copy made while that month was still in the window
+    read_table(expired, cache_dir=cache_dir)
+
+    df = read_observations(columns=["temperature_c"], root=root, cache=True, cache_dir=cache_dir)
+
+    assert len(df) == 12
+    # Only the closed month is cached; the expired copy is pruned
+    assert os.listdir(cache_dir) == [os.path.basename(cache_path(closed, cache_dir))]
+    assert not os.path.exists(cache_path(current, cache_dir))
+
+    # A late fragment in the closed month invalidates its copy
+    save(root, "node1", month_start(1) + pd.Timedelta("1D"), temperature_c=7.0)
+    df = read_observations(columns=["temperature_c"], root=root, cache=True, cache_dir=cache_dir)
+    assert len(df) == 16
+    assert (df["temperature_c"] == 7.0).sum() == 4
@@ -0,0 +1,41 @@
+# tests/test_registry.py
+
+import sys
+
+import pytest
+
+from providers import registry
+
+
+@pytest.fixture(autouse=True)
+def clean_registry(monkeypatch):
+    monkeypatch.setattr(registry, "_registry", dict(registry.BUILTIN_PROVIDERS))
+    monkeypatch.setattr(registry, "_classes", {})
+
+
+def test_unknown_type_raises_key_error():
+    with pytest.raises(KeyError, match="Unknown provider type: netatmo"):
+        registry.provider_class("netatmo")
+
+
+def test_invalid_class_path_raises_import_error():
+    with pytest.raises(ImportError, match="Invalid provider path"):
+        registry.provider_class("ttn", path="NoModule")
+
+
+def test_types_resolve_lazily_and_once(monkeypatch):
+    monkeypatch.delitem(sys.modules, "providers.mqtt_provider", raising=False)
+    assert "ttn_mqtt" in registry.provider_types()
+    assert "providers.mqtt_provider" not in sys.modules
+
+    cls = registry.provider_class("ttn_mqtt")
+
+    assert cls.__name__ == "TTNMQTTProvider"
+    assert registry.provider_class("ttn_mqtt") is cls
+
+
+def test_register_overrides_a_type():
+    registry.provider_class("ecowitt")
+    registry.register("ecowitt", "providers.ttn_provider:TTNProvider")
+
+    assert registry.provider_class("ecowitt").__name__ == "TTNProvider"
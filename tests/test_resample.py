@@ -0,0 +1,51 @@
+# tests/test_resample.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing.resample import resample_frame
+
+
+def uplinks():
+    """Two devices with jittered, interleaved uplinks, gaps and missing values."""
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2026-01-15 00:07", tz="UTC")
+    frames = []
+    for device, n in (("node1", 40), ("node2", 25)):
+        times = start + pd.to_timedelta(np.sort(rng.integers(0, 20 * 3600, n)), unit="s")
+        frames.append(pd.DataFrame({
+            "device_id": device,
+            "TempC_SHT": rng.normal(10, 2, n),
+            "f_cnt": np.arange(n),
+        }, index=pd.DatetimeIndex(times, name="time")))
+    df = pd.concat(frames).sort_index(kind="stable")
+    df.iloc[::7, df.columns.get_loc("TempC_SHT")] = np.nan
+    return df
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+@pytest.mark.parametrize("agg", ["mean", "last", "first"])
+def test_matches_pandas_resample_per_device(agg):
+    df = uplinks()
+
+    out = resample_frame(df, "30min", default=agg)
+
+    for device, part in df.groupby("device_id"):
+        expected = getattr(part.drop(columns=["device_id"]).resample("30min"), agg)()
+        got = out[out["device_id"] == device].drop(columns=["device_id"])
+        pd.testing.assert_index_equal(got.index, expected.index)
+        for col in expected.columns:
+            np.testing.assert_allclose(got[col].astype("float64"), expected[col].astype("float64"))
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_empty_bins_are_missing_for_first_and_last():
+    index = pd.DatetimeIndex(["2026-01-15 00:05", "2026-01-15 01:40"], tz="UTC", name="time")
+    df = pd.DataFrame({"device_id": "node1", "f_cnt": [1, 2], "status": ["ok", "low"]}, index=index)
+
+    out = resample_frame(df, "30min", default="last")
+
+    assert len(out) == 4
+    assert out["status"].isna().tolist() == [False, True, True, False]
+    assert out["f_cnt"].isna().tolist() == [False, True, True, False]
@@ -0,0 +1,44 @@
+# tests/test_ring_buffer.py
+
+import numpy as np
+import pandas as pd
+
+from storage.ring_buffer import RingBuffer
+
+
+def rows(times, device="node1", **columns):
+    index = pd.DatetimeIndex(pd.to_datetime(times, utc=True), name="time")
+    return pd.DataFrame({"device_id": device, **columns}, index=index)
+
+
+def test_window_wraps_around_and_keeps_the_latest_bins(tmp_path):
+    ring = RingBuffer.create(str(tmp_path / "window"), ["node1"], ["t"], window="2h", resolution="30min")
+    times = pd.date_range("2026-01-15 00:00", periods=6, freq="30min", tz="UTC")
+
+    assert ring.update(rows(times[:4], t=[0.0, 1.0, 2.0, 3.0])) == 4
+    assert ring.update(rows(times[4:], t=[4.0, 5.0])) == 2
+
+    df = ring.frame()
+    assert list(df.index) == list(times[2:])
+    assert df["t"].tolist() == [2.0, 3.0, 4.0, 5.0]
+    # Bins that were overwritten cannot come back
+    assert ring.update(rows(times[:2], t=[9.0, 9.0])) == 0
+
+
+def test_latest_row_wins_for_duplicate_slots(tmp_path):
+    ring = RingBuffer.create(str(tmp_path / "window"), ["node1", "node2"], ["t"], window="2h", resolution="30min")
+
+    # Many rows for one bin, and bins 2h apart that share a slot, in one update
+    times = ["2026-01-15 00:05"] * 50 + ["2026-01-15 00:10", "2026-01-15 02:00", "2026-01-15 00:20"]
+    df = pd.concat([
+        rows(times, device="node1", t=np.arange(len(times), dtype=float)),
+        rows(["2026-01-15 01:30"], device="node2", t=[-1.0]),
+    ])
+
+    assert ring.update(df) == 2
+
+    window = ring.frame()
+    node1 = window[window["device_id"] == "node1"]
+    assert list(node1.index) == [pd.Timestamp("2026-01-15 02:00", tz="UTC")]
+    assert node1["t"].tolist() == [51.0]
+    assert window.loc[window["device_id"] == "node2", "t"].tolist() == [-1.0]
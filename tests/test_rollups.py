@@ -0,0 +1,42 @@
+# tests/test_rollups.py
+
+import pandas as pd
+import pytest
+
+from storage.rollups import is_summed, read_rollup, update_rollups, wind_pairs
+
+
+def ttn_rows():
+    """One hour of raw TTN decoder fields, as fetch_dataB rolls them up."""
+    index = pd.date_range("2026-01-15 10:00", periods=4, freq="15min", tz="UTC", name="time")
+    return pd.DataFrame({
+        "device_id": "raingauge1",
+        "TempC_SHT": [4.0, 5.0, 6.0, 7.0],
+        "Rain_mm": [0.2, 0.0, 0.4, 0.2],
+        "RainRate_mmhr": [0.8, 0.0, 1.6, 0.8],
+        "WindSpeed": [2.0, 2.0, 2.0, 2.0],
+        "WindDir": [350.0, 10.0, 350.0, 10.0],
+    }, index=index)
+
+
+def test_classes_by_substring():
+    assert is_summed("rain_mm") and is_summed("Rain_mm") and is_summed("rain_event_mm")
+    assert not is_summed("RainRate_mmhr") and not is_summed("rain_daily_mm") and not is_summed("TempC_SHT")
+    assert wind_pairs(["wind_speed_ms", "wind_dir_deg"]) == [("wind_speed_ms", "wind_dir_deg")]
+    assert wind_pairs(["WindSpeed", "WindGust", "WindDir"]) == [("WindSpeed", "WindDir")]
+    assert wind_pairs(["WindDir"]) == [(None, "WindDir")]
+    assert wind_pairs(["solar_direct_wm2"]) == []
+
+
+def test_raw_ttn_fields_are_summed_and_vector_averaged(tmp_path):
+    root = str(tmp_path / "rollups")
+    update_rollups(root, ttn_rows())
+
+    hourly = read_rollup("hourly", root=root).iloc[0]
+
+    assert hourly["Rain_mm__sum"] == pytest.approx(0.8)
+    assert "Rain_mm__mean" not in hourly
+    assert hourly["RainRate_mmhr__mean"] == pytest.approx(0.8)
+    assert hourly["TempC_SHT__mean"] == pytest.approx(5.5)
+    # Around north, not the arithmetic mean of 180°
+    assert min(hourly["WindDir__mean"], 360 - hourly["WindDir__mean"]) == pytest.approx(0, abs=1e-6)
@@ -0,0 +1,22 @@
+# tests/test_schema.py
+
+import pandas as pd
+import pytest
+
+from providers.schema import LOECO_ARROW_SCHEMA, to_arrow
+
+
+@pytest.mark.filterwarnings("error::FutureWarning")
+def test_all_null_label_columns_convert_to_string_dictionaries():
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2026-01-15", periods=2, freq="30min", tz="UTC"),
+        "station": "gw1",
+        "sensor_status": [None, None],   # present but all-null
+    })                                   # sensor_type missing entirely
+
+    table = to_arrow(df)
+
+    assert table.schema.equals(LOECO_ARROW_SCHEMA)
+    assert table.column("sensor_status").to_pylist() == [None, None]
+    assert table.column("sensor_type").to_pylist() == [None, None]
+    assert table.column("station").to_pylist() == ["gw1", "gw1"]
@@ -0,0 +1,38 @@
+# tests/test_ttn_cursor.py
+
+import pandas as pd
+
+from utils.ttn_cursor import TTNCursor, format_rfc3339
+
+
+def test_first_run_and_backfill_use_the_lookback(tmp_path):
+    cursor = TTNCursor(str(tmp_path / "cursor.json"))
+    assert cursor.params("app", "168h") == {"last": "168h"}
+
+    cursor.advance("app", "node1", "2026-01-15T10:00:00Z")
+    assert cursor.params("app", "168h", backfill=True) == {"last": "168h"}
+    # Other applications still start from their lookback
+    assert cursor.params("other", "24h") == {"last": "24h"}
+
+
+def test_after_the_latest_device_minus_the_overlap(tmp_path):
+    path = str(tmp_path / "cursor.json")
+    cursor = TTNCursor(path)
+    cursor.advance("app", "node1", "2026-01-15T10:00:00.123456789Z")
+    cursor.advance("app", "node2", "2026-01-15T09:00:00Z")
+
+    assert cursor.params("app", "168h") == {"after": "2026-01-15T10:00:00.123456789Z"}
+    assert cursor.params("app", "168h", overlap="6h") == {"after": "2026-01-15T04:00:00.123456789Z"}
+
+    # Persisted at full resolution
+    cursor.save()
+    assert TTNCursor(path).high_water("app") == pd.Timestamp("2026-01-15T10:00:00.123456789Z")
+
+
+def test_advance_never_moves_backwards(tmp_path):
+    cursor = TTNCursor(str(tmp_path / "cursor.json"))
+    cursor.advance("app", "node1", "2026-01-15T10:00:00Z")
+    cursor.advance("app", "node1", "2026-01-15T09:00:00Z")
+
+    assert cursor.state == {"app": {"node1": "2026-01-15T10:00:00Z"}}
+    assert format_rfc3339("2026-01-15 11:00") == "2026-01-15T11:00:00Z"
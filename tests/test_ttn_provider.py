@@ -0,0 +1,103 @@
+# tests/test_ttn_provider.py
+
+import json
+
+import pandas as pd
+import pytest
+
+from providers.ttn_provider import TTNProvider
+
+
+class FakeStream:
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=None):
+        yield self.body
+
+
+class FakeSession:
+    """Serves one SSE body per call, recording the query params."""
+
+    def __init__(self, body):
+        self.body = body
+        self.calls = []
+
+    def get(self, url, headers=None, params=None, stream=False, timeout=None):
+        self.calls.append(dict(params))
+        return FakeStream(self.body)
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    def install(body):
+        session = FakeSession(body)
+        monkeypatch.setattr(TTNProvider, "session", property(lambda self: session))
+        return session
+
+    return install
+
+
+def event(device, received_at, temperature):
+    result = {
+        "end_device_ids": {"device_id": device},
+        "received_at": received_at,
+        "uplink_message": {"f_cnt": 1, "decoded_payload": {"temperature_c": temperature}},
+    }
+    return f"data: {json.dumps({'result': result})}\n\n".encode()
+
+
+def make_provider(tmp_path, name="app", **kwargs):
+    target = tmp_path / "data" / "2026" / "01" / f"ttn__{name}.parquet"
+    return TTNProvider(
+        name,
+        token="x",
+        application_id="app",
+        lookback="168h",
+        target_file=str(target),
+        cursor_path=str(tmp_path / "data" / f"{name}.cursor.json"),
+        **kwargs,
+    )
+
+
+def test_keep_history_keeps_devices_reporting_in_the_same_second(tmp_path, fake_session):
+    fake_session(b"".join([
+        event("node1", "2026-01-15T10:00:00.250Z", 4.0),
+        event("node2", "2026-01-15T10:00:00.750Z", 6.0),
+        event("node1", "2026-01-15T10:00:00.250Z", 4.0),   # re-sent
+        event("node1", "2026-01-15T10:30:00.100Z", 5.0),
+    ]))
+    provider = make_provider(tmp_path, keep_history=True)
+
+    provider.run()
+
+    stored = pd.read_parquet(provider.monthly_target(pd.Timestamp("2026-01-15"))).sort_values("timestamp")
+    assert stored["temperature_c"].tolist() == [4.0, 6.0, 5.0]
+
+
+def test_fetch_shared_demultiplexes_and_warns_about_missing_device_ids(tmp_path, fake_session, capsys):
+    session = fake_session(b"".join([
+        event("node1", "2026-01-15T10:00:00Z", 4.0),
+        event("node2", "2026-01-15T10:00:00Z", 6.0),
+    ]))
+    one = make_provider(tmp_path, name="one", device_id="node1")
+    two = make_provider(tmp_path, name="two", device_id="node2")
+
+    TTNProvider.fetch_shared([one, two])
+
+    assert len(session.calls) == 1
+    assert one.uplinks["device_id"].tolist() == ["node1"]
+    assert two.uplinks["device_id"].tolist() == ["node2"]
+    assert "[WARN]" not in capsys.readouterr().out
+
+    TTNProvider.fetch_shared([make_provider(tmp_path, name="a"), make_provider(tmp_path, name="b")])
+    assert "a, b share application app without a device_id" in capsys.readouterr().out
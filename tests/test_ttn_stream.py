@@ -0,0 +1,35 @@
+# tests/test_ttn_stream.py
+
+import json
+
+from providers.ttn_stream import read_uplinks
+
+
+def event(device, minute, temperature):
+    result = {
+        "end_device_ids": {"device_id": device},
+        "received_at": f"2026-01-15T10:{minute:02d}:00Z",
+        "uplink_message": {"f_cnt": minute, "decoded_payload": {"TempC_SHT": temperature}},
+    }
+    return f"data: {json.dumps({'result': result})}\n\n".encode()
+
+
+def test_frames_that_are_not_uplink_objects_are_skipped():
+    body = b"".join([
+        event("node1", 0, 4.0),
+        b"data: [1, 2, 3]\n\n",
+        b'data: "keepalive"\n\n',
+        b"data: 42\n\n",
+        b"data: null\n\n",
+        b'data: {"result": [1]}\n\n',
+        b'data: {"result": {"uplink_message": "x", "received_at": "2026-01-15T10:01:00Z"}}\n\n',
+        b"data: {not json\n\n",
+        event("node2", 2, 5.0),
+    ])
+    # Split mid-event, as the socket delivers it
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    df = read_uplinks(chunks)
+
+    assert list(df["device_id"]) == ["node1", "node2"]
+    assert list(df["TempC_SHT"]) == [4.0, 5.0]
@@ -0,0 +1,34 @@
+import json
+import os
+
+
+def load_state(path):
+    """
+    Load a JSON state file (filter state, fetch cursors, ...).
+    Returns an empty dict when the file is missing or unreadable.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            print(f"[WARN] Could not parse state file {path}, starting fresh")
+            return {}
+
+
+def save_state(path, state: dict):
+    """
+    Atomically write a JSON state file: write to a temp file, then rename,
+    so an interrupted run never leaves a half-written state behind.
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+    os.replace(tmp_path, path)
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from utils.state_store import load_state, save_state
+
+
+class TTNCursor:
+    """
+    Persisted high-water mark of TTN Storage Integration fetches.
+
+    Stores the latest `received_at` seen per application and device:
+        {"<application_id>": {"<device_id>": "2026-01-11T11:19:06.123456789Z"}}
+
+    A fetch then only asks for uplinks `after` the application's high-water
+    mark instead of re-downloading the whole `last` lookback window.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = load_state(path)
+
+    def high_water(self, application_id):
+        """Latest received_at stored for an application, or None."""
+        devices = self.state.get(application_id, {})
+        if not devices:
+            return None
+        return max(pd.Timestamp(ts) for ts in devices.values())
+
+    def params(self, application_id, lookback, backfill=False, overlap=None):
+        """
+        Query params for the Storage Integration.
+        Uses `after` the high-water mark (minus an optional overlap), or
+        falls back to a full `last` lookback when there is no cursor yet or
+        a backfill is requested.
+        """
+        mark = None if backfill else self.high_water(application_id)
+        if mark is None:
+            return {"last": lookback}
+
+        if overlap:
+            mark = mark - pd.Timedelta(overlap)
+
+        return {"after": format_rfc3339(mark)}
+
+    def advance(self, application_id, device_id, received_at):
+        """Move a device's high-water mark forward (never backwards)."""
+        received_at = pd.Timestamp(received_at)
+        devices = self.state.setdefault(application_id, {})
+
+        current = devices.get(device_id)
+        if current is None or received_at > pd.Timestamp(current):
+            devices[device_id] = format_rfc3339(received_at)
+
+    def save(self):
+        save_state(self.path, self.state)
+
+
+def format_rfc3339(ts):
+    """Format a timestamp as RFC 3339 UTC with a trailing Z (TTN style)."""
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.isoformat().replace("+00:00", "Z")